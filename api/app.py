@@ -1,52 +1,100 @@
 import sys
 import os
+import importlib
+import io
+import queue as queue_lib
+import threading
+import time
 
 # Ensure project root is on Python path (Vercel fix)
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 
 
 
 from models.database import (
-    init_db,
+    init_app as init_db_app,
     get_patient_data,
     get_department_data,
     get_bed_allocation,
     get_total_patients_today,
     get_staff_count,
+    admit_patient,
+    discharge_patient,
+    transfer_patient,
+    record_stock_movement,
+    facility_ids,
+    fan_out,
 )
 
-from models.inflow_model import (
-    predict_patient_inflow,
-    get_all_departments_prediction,
-    get_prediction_dates,
+from models.errors import Conflict, NotFound
+from models.metrics import init_app as init_metrics
+from api.http_cache import cache as response_cache, cached, invalidates
+from api.scheduler import scheduler
+from api.serialization import (
+    PreEncoded,
+    dumps,
+    encoded_response,
+    init_app as init_serialization,
 )
 
-from models.queue_model import (
-    mmc_queue_simulation,
-    calculate_probability_no_wait,
-)
-
-from models.surge_predictor import (
-    predict_surge_events,
-    get_surge_statistics,
-    get_weather_impact,
-)
-
-from models.resource_exchange import (
-    get_hospital_network,
-    get_available_resources,
-    get_my_shareable_resources,
-    get_resource_requests,
-)
-
-from models.supply_chain import (
-    get_supply_inventory,
-    get_supply_predictions,
-    get_supply_statistics,
-    get_usage_trend,
-)
+# Model modules load on first use, one group per API area, so a cold
+# start only pays for the areas its first requests touch (numpy, process
+# pools and the forecast engines stay unloaded for page-only requests).
+def _lazy(module, name):
+    target = None
+
+    def call(*args, **kwargs):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+        return target(*args, **kwargs)
+
+    call.__name__ = name
+    return call
+
+# Prediction
+predict_patient_inflow = _lazy("models.inflow_model", "predict_patient_inflow")
+get_all_departments_prediction = _lazy("models.inflow_model", "get_all_departments_prediction")
+get_prediction_dates = _lazy("models.inflow_model", "get_prediction_dates")
+predict_hourly_inflow = _lazy("models.inflow_model", "predict_hourly_inflow")
+get_forecast_cache_stats = _lazy("models.inflow_model", "get_forecast_cache_stats")
+forecast_inflow = _lazy("models.inflow_model", "forecast_inflow")
+get_expected_waits = _lazy("models.wait_forecast", "get_expected_waits")
+
+# Queue
+mmc_queue_simulation = _lazy("models.queue_model", "mmc_queue_simulation")
+optimize_staffing = _lazy("models.queue_model", "optimize_staffing")
+check_queue_inputs = _lazy("models.queue_model", "check_queue_inputs")
+staffing_plan = _lazy("models.queue_model", "staffing_plan")
+simulate_department = _lazy("models.ed_simulation", "simulate_department")
+
+# Surge
+predict_surge_events = _lazy("models.surge_predictor", "predict_surge_events")
+get_surge_statistics = _lazy("models.surge_predictor", "get_surge_statistics")
+get_weather_impact = _lazy("models.surge_predictor", "get_weather_impact")
+upsert_surge_event = _lazy("models.surge_predictor", "upsert_surge_event")
+remove_surge_event = _lazy("models.surge_predictor", "remove_surge_event")
+
+# Resource exchange
+get_hospital_network = _lazy("models.resource_exchange", "get_hospital_network")
+get_available_resources = _lazy("models.resource_exchange", "get_available_resources")
+get_my_shareable_resources = _lazy("models.resource_exchange", "get_my_shareable_resources")
+get_resource_requests = _lazy("models.resource_exchange", "get_resource_requests")
+find_nearest_resources = _lazy("models.resource_exchange", "find_nearest_resources")
+match_resource_requests = _lazy("models.resource_exchange", "match_resource_requests")
+solve_allocations = _lazy("models.resource_exchange", "solve_allocations")
+update_offer = _lazy("models.resource_exchange", "update_offer")
+
+# Supply chain
+get_supply_inventory = _lazy("models.supply_chain", "get_supply_inventory")
+get_supply_predictions = _lazy("models.supply_chain", "get_supply_predictions")
+get_supply_statistics = _lazy("models.supply_chain", "get_supply_statistics")
+get_usage_trend = _lazy("models.supply_chain", "get_usage_trend")
+supply_snapshot_key = _lazy("models.supply_chain", "supply_snapshot_key")
+ingest_usage_events = _lazy("models.usage_stream", "ingest_usage_events")
+import_usage_events = _lazy("models.usage_stream", "import_events")
 
 BASE_DIR = os.path.dirname(__file__)
 
@@ -58,9 +106,17 @@ app = Flask(
 
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret")
 
-# Initialize DB safely (Vercel-safe: init_db is no-op when FORCE_DEMO)
-if not os.path.exists("/tmp/hospital.db"):
-    init_db()
+init_db_app(app)
+init_serialization(app)
+init_metrics(app)
+
+# Rarely changing sections are serialized (and compressed) once per version.
+# The hospital list is fixed at start-up.
+hospital_network_encoded = PreEncoded(get_hospital_network)
+supply_inventory_encoded = PreEncoded(get_supply_inventory, supply_snapshot_key)
+
+# The database is created (or copied from the prebuilt snapshot) by
+# ensure_db() on the first query, not at import time.
 
 @app.route("/health")
 def health():
@@ -117,24 +173,128 @@ def api_predict():
     })
 
 @app.route("/api/predict/all")
+@cached("predict", ttl=300, stale=300)
 def api_predict_all():
-    return jsonify({
-        "dates": get_prediction_dates(),
-        "predictions": get_all_departments_prediction(),
-    })
+    return jsonify(latest_predictions())
+
+@app.route("/api/predict/forecast")
+def api_predict_forecast():
+    """Batch forecast: ?days=7..90&hourly=1&department=A&department=B"""
+    days = request.args.get("days", 7, type=int)
+    hourly = request.args.get("hourly", "0") in ("1", "true")
+    departments = request.args.getlist("department") or None
+    try:
+        predictions = forecast_inflow(departments, days, hourly)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({"days": days, "hourly": hourly, "predictions": predictions})
+
+@app.route("/api/predict/wait")
+@cached("surge", ttl=60, stale=120)
+def api_predict_wait():
+    """Expected wait (minutes) per department and hour with surge and weather: ?department=X"""
+    try:
+        return jsonify(get_expected_waits(request.args.get("department")))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+@app.route("/api/predict/cache")
+def api_predict_cache():
+    return jsonify(get_forecast_cache_stats())
 
 @app.route("/api/queue/simulate", methods=["POST"])
 def api_queue_sim():
-    data = request.get_json()
-    ar = float(data.get("arrival_rate", 20))
+    from models.queue_model import MAX_SERVERS
+    data = request.get_json() or {}
+    try:
+        if not isinstance(data, dict):
+            raise TypeError("request body must be a JSON object")
+        ar = float(data.get("arrival_rate", 20))
+        sr = float(data.get("service_rate", 5))
+        # The Erlang recursion runs once per server
+        s = min(int(data.get("servers", 3)), MAX_SERVERS)
+        check_queue_inputs(ar, sr, s)
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(mmc_queue_simulation(ar, sr, s))
+
+def _optional_float(data, key):
+    value = data.get(key)
+    return None if value is None else float(value)
+
+@app.route("/api/queue/staffing", methods=["POST"])
+def api_queue_staffing():
+    try:
+        return jsonify(staffing_payload(request.get_json() or {}))
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+def staffing_payload(data):
+    """
+    Minimum servers meeting target_wait (hours) and/or target_prob_no_wait.
+    department may be a name or "all". With an explicit arrival_rate a single
+    scenario is solved; otherwise hourly=true returns a 7 x 24 plan from the
+    inflow forecast and the default uses today's average hourly arrivals.
+    Raises TypeError / ValueError for malformed inputs.
+    """
+    if not isinstance(data, dict):
+        raise TypeError("request body must be a JSON object")
     sr = float(data.get("service_rate", 5))
-    s = int(data.get("servers", 3))
-    result = mmc_queue_simulation(ar, sr, s)
-    result["prob_no_wait"] = calculate_probability_no_wait(ar, sr, s)
-    return jsonify(result)
+    target_wait = _optional_float(data, "target_wait")
+    target_pnw = _optional_float(data, "target_prob_no_wait")
 
-@app.route("/api/beds/allocate", methods=["GET", "POST"])
-def api_beds_allocate():
+    if "arrival_rate" in data:
+        ar = float(data["arrival_rate"])
+        return optimize_staffing(ar, sr, target_wait, target_pnw)
+
+    from models.inflow_model import DEPARTMENT_BASE_RATES
+    dept = data.get("department", "Emergency")
+    if dept == "all":
+        depts = list(DEPARTMENT_BASE_RATES)
+    elif dept in DEPARTMENT_BASE_RATES:
+        depts = [dept]
+    else:
+        raise ValueError(f"Unknown department {dept!r}")
+    hourly = bool(data.get("hourly", False))
+    result = {}
+    for d in depts:
+        rates = predict_hourly_inflow(d)
+        if hourly:
+            result[d] = {"servers": staffing_plan(rates, sr, target_wait, target_pnw)}
+        else:
+            ar = sum(rates[0]) / 24
+            result[d] = {"arrival_rate": round(ar, 3)}
+            result[d].update(optimize_staffing(ar, sr, target_wait, target_pnw))
+
+    response = {"departments": result}
+    if hourly:
+        response["dates"] = get_prediction_dates()
+        response["hours"] = list(range(24))
+    return response
+
+@app.route("/api/queue/des", methods=["POST"])
+def api_queue_des():
+    """Discrete-event simulation with confidence intervals (waits in hours)."""
+    try:
+        return jsonify(des_payload(request.get_json() or {}))
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+def des_payload(data):
+    if not isinstance(data, dict):
+        raise TypeError("request body must be a JSON object")
+    capacity = data.get("capacity")
+    return simulate_department(
+        department=data.get("department", "Emergency"),
+        servers=int(data.get("servers", 3)),
+        service_rate=float(data.get("service_rate", 5)),
+        days=min(int(data.get("days", 7)), 28),
+        replications=min(int(data.get("replications", 200)), 5000),
+        capacity=None if capacity is None else int(capacity),
+        seed=int(data.get("seed", 2024)),
+    )
+
+def bed_allocation_payload():
     output = []
     for dept, total, occupied in get_bed_allocation():
         util = (occupied / total) * 100 if total else 0
@@ -153,10 +313,9 @@ def api_beds_allocate():
             "utilization": round(util, 1),
             "recommendation": rec,
         })
-    return jsonify(output)
+    return output
 
-@app.route("/api/overview/stats")
-def api_overview():
+def overview_payload():
     beds = get_bed_allocation()
     total = sum(t for _, t, _ in beds)
     occ = sum(o for _, _, o in beds)
@@ -165,7 +324,7 @@ def api_overview():
     # Deterministic avg wait (min): base + load factor; prototype demo value
     avg_wait = max(5, min(45, 12 + int(occupancy / 4) + (patients // 30)))
 
-    return jsonify({
+    return {
         "total_patients": patients,
         "avg_wait_time": avg_wait,
         "bed_occupancy": round(occupancy, 1),
@@ -173,58 +332,526 @@ def api_overview():
         "patient_distribution": [
             {"department": d, "count": c} for d, c in get_patient_data()
         ],
-    })
+    }
+
+def facility_summary():
+    """Bed, patient and staff totals for the current facility."""
+    beds = get_bed_allocation()
+    return {
+        "total_beds": sum(t for _, t, _ in beds),
+        "occupied_beds": sum(o for _, _, o in beds),
+        "total_patients": get_total_patients_today(),
+        "staff": sum(c for _, c in get_staff_count()),
+        "patient_distribution": get_patient_data(),
+    }
+
+def network_overview_payload(facilities=None):
+    """Overview across facilities; each one is queried in parallel."""
+    summaries = fan_out(facility_summary, facilities=facilities)
+    distribution = {}
+    by_facility = []
+    for facility_id, summary in summaries.items():
+        for dept, count in summary.pop("patient_distribution"):
+            distribution[dept] = distribution.get(dept, 0) + count
+        total = summary["total_beds"]
+        summary["bed_occupancy"] = round(summary["occupied_beds"] / total * 100, 1) if total else 0
+        by_facility.append({"facility": facility_id, **summary})
+
+    total = sum(f["total_beds"] for f in by_facility)
+    occ = sum(f["occupied_beds"] for f in by_facility)
+    return {
+        "facilities": len(by_facility),
+        "total_patients": sum(f["total_patients"] for f in by_facility),
+        "total_beds": total,
+        "occupied_beds": occ,
+        "bed_occupancy": round(occ / total * 100, 1) if total else 0,
+        "staff": sum(f["staff"] for f in by_facility),
+        "patient_distribution": [
+            {"department": d, "count": c} for d, c in sorted(distribution.items())
+        ],
+        "by_facility": by_facility,
+    }
+
+def predictions_payload():
+    return {
+        "dates": get_prediction_dates(),
+        "predictions": get_all_departments_prediction(),
+    }
+
+def surge_stats_payload():
+    stats = get_surge_statistics()
+    stats["weather"] = get_weather_impact()
+    return stats
+
+def supply_stats_payload():
+    stats = get_supply_statistics()
+    return {
+        "totalItems": stats.get("total_items", 0),
+        "criticalItems": stats.get("critical_items", 0),
+        "autoOrders": stats.get("auto_orders_pending", 0),
+        "monthlySpend": stats.get("monthly_spend", "—"),
+    }
+
+# Expensive aggregates are precomputed in the background: rebuilt on an
+# interval and right after writes to their tag. Handlers read the latest
+# snapshot.
+scheduler.add("overview", overview_payload, 10, ("beds",))
+scheduler.add("network", network_overview_payload, 30, ("beds",))
+scheduler.add("predictions", predictions_payload, 300, ("predict",))
+scheduler.add("surge_stats", surge_stats_payload, 30, ("surge",))
+scheduler.add("supply_stats", supply_stats_payload, 30, ("supply",))
+
+latest_overview = scheduler.reader("overview")
+latest_network = scheduler.reader("network")
+latest_predictions = scheduler.reader("predictions")
+latest_surge_stats = scheduler.reader("surge_stats")
+latest_supply_stats = scheduler.reader("supply_stats")
+
+@app.route("/api/beds/allocate", methods=["GET", "POST"])
+@cached("beds", ttl=5, stale=30)
+def api_beds_allocate():
+    return jsonify(bed_allocation_payload())
+
+def _db_update(action, *args, **kwargs):
+    try:
+        return jsonify(action(*args, **kwargs))
+    except NotFound as exc:
+        return jsonify({"error": str(exc)}), 404
+    except Conflict as exc:
+        return jsonify({"error": str(exc)}), 409
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 503
+
+@app.route("/api/beds/admit", methods=["POST"])
+@invalidates("beds")
+def api_beds_admit():
+    data = request.get_json() or {}
+    return _db_update(admit_patient, data.get("department", "Emergency"), data.get("patient_id"))
+
+@app.route("/api/beds/discharge", methods=["POST"])
+@invalidates("beds")
+def api_beds_discharge():
+    """Free a bed: {department, bed_number}"""
+    data = request.get_json() or {}
+    return _db_update(discharge_patient, data.get("department"), data.get("bed_number"))
+
+@app.route("/api/beds/transfer", methods=["POST"])
+@invalidates("beds")
+def api_beds_transfer():
+    """Move a patient: {department, bed_number, to_department}"""
+    data = request.get_json() or {}
+    return _db_update(
+        transfer_patient, data.get("department"), data.get("bed_number"), data.get("to_department"),
+    )
+
+@app.route("/api/overview/stats")
+@cached("beds", ttl=5, stale=30)
+def api_overview():
+    return jsonify(latest_overview())
+
+@app.route("/api/cache/stats")
+def api_cache_stats():
+    return jsonify(response_cache.get_stats())
+
+@app.route("/api/scheduler/stats")
+def api_scheduler_stats():
+    return jsonify(scheduler.get_stats())
+
+@app.route("/api/facilities")
+def api_facilities():
+    return jsonify({"facilities": facility_ids()})
+
+@app.route("/api/network/overview")
+@cached("beds", ttl=10, stale=60)
+def api_network_overview():
+    """Network-wide overview: ?facilities=a,b (default: all facilities)"""
+    wanted = request.args.get("facilities")
+    if not wanted:
+        return jsonify(latest_network())
+    try:
+        return jsonify(network_overview_payload(wanted.split(",")))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
 
 @app.route("/api/surge/events")
+@cached("surge", ttl=30, stale=120)
 def api_surge_events():
     return jsonify(predict_surge_events())
 
+@app.route("/api/surge/events", methods=["POST"])
+@invalidates("surge")
+def api_surge_event_upsert():
+    """Add or replace one event: {id, category, location, exposure, start, end | duration_hours}"""
+    data = request.get_json() or {}
+    if not isinstance(data, dict) or "id" not in data:
+        return jsonify({"error": "id is required"}), 400
+    try:
+        return jsonify(upsert_surge_event(data))
+    except (TypeError, ValueError) as exc:
+        return jsonify({"error": str(exc)}), 400
+
+@app.route("/api/surge/events/<int:event_id>", methods=["DELETE"])
+@invalidates("surge")
+def api_surge_event_remove(event_id):
+    return _db_update(remove_surge_event, event_id)
+
 @app.route("/api/surge/stats")
+@cached("surge", ttl=30, stale=120)
 def api_surge_stats():
-    stats = get_surge_statistics()
-    stats["weather"] = get_weather_impact()
-    return jsonify(stats)
+    return jsonify(latest_surge_stats())
 
 # -------------------- SUPPLY CHAIN APIs --------------------
 @app.route("/api/supply/stats", methods=["GET"])
+@cached("supply", ttl=10, stale=60)
 def api_supply_stats():
-    stats = get_supply_statistics()
-    return jsonify({
-        "totalItems": stats.get("total_items", 0),
-        "criticalItems": stats.get("critical_items", 0),
-        "autoOrders": stats.get("auto_orders_pending", 0),
-        "monthlySpend": stats.get("monthly_spend", "—"),
-    })
+    return jsonify(latest_supply_stats())
 
 @app.route("/api/supply/inventory", methods=["GET"])
+@cached("supply", ttl=10, stale=60)
 def api_supply_inventory():
-    return jsonify(get_supply_inventory())
+    return encoded_response(supply_inventory_encoded)
 
 @app.route("/api/supply/predictions", methods=["GET"])
+@cached("supply", ttl=10, stale=60)
 def api_supply_predictions():
     return jsonify(get_supply_predictions())
 
+@app.route("/api/supply/movements", methods=["POST"])
+@invalidates("supply")
+def api_supply_movements():
+    """Record usage, a receipt or a signed adjustment for one item."""
+    data = request.get_json() or {}
+    try:
+        item_id = int(data["item_id"])
+        quantity = int(data["quantity"])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "item_id and quantity are required integers"}), 400
+    return _db_update(record_stock_movement, item_id, quantity, data.get("kind", "usage"))
+
+# Streamed request bodies for bulk usage imports
+USAGE_IMPORT_FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+}
+
+@app.route("/api/supply/usage", methods=["POST"])
+@invalidates("supply")
+def api_supply_usage():
+    """
+    Ingest dispensing events {item_id|item, quantity, timestamp}: a JSON
+    event or {"events": [...]}, or a streamed CSV / JSON-lines body.
+    """
+    fmt = USAGE_IMPORT_FORMATS.get(request.mimetype)
+    if fmt:
+        stream = io.TextIOWrapper(request.stream, encoding="utf-8", newline="")
+        return _db_update(import_usage_events, stream, fmt)
+    data = request.get_json() or {}
+    events = data.get("events", [data]) if isinstance(data, dict) else data
+    if not isinstance(events, list):
+        return jsonify({"error": "events must be a list"}), 400
+    return _db_update(ingest_usage_events, events)
+
 @app.route("/api/supply/trend", methods=["GET"])
+@cached("supply", ttl=10, stale=60)
 def api_supply_trend():
-    return jsonify(get_usage_trend())
+    """Usage trend: ?days=7&hourly=1"""
+    days = request.args.get("days", 7, type=int)
+    hourly = request.args.get("hourly", "0") in ("1", "true")
+    try:
+        return jsonify(get_usage_trend(days, hourly))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
 
 # -------------------- RESOURCE EXCHANGE APIs --------------------
 @app.route("/api/resources/network", methods=["GET"])
+@cached("resources", ttl=3600, stale=3600)
 def api_resource_network():
-    return jsonify(get_hospital_network())
+    return encoded_response(hospital_network_encoded)
 
 @app.route("/api/resources/available", methods=["GET"])
+@cached("resources", ttl=10, stale=60)
 def api_resource_available():
     return jsonify(get_available_resources())
 
 @app.route("/api/resources/mine", methods=["GET"])
+@cached("resources", ttl=10, stale=60)
 def api_resource_mine():
     return jsonify(get_my_shareable_resources())
 
 @app.route("/api/resources/requests", methods=["GET"])
+@cached("resources", ttl=10, stale=60)
 def api_resource_requests():
     return jsonify(get_resource_requests())
 
+@app.route("/api/resources/nearest", methods=["GET"])
+@cached("resources", ttl=10, stale=60)
+def api_resources_nearest():
+    """Nearest offers: ?resource=ICU Beds&min_quantity=2&k=5[&hospital_id=N | &lat=&lon=]"""
+    resource = request.args.get("resource")
+    if not resource:
+        return jsonify({"error": "resource is required"}), 400
+    try:
+        return jsonify(find_nearest_resources(
+            resource,
+            min_quantity=request.args.get("min_quantity", 1, type=int),
+            k=min(request.args.get("k", 5, type=int), 50),
+            hospital_id=request.args.get("hospital_id", 1, type=int),
+            lat=request.args.get("lat", type=float),
+            lon=request.args.get("lon", type=float),
+        ))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+@app.route("/api/resources/matches", methods=["GET"])
+@cached("resources", ttl=10, stale=60)
+def api_resources_matches():
+    return jsonify(match_resource_requests(min(request.args.get("k", 3, type=int), 20)))
+
+@app.route("/api/resources/allocate", methods=["GET", "POST"])
+def api_resources_allocate():
+    """Batch allocation of all pending requests: ?budget_ms=50"""
+    budget = request.args.get("budget_ms", 50, type=float)
+    return jsonify(solve_allocations(max(1.0, min(budget, 5000.0))))
+
+@app.route("/api/resources/offers", methods=["POST"])
+@invalidates("resources")
+def api_resources_offers():
+    """Create or update an offer: {id, hospital_id, resource_type, quantity, availability}"""
+    data = request.get_json() or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    try:
+        offer_id = int(data.pop("id"))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "id is required"}), 400
+    try:
+        fields = _offer_fields(data)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return _db_update(update_offer, offer_id, **fields)
+
+def _offer_fields(data):
+    """Offer fields present in a request body, type-checked."""
+    fields = {}
+    for key in ("hospital_id", "quantity"):
+        if key in data:
+            if isinstance(data[key], bool) or not isinstance(data[key], int):
+                raise ValueError(f"{key} must be an integer")
+            fields[key] = data[key]
+    if fields.get("quantity", 0) < 0:
+        raise ValueError("quantity must be non-negative")
+    for key in ("resource_type", "availability"):
+        if key in data:
+            if not isinstance(data[key], str) or not data[key].strip():
+                raise ValueError(f"{key} must be a non-empty string")
+            fields[key] = data[key]
+    return fields
+
+
+# -------------------- LIVE STREAM (SSE) --------------------
+# Dashboard sections shared by the stream (and any composite endpoint)
+SECTIONS = {
+    "overview": latest_overview,
+    "network": latest_network,
+    "beds": bed_allocation_payload,
+    "predictions": latest_predictions,
+    "surge_events": predict_surge_events,
+    "surge_stats": latest_surge_stats,
+    "supply_stats": latest_supply_stats,
+    "supply_inventory": get_supply_inventory,
+    "supply_predictions": get_supply_predictions,
+    "supply_trend": get_usage_trend,
+    "resources_network": get_hospital_network,
+    "resources_available": get_available_resources,
+    "resources_mine": get_my_shareable_resources,
+    "resources_requests": get_resource_requests,
+}
+
+STREAM_INTERVAL = float(os.environ.get("HEALFLOW_STREAM_INTERVAL", "5"))
+STREAM_KEEPALIVE = 15
+SUBSCRIBER_QUEUE_SIZE = 64
+
+
+class SnapshotBroadcaster:
+    """
+    Computes every section once per tick on a single background thread and
+    fans out only the sections whose JSON changed to all subscribers, so
+    server work tracks the tick rate rather than the number of open screens.
+    Sections are built outside the lock; a section that fails keeps its
+    previous value until a later tick succeeds.
+    """
+
+    def __init__(self, sections, interval):
+        self.sections = sections
+        self.interval = interval
+        self.snapshot = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _compute(self):
+        encoded = {}
+        for name, build in self.sections.items():
+            try:
+                encoded[name] = dumps(build()).decode()
+            except Exception:
+                app.logger.exception("Stream section %s failed", name)
+        return encoded
+
+    def _publish(self, encoded):
+        """Swap in changed sections and fan them out; returns subscribers too slow to keep."""
+        slow = []
+        with self._lock:
+            changed = {n: e for n, e in encoded.items() if self.snapshot.get(n) != e}
+            self.snapshot.update(changed)
+            for sub in list(self._subscribers) if changed else ():
+                try:
+                    sub.put_nowait(changed)
+                except queue_lib.Full:
+                    self._subscribers.discard(sub)
+                    slow.append(sub)
+        return slow
+
+    @staticmethod
+    def _end(subs):
+        # Dropping a stream makes EventSource reconnect and receive a full
+        # snapshot. Make room for the end marker without blocking.
+        for sub in subs:
+            try:
+                sub.get_nowait()
+            except queue_lib.Empty:
+                pass
+            try:
+                sub.put_nowait(None)
+            except queue_lib.Full:
+                pass
+
+    def _run(self):
+        orphans = []
+        try:
+            while True:
+                with self._lock:
+                    if not self._subscribers:
+                        self._thread = None
+                        return
+                self._end(self._publish(self._compute()))
+                time.sleep(self.interval)
+        except Exception:
+            app.logger.exception("Stream broadcaster stopped")
+        finally:
+            with self._lock:
+                if self._thread is threading.current_thread():
+                    # Stopped unexpectedly: end every stream so clients
+                    # reconnect, which starts a new thread
+                    self._thread = None
+                    orphans = list(self._subscribers)
+                    self._subscribers.clear()
+            self._end(orphans)
+
+    def subscribe(self):
+        sub = queue_lib.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        if not self.snapshot:
+            self._end(self._publish(self._compute()))
+        with self._lock:
+            self._subscribers.add(sub)
+            current = dict(self.snapshot)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return sub, current
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def current(self):
+        with self._lock:
+            return dict(self.snapshot)
+
+
+broadcaster = SnapshotBroadcaster(SECTIONS, STREAM_INTERVAL)
+
+
+def _sse(name, encoded):
+    return f"event: {name}\ndata: {encoded}\n\n"
+
+
+@app.route("/api/stream")
+def api_stream():
+    """Server-Sent Events: full snapshot on connect, then changed sections."""
+    wanted = request.args.get("sections")
+    wanted = set(wanted.split(",")) if wanted else set(SECTIONS)
+    sub, current = broadcaster.subscribe()
+
+    def generate():
+        try:
+            for name, encoded in current.items():
+                if name in wanted:
+                    yield _sse(name, encoded)
+            while True:
+                try:
+                    changed = sub.get(timeout=STREAM_KEEPALIVE)
+                except queue_lib.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if changed is None:
+                    return
+                for name, encoded in changed.items():
+                    if name in wanted:
+                        yield _sse(name, encoded)
+        finally:
+            broadcaster.unsubscribe(sub)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# -------------------- BATCH API --------------------
+BATCH_WORKERS = int(os.environ.get("HEALFLOW_BATCH_WORKERS", "4"))
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _batch_executor():
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _batch_pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+    return _batch_pool
+
+
+@app.route("/api/batch", methods=["GET", "POST"])
+def api_batch():
+    """
+    Several SECTIONS in one response: ?sections=a,b or {"sections": [...]}.
+    Sections are computed concurrently and the document carries an ETag,
+    so unchanged polls get 304 Not Modified.
+    """
+    if request.method == "POST":
+        data = request.get_json() or {}
+        names = (data.get("sections") or []) if isinstance(data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            return jsonify({"error": "body must be {\"sections\": [names]}"}), 400
+    else:
+        names = [n for n in request.args.get("sections", "").split(",") if n]
+    unknown = [n for n in names if n not in SECTIONS]
+    if not names or unknown:
+        return jsonify({"error": "unknown or missing sections", "unknown": unknown,
+                        "available": sorted(SECTIONS)}), 400
+
+    pool = _batch_executor()
+    futures = {n: pool.submit(SECTIONS[n]) for n in dict.fromkeys(names)}
+    body = dumps({n: f.result() for n, f in futures.items()})
+    response = app.response_class(body, mimetype="application/json")
+    response.add_etag()
+    return response.make_conditional(request)
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=False)
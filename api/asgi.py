@@ -0,0 +1,514 @@
+"""
+ASGI entry point serving the same routes as api/app.py from one event loop.
+
+    pip install uvicorn
+    uvicorn api.asgi:app --host 0.0.0.0 --port 5000
+
+Hot dashboard routes have native async handlers. Their database and model
+calls run on a bounded thread pool; the discrete-event simulation spreads
+its replications over a shared process pool. Native GET handlers for
+routes the Flask app caches go through the same HTTP cache entries, so
+ETags, Last-Modified and 304s match. /api/stream keeps no thread per
+client: every open stream shares one broadcaster subscription. Every
+other route is served by the Flask app itself on the bounded pool (fresh
+HTTP-cache entries straight from memory), so both entry points answer
+identically.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue as queue_lib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import parse_qs
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.app import (  # noqa: E402
+    SECTIONS,
+    STREAM_KEEPALIVE,
+    SUBSCRIBER_QUEUE_SIZE,
+    _sse,
+    app as flask_app,
+    broadcaster,
+    des_payload,
+    hospital_network_encoded,
+    latest_network,
+    network_overview_payload,
+    staffing_payload,
+    supply_inventory_encoded,
+)
+from api import http_cache  # noqa: E402
+from api.serialization import COMPRESS_MIN_BYTES, compress, dumps, negotiate  # noqa: E402
+from models.inflow_model import forecast_inflow  # noqa: E402
+
+# Threads for SQLite and light model calls (also bounds bridged Flask requests)
+DB_WORKERS = int(os.environ.get("HEALFLOW_ASGI_DB_WORKERS", "16"))
+_db_pool = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="asgi-db")
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_db_pool, fn, *args)
+
+
+class Request:
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        self.headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        self.body = body
+
+    def arg(self, name, default=None, type=str):
+        values = self.query.get(name)
+        if not values:
+            return default
+        try:
+            return type(values[0])
+        except ValueError:
+            return default
+
+    def json(self):
+        try:
+            return json.loads(self.body or b"null")
+        except ValueError:
+            return None
+
+
+def _encode(payload):
+    return dumps(payload) + b"\n"
+
+
+async def _respond(send, status, body, content_type="application/json", headers=(), req=None):
+    headers = list(headers)
+    if req is not None and status == 200:
+        headers.append((b"vary", b"Accept-Encoding"))
+        encoding = negotiate(req.headers.get("accept-encoding"))
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            body = await run_db(compress, body, encoding)
+            headers.append((b"content-encoding", encoding.encode()))
+            # A compressed body is a different representation: weak validator
+            headers = [(k, b"W/" + v if k == b"etag" else v) for k, v in headers]
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# -------------------- NATIVE HANDLERS --------------------
+# Each returns (payload, status)
+
+def native(render):
+    """Handler running render(req) -> (payload, status) on the database pool."""
+    async def handler(req):
+        return await run_db(render, req)
+    # Cached GET routes call render through the HTTP cache instead
+    handler.render = render
+    return handler
+
+
+def _section(name):
+    return native(lambda req: (SECTIONS[name](), 200))
+
+
+@native
+def network_overview(req):
+    # All facilities come from the scheduler's snapshot, as in the Flask view
+    wanted = req.arg("facilities")
+    if not wanted:
+        return latest_network(), 200
+    try:
+        return network_overview_payload(wanted.split(",")), 200
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+
+
+async def predict_forecast(req):
+    days = req.arg("days", 7, int)
+    hourly = req.arg("hourly", "0") in ("1", "true")
+    departments = req.query.get("department") or None
+    try:
+        predictions = await run_db(forecast_inflow, departments, days, hourly)
+    except ValueError as exc:
+        return {"error": str(exc)}, 400
+    return {"days": days, "hourly": hourly, "predictions": predictions}, 200
+
+
+async def queue_staffing(req):
+    try:
+        return await run_db(staffing_payload, req.json() or {}), 200
+    except (TypeError, ValueError) as exc:
+        return {"error": str(exc)}, 400
+
+
+async def queue_des(req):
+    try:
+        return await run_db(des_payload, req.json() or {}), 200
+    except (TypeError, ValueError) as exc:
+        return {"error": str(exc)}, 400
+
+
+# Sections served from their pre-encoded (and pre-compressed) bodies
+PRE_ENCODED = {
+    "/api/resources/network": hospital_network_encoded,
+    "/api/supply/inventory": supply_inventory_encoded,
+}
+
+
+async def pre_encoded(req, send, pre):
+    encoding = negotiate(req.headers.get("accept-encoding"))
+    if encoding and len(await run_db(pre.body)) < COMPRESS_MIN_BYTES:
+        encoding = None
+    headers = [(b"vary", b"Accept-Encoding")]
+    if encoding:
+        headers.append((b"content-encoding", encoding.encode()))
+    await _respond(send, 200, await run_db(pre.body, encoding), headers=headers)
+
+
+ROUTES = {
+    ("GET", "/api/overview/stats"): _section("overview"),
+    ("GET", "/api/beds/allocate"): _section("beds"),
+    ("POST", "/api/beds/allocate"): _section("beds"),
+    ("GET", "/api/predict/all"): _section("predictions"),
+    ("GET", "/api/surge/events"): _section("surge_events"),
+    ("GET", "/api/surge/stats"): _section("surge_stats"),
+    ("GET", "/api/supply/stats"): _section("supply_stats"),
+    ("GET", "/api/supply/predictions"): _section("supply_predictions"),
+    ("GET", "/api/resources/available"): _section("resources_available"),
+    ("GET", "/api/resources/mine"): _section("resources_mine"),
+    ("GET", "/api/resources/requests"): _section("resources_requests"),
+    ("GET", "/api/network/overview"): network_overview,
+    ("GET", "/api/predict/forecast"): predict_forecast,
+    ("POST", "/api/queue/staffing"): queue_staffing,
+    ("POST", "/api/queue/des"): queue_des,
+}
+
+
+async def batch(req, send):
+    """Same contract as the Flask /api/batch: sections computed concurrently, ETag + 304."""
+    if req.method == "POST":
+        data = req.json() or {}
+        names = (data.get("sections") or []) if isinstance(data, dict) else None
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            return await _respond(send, 400, _encode({"error": 'body must be {"sections": [names]}'}))
+    else:
+        names = [n for n in req.arg("sections", "").split(",") if n]
+    unknown = [n for n in names if n not in SECTIONS]
+    if not names or unknown:
+        body = _encode({"error": "unknown or missing sections", "unknown": unknown,
+                        "available": sorted(SECTIONS)})
+        return await _respond(send, 400, body)
+
+    names = list(dict.fromkeys(names))
+    results = await asyncio.gather(*(run_db(SECTIONS[n]) for n in names))
+    body = dumps(dict(zip(names, results)))
+    etag = hashlib.sha1(body).hexdigest()
+    if f'"{etag}"' in req.headers.get("if-none-match", ""):
+        await send({"type": "http.response.start", "status": 304, "headers": [(b"etag", f'"{etag}"'.encode())]})
+        return await send({"type": "http.response.body", "body": b""})
+    await _respond(send, 200, body, headers=[(b"etag", f'"{etag}"'.encode())], req=req)
+
+
+# -------------------- RESPONSE CACHE --------------------
+# Fresh responses for cached routes are answered on the event loop. Stale
+# entries and misses go through the native handler's render (filling the
+# same entries as the Flask view) or, without one, the Flask view, whose
+# cache decorator refreshes or fills them.
+CACHE_POLICIES = http_cache.get_cache_policies(flask_app)
+
+
+def _conditional_headers(req):
+    return (
+        req.headers.get("accept-encoding"),
+        req.headers.get("if-none-match"),
+        req.headers.get("if-modified-since"),
+    )
+
+
+async def cached_response(req, send, entry):
+    await _send_cached(send, *http_cache.respond(entry, http_cache.HIT, *_conditional_headers(req)))
+
+
+def _render_fill(render, req):
+    def fill():
+        payload, status = render(req)
+        return status, _encode(payload), "application/json"
+    return fill
+
+
+def _pre_encoded_fill(pre):
+    return lambda: (200, pre.body(), "application/json", pre)
+
+
+async def cached_native(req, send, policy, fill):
+    await _send_cached(send, *await run_db(
+        http_cache.serve, req.path, req.scope.get("query_string", b""), policy, fill,
+        *_conditional_headers(req),
+    ))
+
+
+async def _send_cached(send, status, headers, body):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+                   + ([(b"content-length", str(len(body)).encode())] if status != 304 else []),
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# -------------------- LIVE STREAM (SSE) --------------------
+
+class StreamRelay:
+    """
+    Shares one SnapshotBroadcaster subscription among all async stream
+    clients. One pump thread waits on the broadcaster queue and hands
+    changes to the event loop, which copies them into per-client queues.
+    """
+
+    def __init__(self, broadcaster):
+        self.broadcaster = broadcaster
+        self.inboxes = set()
+        self._sub = None
+        self._loop = None
+        self._lock = asyncio.Lock()
+
+    async def subscribe(self):
+        inbox = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        async with self._lock:
+            self.inboxes.add(inbox)
+            if self._sub is None:
+                self._loop = asyncio.get_running_loop()
+                sub, current = await run_db(self.broadcaster.subscribe)
+                self._sub = sub
+                threading.Thread(target=self._pump, args=(sub,), daemon=True).start()
+                return inbox, current
+        return inbox, await run_db(self.broadcaster.current)
+
+    def unsubscribe(self, inbox):
+        self.inboxes.discard(inbox)
+        if not self.inboxes and self._sub is not None:
+            sub, self._sub = self._sub, None
+            self.broadcaster.unsubscribe(sub)
+            # Wake the pump thread so it exits
+            while True:
+                try:
+                    sub.get_nowait()
+                except queue_lib.Empty:
+                    break
+            sub.put_nowait(None)
+
+    def _pump(self, sub):
+        while True:
+            changed = sub.get()
+            self._loop.call_soon_threadsafe(self._publish, sub, changed)
+            if changed is None:
+                return
+
+    def _publish(self, sub, changed):
+        if sub is not self._sub:
+            return
+        if changed is None:
+            # The broadcaster dropped us; end every stream so clients reconnect
+            self._sub = None
+        for inbox in list(self.inboxes):
+            try:
+                inbox.put_nowait(changed)
+            except asyncio.QueueFull:
+                # Too slow: end this stream; EventSource reconnects for a full snapshot
+                self.inboxes.discard(inbox)
+                inbox.get_nowait()
+                inbox.put_nowait(None)
+        if changed is None:
+            self.inboxes.clear()
+
+
+relay = None
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def stream(req, send, receive):
+    """Server-Sent Events: full snapshot on connect, then changed sections."""
+    global relay
+    if relay is None:
+        relay = StreamRelay(broadcaster)
+    wanted = req.arg("sections")
+    wanted = set(wanted.split(",")) if wanted else set(SECTIONS)
+    inbox, current = await relay.subscribe()
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        chunk = "".join(_sse(n, e) for n, e in current.items() if n in wanted)
+        while True:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+            getter = asyncio.ensure_future(inbox.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnected}, timeout=STREAM_KEEPALIVE,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if getter not in done:
+                getter.cancel()
+                if disconnected in done:
+                    return
+                chunk = ": keepalive\n\n"
+                continue
+            changed = getter.result()
+            if changed is None:
+                break
+            chunk = "".join(_sse(n, e) for n, e in changed.items() if n in wanted)
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        disconnected.cancel()
+        relay.unsubscribe(inbox)
+
+
+# -------------------- FLASK BRIDGE --------------------
+
+def _environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for key, value in scope.get("headers", []):
+        name = key.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            name = f"HTTP_{name}"
+            environ[name] = f"{environ[name]},{value}" if name in environ else value
+    # The body is already buffered (chunked uploads have no length header)
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+
+def _call_flask(environ):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    result = flask_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+async def bridge(scope, body, send):
+    status, headers, body = await run_db(_call_flask, _environ(scope, body))
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# -------------------- APPLICATION --------------------
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _db_pool.shutdown(wait=False)
+            simulation = sys.modules.get("models.ed_simulation")
+            if simulation is not None:
+                simulation.shutdown_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+    path, method = scope["path"], scope["method"]
+    if method == "GET" and path == "/api/stream":
+        return await stream(Request(scope, b""), send, receive)
+
+    body = await _read_body(receive)
+    if body is None:
+        return
+    policy = CACHE_POLICIES.get(path) if method == "GET" and http_cache.ENABLED else None
+    if policy is not None:
+        key = http_cache.cache_key(path, scope.get("query_string", b""))
+        entry = http_cache.cache.fresh(key, policy)
+        if entry is not None:
+            return await cached_response(Request(scope, body), send, entry)
+    if method == "GET" and path in PRE_ENCODED:
+        pre = PRE_ENCODED[path]
+        if policy is not None:
+            return await cached_native(Request(scope, body), send, policy, _pre_encoded_fill(pre))
+        return await pre_encoded(Request(scope, body), send, pre)
+    handler = ROUTES.get((method, path))
+    if handler is None and path == "/api/batch" and method in ("GET", "POST"):
+        handler = batch
+    elif handler is None:
+        return await bridge(scope, body, send)
+    req = Request(scope, body)
+    try:
+        if handler is batch:
+            return await batch(req, send)
+        if policy is not None and hasattr(handler, "render"):
+            return await cached_native(req, send, policy, _render_fill(handler.render, req))
+        payload, status = await handler(req)
+    except Exception:
+        flask_app.logger.exception("Unhandled error on %s %s", method, path)
+        payload, status = {"error": "Internal Server Error"}, 500
+    await _respond(send, status, _encode(payload), req=req)
@@ -0,0 +1,321 @@
+"""
+Server-side HTTP cache for the read APIs.
+
+Responses are cached per path and query string with a content-hash ETag
+and a Last-Modified time, so repeat polls are answered from memory,
+usually with 304 Not Modified. Each route sets its own TTL. Past the TTL,
+an entry is still served for `stale` more seconds while one background
+refresh rebuilds it (stale-while-revalidate). Concurrent misses for the
+same key wait for a single fill.
+
+Routes are tagged; successful writes invalidate their tags immediately.
+Changes made outside the API (feed files, streamed usage flushes) show up
+within the route's TTL. Disable with HEALFLOW_HTTP_CACHE=0.
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate, parsedate_to_datetime
+from functools import wraps
+from urllib.parse import parse_qsl
+
+from flask import current_app, request
+
+from api.serialization import COMPRESS_MIN_BYTES, compress, negotiate
+
+ENABLED = os.environ.get("HEALFLOW_HTTP_CACHE", "1").lower() not in ("0", "false", "no")
+MAX_ENTRIES = int(os.environ.get("HEALFLOW_HTTP_CACHE_ENTRIES", "512"))
+REFRESH_WORKERS = 2
+
+HIT, STALE, MISS = "HIT", "STALE", "MISS"
+
+
+class Policy:
+    def __init__(self, tags, ttl, stale):
+        self.tags = tuple(tags)
+        self.ttl = ttl
+        self.stale = stale
+
+
+class Entry:
+    """
+    One rendered response. Compressed variants are built on first use, or
+    taken from the PreEncoded source the body came from.
+    """
+
+    def __init__(self, status, body, mimetype, tags, source=None):
+        self.status = status
+        self.body = body
+        self.mimetype = mimetype
+        self.tags = tags
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.created = time.monotonic()
+        # Whole seconds, as Last-Modified / If-Modified-Since carry them
+        self.modified = int(time.time())
+        self.source = source
+        self._encoded = {None: body}
+
+    @classmethod
+    def rendered(cls, rendered, tags):
+        """Entry for fill()'s (status, body, mimetype[, source])."""
+        status, body, mimetype, *source = rendered
+        return cls(status, body, mimetype, tags, *source)
+
+    def encoded(self, encoding):
+        body = self._encoded.get(encoding)
+        if body is None:
+            if self.source is not None:
+                body = self.source.compressed(self.body, encoding)
+            if body is None:
+                body = compress(self.body, encoding)
+            self._encoded[encoding] = body
+        return body
+
+    def not_modified(self, if_none_match, if_modified_since):
+        if if_none_match:
+            tags = {t.strip().removeprefix("W/").strip('"') for t in if_none_match.split(",")}
+            return "*" in tags or self.etag in tags
+        if if_modified_since:
+            try:
+                return self.modified <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+def cache_key(path, query_string):
+    if isinstance(query_string, bytes):
+        query_string = query_string.decode("latin-1")
+    return path, tuple(sorted(parse_qsl(query_string, keep_blank_values=True)))
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._inflight = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "refreshes": 0, "invalidations": 0}
+
+    def _generation(self, tags):
+        return tuple(self._generations.get(t, 0) for t in tags)
+
+    def fresh(self, key, policy):
+        """The entry if it is within its TTL, else None (never blocks)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry.created >= policy.ttl:
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def lookup(self, key, policy, fill):
+        """
+        (entry, HIT | STALE | MISS). fill() renders the response as
+        (status, body, mimetype) plus, optionally, the PreEncoded source of
+        the body; only 200s are stored.
+        """
+        refresh = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.monotonic() - entry.created
+                self._entries.move_to_end(key)
+                if age < policy.ttl:
+                    self.stats["hits"] += 1
+                    return entry, HIT
+                if age < policy.ttl + policy.stale:
+                    self.stats["stale"] += 1
+                    refresh = key not in self._refreshing and key not in self._inflight
+                    if refresh:
+                        self._refreshing.add(key)
+                else:
+                    entry = None
+        if entry is not None:
+            if refresh:
+                self._executor().submit(self._refresh, key, policy, fill)
+            return entry, STALE
+        return self._fill(key, policy, fill), MISS
+
+    def _store(self, key, policy, generation, rendered):
+        entry = Entry.rendered(rendered, policy.tags)
+        if entry.status != 200:
+            return entry
+        with self._lock:
+            # A write during rendering makes this result outdated already
+            if self._generation(policy.tags) == generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def _fill(self, key, policy, fill):
+        with self._lock:
+            self.stats["misses"] += 1
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                done = self._inflight[key] = threading.Event()
+                generation = self._generation(policy.tags)
+        if waiter is not None:
+            waiter.wait()
+            with self._lock:
+                entry = self._entries.get(key)
+            return entry if entry is not None else Entry.rendered(fill(), policy.tags)
+        try:
+            return self._store(key, policy, generation, fill())
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            done.set()
+
+    def _refresh(self, key, policy, fill):
+        try:
+            with self._lock:
+                generation = self._generation(policy.tags)
+            self._store(key, policy, generation, fill())
+            with self._lock:
+                self.stats["refreshes"] += 1
+        except Exception:
+            # Keep serving the stale entry; the next request past it refills
+            pass
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+            return self._pool
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+            stale = [k for k, e in self._entries.items() if set(e.tags) & set(tags)]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "entries": len(self._entries)}
+
+
+cache = ResponseCache()
+
+
+def respond(entry, state, accept_encoding=None, if_none_match=None, if_modified_since=None):
+    """(status, headers, body) for a cached entry and the request's headers."""
+    if entry.status != 200:
+        return entry.status, [("Content-Type", entry.mimetype)], entry.body
+    encoding = negotiate(accept_encoding) if len(entry.body) >= COMPRESS_MIN_BYTES else None
+    etag = f'W/"{entry.etag}"' if encoding else f'"{entry.etag}"'
+    headers = [
+        ("ETag", etag),
+        ("Last-Modified", formatdate(entry.modified, usegmt=True)),
+        ("Cache-Control", "no-cache"),
+        ("Vary", "Accept-Encoding"),
+        ("X-Cache", state),
+    ]
+    if entry.not_modified(if_none_match, if_modified_since):
+        return 304, headers, b""
+    headers.append(("Content-Type", entry.mimetype))
+    if encoding:
+        headers.append(("Content-Encoding", encoding))
+    return 200, headers, entry.encoded(encoding)
+
+
+def serve(path, query_string, policy, fill, accept_encoding=None, if_none_match=None, if_modified_since=None):
+    """
+    (status, headers, body) for a cached GET route: the stored entry or a
+    fresh fill, answered with the same ETag / 304 handling on every entry point.
+    """
+    entry, state = cache.lookup(cache_key(path, query_string), policy, fill)
+    return respond(entry, state, accept_encoding, if_none_match, if_modified_since)
+
+
+def _render(app, view, view_args, path, query_string):
+    # A fresh request context without Accept-Encoding, so the stored body
+    # is the identity encoding whatever the triggering client accepted
+    with app.test_request_context(path, query_string=query_string):
+        response = app.make_response(view(**view_args))
+        # Pre-encoded sections keep their precompressed bodies
+        return (response.status_code, response.get_data(), response.mimetype,
+                getattr(response, "pre_encoded", None))
+
+
+def cached(*tags, ttl=10, stale=60):
+    """Cache a GET view for `ttl` seconds (+ `stale` while revalidating)."""
+    policy = Policy(tags, ttl, stale)
+
+    def decorate(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            if not ENABLED or request.method != "GET":
+                return view(**view_args)
+            app = current_app._get_current_object()
+            path, query = request.path, request.query_string.decode("latin-1")
+            status, headers, body = serve(
+                path, query, policy,
+                lambda: _render(app, view, view_args, path, query),
+                request.headers.get("Accept-Encoding"),
+                request.headers.get("If-None-Match"),
+                request.headers.get("If-Modified-Since"),
+            )
+            return app.response_class(body, status=status, headers=headers)
+
+        wrapper.cache_policy = policy
+        return wrapper
+
+    return decorate
+
+
+# Callbacks told about successful writes, e.g. to refresh precomputed data
+_write_listeners = []
+
+
+def add_write_listener(callback):
+    """Call callback(tags) after every successful write route."""
+    _write_listeners.append(callback)
+
+
+def invalidates(*tags):
+    """Invalidate cached responses with these tags after a successful write."""
+    def decorate(view):
+        @wraps(view)
+        def wrapper(**view_args):
+            response = current_app.make_response(view(**view_args))
+            if response.status_code < 400:
+                # Listeners first: a fill that starts after the generation
+                # bump must not read precomputed data from before the write
+                for callback in _write_listeners:
+                    callback(tags)
+                cache.invalidate(*tags)
+            return response
+
+        return wrapper
+
+    return decorate
+
+
+def get_cache_policies(app):
+    """{path: Policy} for cached GET routes without URL parameters."""
+    return {
+        rule.rule: app.view_functions[rule.endpoint].cache_policy
+        for rule in app.url_map.iter_rules()
+        if "GET" in rule.methods and not rule.arguments
+        and hasattr(app.view_functions[rule.endpoint], "cache_policy")
+    }
@@ -0,0 +1,205 @@
+"""
+Background precomputation of dashboard aggregates.
+
+Each job rebuilds one snapshot on its own interval, with jitter so jobs
+do not fire in lockstep. Handlers read the latest snapshot; a job's first
+read builds it inline and starts its schedule.
+
+A write to one of the job's tags (beds, surge, supply, ...) marks the
+snapshot dirty, and the next read rebuilds it inline, so a read that
+follows a write always sees it. A build that was already running when
+the write landed does not clear the mark.
+
+Each job has at most one build in flight. When a rebuilt snapshot
+differs from the previous one, the HTTP response cache entries with the
+job's tags are dropped so polls pick up the new value.
+
+Intervals can be overridden per job, e.g.
+HEALFLOW_REFRESH_INTERVALS="overview=5,predictions=600". Set
+HEALFLOW_SCHEDULER=0 to compute on every read instead.
+"""
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api import http_cache
+
+ENABLED = os.environ.get("HEALFLOW_SCHEDULER", "1").lower() not in ("0", "false", "no")
+
+# Each run is scheduled interval x (1 ± JITTER) after the previous one
+JITTER = 0.1
+WORKERS = 2
+
+INTERVAL_OVERRIDES = {
+    name.strip(): float(seconds)
+    for name, _, seconds in (
+        part.partition("=") for part in os.environ.get("HEALFLOW_REFRESH_INTERVALS", "").split(",")
+    )
+    if name.strip() and seconds
+}
+
+
+class Job:
+    def __init__(self, name, build, interval, tags):
+        self.name = name
+        self.build = build
+        self.interval = interval
+        self.tags = tuple(tags)
+        self.snapshot = None
+        self.built_at = None
+        # When the current snapshot's build started
+        self.started_at = None
+        # Serializes builds: the single flight per job
+        self.lock = threading.Lock()
+        # Not scheduled until the first read builds the snapshot
+        self.due = math.inf
+        self.running = False
+        # Set by writes to the job's tags; bumped generation marks builds
+        # that started before the write as outdated
+        self.dirty = False
+        self.generation = 0
+        self.stats = {"runs": 0, "failures": 0, "last_ms": None, "last_error": None}
+
+
+class Scheduler:
+    def __init__(self, jitter=JITTER, workers=WORKERS):
+        self.jitter = jitter
+        self.workers = workers
+        self.jobs = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pool = None
+
+    def add(self, name, build, interval, tags=()):
+        """Register a snapshot rebuilt every `interval` seconds and on writes to `tags`."""
+        self.jobs[name] = Job(name, build, INTERVAL_OVERRIDES.get(name, interval), tags)
+
+    def _next_due(self, job):
+        return time.monotonic() + job.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="precompute")
+                self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                due = [j for j in self.jobs.values() if j.due <= now and not j.running]
+                if not due:
+                    waiting = [j.due for j in self.jobs.values() if not j.running and j.due < math.inf]
+                    self._cond.wait(min(waiting) - now if waiting else None)
+                    continue
+                for job in due:
+                    job.running = True
+                    job.due = self._next_due(job)
+            try:
+                for job in due:
+                    self._pool.submit(self._run, job, time.time())
+            except RuntimeError:
+                # Interpreter shutdown
+                return
+
+    def _run(self, job, since):
+        try:
+            self._build(job, since=since)
+        except Exception:
+            pass
+        finally:
+            with self._cond:
+                job.running = False
+                self._cond.notify()
+
+    def _build(self, job, if_stale=False, since=None):
+        with job.lock:
+            if if_stale and job.snapshot is not None and not job.dirty:
+                return job.snapshot
+            # Already rebuilt by a reader since this run was dispatched
+            if since is not None and job.started_at is not None and job.started_at >= since:
+                return job.snapshot
+            with self._cond:
+                generation = job.generation
+            started_at = time.time()
+            start = time.perf_counter()
+            try:
+                value = job.build()
+            except Exception as exc:
+                # The previous snapshot stays in place
+                job.stats["failures"] += 1
+                job.stats["last_error"] = f"{type(exc).__name__}: {exc}"
+                raise
+            changed = job.snapshot is not None and value != job.snapshot
+            job.snapshot = value
+            with self._cond:
+                # A write during the build leaves the snapshot dirty
+                job.dirty = job.generation != generation
+            job.started_at = started_at
+            job.built_at = time.time()
+            job.stats["runs"] += 1
+            job.stats["last_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        if changed and job.tags:
+            http_cache.cache.invalidate(*job.tags)
+        return value
+
+    def trigger(self, tags):
+        """Mark every job sharing a tag with `tags` dirty; its next read rebuilds it."""
+        tags = set(tags)
+        with self._cond:
+            for job in self.jobs.values():
+                if tags & set(job.tags):
+                    job.dirty = True
+                    job.generation += 1
+
+    def read(self, name):
+        """Latest snapshot of a job (built inline on the first read and after writes)."""
+        job = self.jobs[name]
+        if not ENABLED:
+            return job.build()
+        self.start()
+        with self._cond:
+            snapshot = None if job.dirty else job.snapshot
+        if snapshot is None:
+            snapshot = self._build(job, if_stale=True)
+            with self._cond:
+                if not job.running:
+                    job.due = self._next_due(job)
+        return snapshot
+
+    def reader(self, name):
+        def read():
+            return self.read(name)
+        read.__name__ = name
+        return read
+
+    def clear(self):
+        """Drop every snapshot (e.g. after switching databases)."""
+        for job in self.jobs.values():
+            with job.lock:
+                job.snapshot = job.built_at = job.started_at = None
+                job.dirty = False
+            with self._cond:
+                job.due = math.inf
+
+    def get_stats(self):
+        now = time.time()
+        return {
+            name: {
+                "interval": job.interval,
+                "tags": list(job.tags),
+                "age_s": round(now - job.built_at, 3) if job.built_at else None,
+                **job.stats,
+            }
+            for name, job in self.jobs.items()
+        }
+
+
+scheduler = Scheduler()
+http_cache.add_write_listener(scheduler.trigger)
@@ -0,0 +1,250 @@
+"""
+Response serialization for the API: a pluggable JSON encoder, payloads
+pre-encoded once per version for rarely changing sections, and gzip /
+brotli negotiation above a size threshold.
+
+Non-finite floats (unstable queues report infinite waits) have no JSON
+representation; every serializer writes them as null.
+
+orjson and brotli are used when installed (pip install orjson brotli).
+"""
+import gzip
+import json
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from datetime import date
+
+from flask import current_app, request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("HEALFLOW_COMPRESS_MIN_BYTES", "1024"))
+
+# Per-request compression trades ratio for speed; pre-encoded bodies are
+# compressed once, so they use the best ratio
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+PRE_ENCODED_GZIP_LEVEL = 9
+PRE_ENCODED_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = {
+    "application/json", "text/html", "text/css", "text/plain",
+    "application/javascript", "text/javascript",
+}
+
+
+class Serializer(ABC):
+    """JSON encoder backend. dumps() returns compact, key-sorted UTF-8 bytes."""
+
+    name = None
+
+    @abstractmethod
+    def dumps(self, obj):
+        """Encode obj as compact, key-sorted UTF-8 JSON bytes."""
+
+
+def _default(obj):
+    # numpy arrays and scalars
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    if isinstance(obj, date):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """Copy of obj with non-finite floats replaced by None."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if hasattr(obj, "tolist"):
+        return _finite(obj.tolist())
+    return obj
+
+
+class StdlibSerializer(Serializer):
+    """json module; payloads with inf/nan take a second, sanitizing pass."""
+
+    name = "json"
+
+    def dumps(self, obj):
+        try:
+            text = json.dumps(obj, sort_keys=True, separators=(",", ":"),
+                              allow_nan=False, default=_default)
+        except ValueError:
+            text = json.dumps(_finite(obj), sort_keys=True, separators=(",", ":"),
+                              allow_nan=False, default=_default)
+        return text.encode()
+
+
+class OrjsonSerializer(Serializer):
+    """orjson: native numpy support, non-finite floats already become null."""
+
+    name = "orjson"
+
+    OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+               if orjson else 0)
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=_default, option=self.OPTIONS)
+
+
+SERIALIZERS = {StdlibSerializer.name: StdlibSerializer}
+if orjson is not None:
+    SERIALIZERS[OrjsonSerializer.name] = OrjsonSerializer
+
+_serializer = SERIALIZERS[
+    os.environ.get("HEALFLOW_JSON_SERIALIZER") or ("orjson" if orjson else "json")
+]()
+
+
+def set_serializer(serializer):
+    """Swap the JSON backend (an instance or registered name)."""
+    global _serializer
+    if isinstance(serializer, str):
+        serializer = SERIALIZERS[serializer]()
+    _serializer = serializer
+
+
+def dumps(obj):
+    return _serializer.dumps(obj)
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """Best content-coding we support for an Accept-Encoding header, or None."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        if name:
+            weights[name] = weight
+    best = None
+    # Highest q wins; ties go to the first (preferred) coding
+    for coding in available_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > 0 and (best is None or weight > best[0]):
+            best = (weight, coding)
+    return best[1] if best else None
+
+
+def compress(body, encoding, level=None):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level or GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=level or BROTLI_QUALITY)
+    raise ValueError(f"Unsupported encoding {encoding}")
+
+
+class PreEncoded:
+    """
+    A section payload serialized once per key and compressed once per
+    encoding. key() returns a hashable value that changes with the payload;
+    without one the payload is treated as fixed for the process lifetime.
+    """
+
+    _LEVELS = {"gzip": PRE_ENCODED_GZIP_LEVEL, "br": PRE_ENCODED_BROTLI_QUALITY}
+
+    def __init__(self, build, key=None):
+        self.build = build
+        self.key = key
+        self._key = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+
+    def body(self, encoding=None):
+        key = self.key() if self.key else None
+        with self._lock:
+            if key != self._key or not self._bodies:
+                self._bodies = {None: dumps(self.build()) + b"\n"}
+                self._key = key
+            if encoding not in self._bodies:
+                self._bodies[encoding] = compress(self._bodies[None], encoding, self._LEVELS[encoding])
+            return self._bodies[encoding]
+
+    def compressed(self, identity, encoding):
+        """The stored `encoding` body if `identity` is still the current payload, else None."""
+        with self._lock:
+            if self._bodies.get(None) != identity:
+                return None
+            if encoding not in self._bodies:
+                self._bodies[encoding] = compress(identity, encoding, self._LEVELS[encoding])
+            return self._bodies[encoding]
+
+
+def encoded_response(pre):
+    """Flask response for a PreEncoded payload in the negotiated encoding."""
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    if encoding and len(pre.body()) < COMPRESS_MIN_BYTES:
+        encoding = None
+    response = current_app.response_class(pre.body(encoding), mimetype="application/json")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    # The HTTP cache takes compressed variants from here
+    response.pre_encoded = pre
+    return response
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by the configured Serializer."""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Explicit formatting options (indent, ...) keep the stdlib path
+            return super().dumps(_finite(obj), **kwargs)
+        return dumps(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj) + b"\n", mimetype=self.mimetype)
+
+
+def _compress_response(response):
+    if (response.is_streamed or response.direct_passthrough
+            or response.status_code != 200
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(request.headers.get("Accept-Encoding"))
+    if encoding is None or response.calculate_content_length() < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers["Content-Encoding"] = encoding
+    # A compressed body is a different representation: keep the validator weak
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    """Serialize with the configured backend and compress large responses."""
+    app.json = FastJSONProvider(app)
+    app.after_request(_compress_response)
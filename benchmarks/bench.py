@@ -0,0 +1,231 @@
+"""
+Benchmark suite: every /api route through the Flask test client plus the
+hot model functions, at several synthetic database sizes.
+
+Usage:
+    python benchmarks/bench.py                             # default sizes
+    python benchmarks/bench.py --sizes 5:1,40:12 -n 500 --output bench.json
+    python benchmarks/bench.py --baseline bench.json       # compare, exit 1 on regression
+
+Sizes are departments:months of synthetic admissions (models/synthetic_data.py).
+Results are JSON: p50/p95/p99/mean latency in milliseconds and calls/second,
+plus the query plan of each hot read query. Exits 1 when one of those plans
+scans a table instead of using an index.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Run from anywhere: make the project root importable
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from api.app import app  # noqa: E402
+from api.http_cache import cache as response_cache  # noqa: E402
+from api.scheduler import scheduler  # noqa: E402
+from models import database  # noqa: E402
+from models.inflow_model import clear_forecast_cache, predict_patient_inflow  # noqa: E402
+from models.queue_model import mmc_queue_simulation, queue_metrics  # noqa: E402
+from models.resource_exchange import BatchAllocator, ResourceExchange  # noqa: E402
+from models.synthetic_data import generate_hospital, resource_network  # noqa: E402
+
+DEFAULT_SIZES = "5:1,20:6"
+
+# (method, path, json body); streaming and bed-write routes are excluded
+ROUTES = [
+    ("GET", "/api/overview/stats", None),
+    ("GET", "/api/beds/allocate", None),
+    ("POST", "/api/queue/simulate", {"arrival_rate": 20, "service_rate": 5, "servers": 5}),
+    ("POST", "/api/queue/staffing", {"department": "all", "target_wait": 0.1}),
+    ("POST", "/api/queue/staffing", {"department": "Emergency", "hourly": True, "target_wait": 0.1}),
+    ("POST", "/api/queue/des", {"servers": 3, "replications": 20}),
+    ("POST", "/api/predict", {"department": "Emergency"}),
+    ("GET", "/api/predict/all", None),
+    ("GET", "/api/predict/forecast?days=90&hourly=1", None),
+    ("GET", "/api/predict/wait?department=Emergency", None),
+    ("GET", "/api/surge/events", None),
+    ("GET", "/api/surge/stats", None),
+    ("GET", "/api/supply/stats", None),
+    ("GET", "/api/supply/inventory", None),
+    ("GET", "/api/supply/predictions", None),
+    ("GET", "/api/supply/trend", None),
+    ("GET", "/api/supply/trend?days=2&hourly=1", None),
+    ("GET", "/api/resources/network", None),
+    ("GET", "/api/resources/available", None),
+    ("GET", "/api/resources/mine", None),
+    ("GET", "/api/resources/requests", None),
+    ("GET", "/api/resources/nearest?resource=ICU+Beds&min_quantity=2&k=5", None),
+    ("GET", "/api/resources/matches", None),
+    ("GET", "/api/resources/allocate", None),
+    ("GET", "/api/batch?sections=supply_stats,supply_inventory,supply_predictions,supply_trend", None),
+]
+
+_SCENARIOS = np.random.default_rng(0)
+_LAMBDAS = _SCENARIOS.uniform(1, 100, 10000)
+_SERVERS = _SCENARIOS.integers(1, 60, 10000)
+_NETWORK = ResourceExchange(*resource_network(500))
+_ALLOCATOR = BatchAllocator(_NETWORK)
+
+MODEL_FUNCTIONS = {
+    "mmc_queue_simulation": lambda: mmc_queue_simulation(20, 5, 5),
+    "mmc_queue_simulation[c=400]": lambda: mmc_queue_simulation(1900, 5, 400),
+    "queue_metrics[10k scenarios]": lambda: queue_metrics(_LAMBDAS, 5, _SERVERS),
+    "predict_patient_inflow": lambda: predict_patient_inflow("Emergency"),
+    "predict_patient_inflow[cold]": lambda: (clear_forecast_cache(), predict_patient_inflow("Emergency")),
+    "exchange.nearest[500 hospitals]": lambda: _NETWORK.nearest("ICU Beds", 40.75, -74.0, 2, 5, 1),
+    "allocator.solve[100 requests, warm]": lambda: _ALLOCATOR.solve(),
+    "get_bed_allocation": database.get_bed_allocation,
+    "get_total_patients_today": database.get_total_patients_today,
+    "get_patient_data": database.get_patient_data,
+}
+
+
+def measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations)
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - t0
+    total = time.perf_counter() - start
+    ms = samples * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "throughput_per_s": round(iterations / total, 1),
+        "iterations": iterations,
+    }
+
+
+def _route_call(client, method, path, body, http_cache=False):
+    def call():
+        if not http_cache:
+            # Measure the route's own work, not a response-cache hit or
+            # a precomputed snapshot
+            response_cache.clear()
+            scheduler.clear()
+        response = client.open(path, method=method, json=body)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} -> {response.status_code}")
+        response.get_data()
+    return call
+
+
+def run_size(departments, months, iterations, warmup, workdir, http_cache=False):
+    path = os.path.join(workdir, f"bench_{departments}x{months}.db")
+    counts = generate_hospital(path, departments=departments, months=months)
+    database.use_database(path)
+    response_cache.clear()
+    scheduler.clear()
+    client = app.test_client()
+    results = {"rows": counts, "query_plans": database.explain_query_plans(), "routes": {}, "models": {}}
+    for method, route, body in ROUTES:
+        name = f"{method} {route}"
+        if body and route.startswith("/api/queue/staffing"):
+            name += " " + json.dumps(body, sort_keys=True)
+        results["routes"][name] = measure(
+            _route_call(client, method, route, body, http_cache), iterations, warmup
+        )
+    for name, fn in MODEL_FUNCTIONS.items():
+        results["models"][name] = measure(fn, iterations, warmup)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Print p50/p95 ratios against a baseline; return names that regressed."""
+    regressions = []
+    for size, sections in current["results"].items():
+        base_size = baseline.get("results", {}).get(size)
+        if not base_size:
+            continue
+        for kind in ("routes", "models"):
+            for name, stats in sections[kind].items():
+                base = base_size.get(kind, {}).get(name)
+                if not base:
+                    continue
+                p50 = stats["p50_ms"] / base["p50_ms"] if base["p50_ms"] else 1.0
+                p95 = stats["p95_ms"] / base["p95_ms"] if base["p95_ms"] else 1.0
+                flag = ""
+                if p50 > 1 + threshold:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{size} {name}")
+                print(f"{size:>8}  {name:<70} p50 x{p50:5.2f}  p95 x{p95:5.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealFlow benchmark suite")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="departments:months list")
+    parser.add_argument("-n", "--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed p50 slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--http-cache", action="store_true",
+                        help="keep the HTTP response cache and precomputed snapshots warm "
+                             "(measures repeat polls)")
+    args = parser.parse_args(argv)
+
+    sizes = [tuple(int(x) for x in s.split(":")) for s in args.sizes.split(",")]
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+        },
+        "results": {},
+    }
+    original_db = database.DB_PATH
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            for departments, months in sizes:
+                key = f"{departments}x{months}"
+                print(f"[bench] {key}: {departments} departments, {months} months", file=sys.stderr)
+                report["results"][key] = run_size(
+                    departments, months, args.iterations, args.warmup, workdir,
+                    args.http_cache,
+                )
+        finally:
+            database.use_database(original_db)
+            response_cache.clear()
+            scheduler.clear()
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(encoded)
+    else:
+        print(encoded)
+
+    scans = [
+        f"{size} {name}"
+        for size, sections in report["results"].items()
+        for name, plan in sections["query_plans"].items()
+        if not plan["uses_index"]
+    ]
+    for scan in scans:
+        print(f"[bench] {scan}: query plan does not use an index", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            return 1
+    return 1 if scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
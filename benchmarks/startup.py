@@ -0,0 +1,84 @@
+"""
+Cold-start budget check: times `import api.app` and the first API request
+in fresh interpreters, net of the Flask import itself, and exits 1 when the
+median exceeds the budget. Each run starts without a database and seeds it
+from a snapshot built once up front, as a deploy does
+(python -m models.database --build-snapshot).
+
+Usage:
+    python benchmarks/startup.py                  # default budgets
+    python benchmarks/startup.py --runs 9 --import-budget-ms 40 --request-budget-ms 40
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Measured inside the child so interpreter start-up is excluded
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+import flask
+t1 = time.perf_counter()
+from api.app import app
+t2 = time.perf_counter()
+app.test_client().get("/api/overview/stats").get_data()
+t3 = time.perf_counter()
+print(json.dumps({{"flask": t1 - t0, "app": t2 - t1, "first_request": t3 - t2}}))
+"""
+
+
+def probe(env):
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(root=ROOT)],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HealFlow cold-start budget")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--import-budget-ms", type=float, default=50,
+                        help="median api.app import time beyond Flask itself")
+    parser.add_argument("--request-budget-ms", type=float, default=50,
+                        help="median first /api/overview/stats request on an empty DB path")
+    parser.add_argument("--no-snapshot", action="store_true",
+                        help="regenerate the demo database on every cold start instead")
+    args = parser.parse_args(argv)
+
+    samples = []
+    with tempfile.TemporaryDirectory() as workdir:
+        snapshot = os.path.join(workdir, "snapshot.db")
+        if not args.no_snapshot:
+            subprocess.run(
+                [sys.executable, "-m", "models.database", "--build-snapshot", snapshot],
+                cwd=ROOT, capture_output=True, check=True,
+            )
+        for i in range(args.runs):
+            env = dict(os.environ)
+            env["HEALFLOW_DB_SNAPSHOT"] = snapshot
+            # Every run starts without a database, as on a fresh serverless instance
+            env["HEALFLOW_DB_PATH"] = os.path.join(workdir, f"cold_{i}.db")
+            samples.append(probe(env))
+
+    report = {
+        key: round(statistics.median(s[key] for s in samples) * 1000, 2)
+        for key in ("flask", "app", "first_request")
+    }
+    report["import_budget_ms"] = args.import_budget_ms
+    report["request_budget_ms"] = args.request_budget_ms
+    print(json.dumps(report, indent=2))
+
+    over = report["app"] > args.import_budget_ms or report["first_request"] > args.request_budget_ms
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,15 +3,71 @@ Hospital database: uses fixed seed for reproducible, realistic data.
 Serverless-safe (Vercel) and localhost-safe.
 """
 
+import contextvars
 import os
+import queue
+import re
+import shutil
 import sqlite3
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from flask import g, has_app_context
+
+from models.errors import Conflict, NotFound
+from models.metrics import CONNECTION_FACTORY
+
+# Supply catalogue: (name, supplier, unit, current_stock, min_required,
+# daily_usage, lead_time_days, unit_cost, auto_order)
+SUPPLY_ITEMS_FIXED = [
+    ("PPE Kits (N95 Masks)", "MedSupply Co.", "units", 380, 1000, 95, 4, 1.75, 1),
+    ("Surgical Gloves", "HealthCare Supplies Inc.", "units", 2500, 2000, 250, 3, 0.20, 0),
+    ("IV Fluids (Saline)", "Pharma Direct", "units", 220, 500, 48, 3, 4.00, 1),
+    ("Antibiotics (Amoxicillin)", "MediPharm Ltd.", "units", 620, 400, 38, 5, 0.90, 0),
+    ("Oxygen Cylinders", "OxygenTech", "cylinders", 22, 50, 10, 2, 120.00, 1),
+    ("Syringes (Disposable)", "MedSupply Co.", "units", 6200, 3000, 480, 3, 0.12, 0),
+]
+
+# Day-to-day usage variation for seeded history (averages exactly 1.0)
+SUPPLY_USAGE_PATTERN = [0.96, 1.03, 1.10, 1.07, 1.01, 0.92, 0.91]
+
+# Days of usage kept in the rolling rate
+USAGE_WINDOW_DAYS = 7
+
+STOCK_MOVEMENT_KINDS = ("usage", "receipt", "adjust")
+
+# Share of a day's dispensing per hour, used to backfill hourly history
+_DISPENSING_WEIGHTS = [
+    1, 1, 1, 1, 1, 2, 3, 5, 6, 7, 7, 6,
+    6, 6, 5, 5, 5, 5, 5, 4, 3, 2, 2, 1,
+]
+
+
+def split_daily_usage(quantity):
+    """Split a daily quantity into 24 integer hourly quantities summing to it."""
+    total = sum(_DISPENSING_WEIGHTS)
+    hours, cumulative, previous = [], 0, 0
+    for weight in _DISPENSING_WEIGHTS:
+        cumulative += weight
+        current = quantity * cumulative // total
+        hours.append(current - previous)
+        previous = current
+    return hours
+
+# Facility served when no other one is selected (the original hospital.db)
+DEFAULT_FACILITY = "main"
+
 # FORCE demo mode on Vercel (no DB, no filesystem) – stubs only, no SystemExit
 FORCE_DEMO = True if os.environ.get("VERCEL") is not None else False
 if FORCE_DEMO:
     def init_db():
         pass
 
+    def init_app(app):
+        pass
+
     def get_bed_allocation():
         return [
             ("Emergency", 30, 24),
@@ -42,6 +98,72 @@ if FORCE_DEMO:
     def get_total_patients_today():
         return 186
 
+    def admit_patient(department, patient_id):
+        raise RuntimeError("Bed updates are unavailable in demo mode")
+
+    def discharge_patient(department, bed_number):
+        raise RuntimeError("Bed updates are unavailable in demo mode")
+
+    def transfer_patient(department, bed_number, to_department):
+        raise RuntimeError("Bed updates are unavailable in demo mode")
+
+    def get_supply_items():
+        return [
+            (i, name, supplier, unit, stock, minimum, lead, cost, auto)
+            for i, (name, supplier, unit, stock, minimum, _, lead, cost, auto)
+            in enumerate(SUPPLY_ITEMS_FIXED, start=1)
+        ]
+
+    def get_supply_usage(days=USAGE_WINDOW_DAYS):
+        return [
+            (i, item[5] * days) for i, item in enumerate(SUPPLY_ITEMS_FIXED, start=1)
+        ]
+
+    def get_supply_version():
+        return 0
+
+    def get_usage_buckets(hourly, since):
+        today = datetime.now().date()
+        rows = []
+        for i, item in enumerate(SUPPLY_ITEMS_FIXED, start=1):
+            for d in range(USAGE_WINDOW_DAYS * 2, 0, -1):
+                day = today - timedelta(days=d)
+                quantity = round(item[5] * SUPPLY_USAGE_PATTERN[d % len(SUPPLY_USAGE_PATTERN)])
+                if not hourly:
+                    rows.append((i, day.isoformat(), quantity))
+                    continue
+                for hour, q in enumerate(split_daily_usage(quantity)):
+                    rows.append((i, f"{day.isoformat()} {hour:02d}", q))
+        return [r for r in rows if r[1] >= since]
+
+    def record_usage_batch(rows):
+        raise RuntimeError("Usage ingestion is unavailable in demo mode")
+
+    def record_stock_movement(item_id, quantity, kind="usage", at=None):
+        raise RuntimeError("Stock updates are unavailable in demo mode")
+
+    def facility_ids():
+        return [DEFAULT_FACILITY]
+
+    def current_facility():
+        return DEFAULT_FACILITY
+
+    @contextmanager
+    def facility(facility_id):
+        if facility_id != DEFAULT_FACILITY:
+            raise NotFound(f"Unknown facility {facility_id}")
+        yield facility_id
+
+    def register_facility(facility_id, path=None):
+        raise RuntimeError("Facilities cannot be added in demo mode")
+
+    def fan_out(fn, *args, facilities=None, **kwargs):
+        ids = list(facilities) if facilities is not None else facility_ids()
+        for facility_id in ids:
+            if facility_id != DEFAULT_FACILITY:
+                raise NotFound(f"Unknown facility {facility_id}")
+        return {facility_id: fn(*args, **kwargs) for facility_id in ids}
+
     def get_staff_count():
         return [
             ("Emergency", 18),
@@ -60,7 +182,23 @@ else:
 
     BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 
-    DB_PATH = "/tmp/hospital.db" if IS_VERCEL else os.path.join(BASE_DIR, "hospital.db")
+    DB_PATH = os.environ.get("HEALFLOW_DB_PATH") or (
+        "/tmp/hospital.db" if IS_VERCEL else os.path.join(BASE_DIR, "hospital.db")
+    )
+
+    # Other facilities get one SQLite file each: <FACILITY_DIR>/<facility id>.db
+    FACILITY_DIR = os.environ.get("HEALFLOW_FACILITY_DIR") or os.path.join(BASE_DIR, "facilities")
+    FACILITY_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+    # Threads for cross-facility queries (sqlite3 releases the GIL while a
+    # statement runs, so per-facility queries overlap)
+    FANOUT_WORKERS = int(os.environ.get("HEALFLOW_FANOUT_WORKERS", "8"))
+
+    # Prebuilt demo database copied into place on a cold start instead of
+    # regenerating it (build with: python -m models.database --build-snapshot)
+    SNAPSHOT_PATH = os.environ.get("HEALFLOW_DB_SNAPSHOT") or os.path.join(
+        BASE_DIR, "data", "hospital_snapshot.db"
+    )
 
     # Ensure directory exists (safe even if already exists)
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
@@ -89,29 +227,478 @@ else:
     def _deterministic_index(seed, i, mod):
         return (seed * 31 + i) % mod
 
-    def _connect():
-        return sqlite3.connect(DB_PATH)
+    # Pooled connections are shared across worker threads, one at a time
+    POOL_SIZE = int(os.environ.get("HEALFLOW_DB_POOL_SIZE", "8"))
+    STATEMENT_CACHE_SIZE = 128
+    MMAP_SIZE = 64 * 1024 * 1024
+
+    class Shard:
+        """One facility's SQLite file and its connection pool."""
+
+        def __init__(self, path):
+            self.path = path
+            self.pool = queue.LifoQueue(maxsize=POOL_SIZE)
+            self.ready = False
+            self.lock = threading.Lock()
+
+        def connect(self):
+            conn = sqlite3.connect(
+                self.path,
+                factory=CONNECTION_FACTORY,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE_SIZE,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+            return conn
+
+        def ensure(self):
+            """
+            Ensure the file exists and is migrated.
+            CRITICAL for Vercel serverless cold starts.
+            The filesystem check runs once per process.
+            """
+            if self.ready:
+                return
+            with self.lock:
+                if not self.ready:
+                    if not os.path.exists(self.path):
+                        if os.path.exists(SNAPSHOT_PATH):
+                            self.copy_snapshot()
+                        else:
+                            conn = self.connect()
+                            _load_demo(conn)
+                            conn.close()
+                    conn = self.connect()
+                    migrate(conn.cursor())
+                    conn.commit()
+                    conn.close()
+                    self.ready = True
+
+        def copy_snapshot(self):
+            # Copy beside the target then rename, so readers never see a partial file
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            shutil.copyfile(SNAPSHOT_PATH, tmp_path)
+            conn = sqlite3.connect(tmp_path)
+            _rebase_snapshot(conn, datetime.now())
+            conn.close()
+            os.replace(tmp_path, self.path)
+
+        def acquire(self):
+            try:
+                return self.pool.get_nowait()
+            except queue.Empty:
+                return self.connect()
+
+        def release(self, conn):
+            try:
+                self.pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+        def close_all(self):
+            while True:
+                try:
+                    self.pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    _shards = {DEFAULT_FACILITY: Shard(DB_PATH)}
+    _shards_lock = threading.Lock()
+    _discovered = False
+    _current_facility = contextvars.ContextVar("facility", default=DEFAULT_FACILITY)
+    _fanout_pool = None
+
+    def _discover():
+        """Register every <id>.db in FACILITY_DIR (once per process)."""
+        global _discovered
+        with _shards_lock:
+            if _discovered:
+                return
+            if os.path.isdir(FACILITY_DIR):
+                for entry in sorted(os.scandir(FACILITY_DIR), key=lambda e: e.name):
+                    facility_id = entry.name[:-3]
+                    if entry.name.endswith(".db") and FACILITY_ID_RE.match(facility_id):
+                        _shards.setdefault(facility_id, Shard(entry.path))
+            _discovered = True
+
+    def _shard(facility_id=None):
+        facility_id = facility_id or _current_facility.get()
+        shard = _shards.get(facility_id)
+        if shard is None:
+            _discover()
+            shard = _shards.get(facility_id)
+            if shard is None:
+                raise NotFound(f"Unknown facility {facility_id}")
+        return shard
+
+    def current_facility():
+        """Facility the current thread/context routes queries to."""
+        return _current_facility.get()
+
+    def facility_ids():
+        """Registered facilities, the default one first."""
+        _discover()
+        with _shards_lock:
+            return list(_shards)
+
+    def register_facility(facility_id, path=None):
+        """
+        Add a facility backed by `path` (default: FACILITY_DIR/<id>.db). A
+        missing file is created with the demo hospital on first use.
+        """
+        if not FACILITY_ID_RE.match(facility_id or ""):
+            raise ValueError(f"Invalid facility id {facility_id!r}")
+        path = os.path.abspath(path or os.path.join(FACILITY_DIR, f"{facility_id}.db"))
+        _discover()
+        with _shards_lock:
+            existing = _shards.get(facility_id)
+            if existing is not None and os.path.abspath(existing.path) != path:
+                raise Conflict(f"Facility {facility_id} already uses {existing.path}")
+            if existing is None:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _shards[facility_id] = Shard(path)
+        return facility_id
+
+    @contextmanager
+    def facility(facility_id):
+        """Route queries in this thread/context to another facility's database."""
+        _shard(facility_id)
+        token = _current_facility.set(facility_id)
+        try:
+            yield facility_id
+        finally:
+            _current_facility.reset(token)
+
+    def _run_in(facility_id, fn, args, kwargs):
+        with facility(facility_id):
+            return fn(*args, **kwargs)
+
+    def fan_out(fn, *args, facilities=None, **kwargs):
+        """
+        Call fn(*args, **kwargs) once per facility (default: all), in
+        parallel, each scoped to that facility's database. Returns
+        {facility_id: result}. Not reentrant: fn must not fan out itself.
+        """
+        global _fanout_pool
+        ids = list(facilities) if facilities is not None else facility_ids()
+        for facility_id in ids:
+            _shard(facility_id)
+        if len(ids) == 1:
+            return {ids[0]: _run_in(ids[0], fn, args, kwargs)}
+        with _shards_lock:
+            if _fanout_pool is None:
+                _fanout_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+        futures = {
+            facility_id: _fanout_pool.submit(_run_in, facility_id, fn, args, kwargs)
+            for facility_id in ids
+        }
+        return {facility_id: future.result() for facility_id, future in futures.items()}
 
     def ensure_db():
+        _shard().ensure()
+
+    @contextmanager
+    def get_connection():
         """
-        Ensure DB exists and is initialized.
-        CRITICAL for Vercel serverless cold starts.
+        Yield a pooled connection to the current facility's database. Inside
+        a Flask app context the same connection per facility is reused for
+        the whole request and released on teardown.
         """
-        if not os.path.exists(DB_PATH):
-            init_db()
+        shard = _shard()
+        shard.ensure()
+        if has_app_context():
+            if "db_conns" not in g:
+                g.db_conns = {}
+            conn = g.db_conns.get(shard)
+            if conn is None:
+                conn = g.db_conns[shard] = shard.acquire()
+            yield conn
+            return
+        conn = shard.acquire()
+        try:
+            yield conn
+        finally:
+            shard.release(conn)
+
+    def close_connection(exc=None):
+        conns = g.pop("db_conns", None)
+        if not conns:
+            return
+        for shard, conn in conns.items():
+            if exc is not None:
+                conn.rollback()
+            shard.release(conn)
+
+    def init_app(app):
+        """Return request connections to the pool when the app context ends."""
+        app.teardown_appcontext(close_connection)
+
+    def use_database(path):
+        """Point the default facility at another SQLite file (benchmarks, load tests)."""
+        global DB_PATH
+        shard = _shards[DEFAULT_FACILITY]
+        with shard.lock:
+            shard.close_all()
+            shard.path = DB_PATH = path
+            shard.ready = False
+
+    @contextmanager
+    def _write_transaction(conn):
+        """BEGIN IMMEDIATE so read-then-update bed changes cannot interleave."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
 
     # -----------------------------------------------------------------------------
     # Initialization
     # -----------------------------------------------------------------------------
 
-    def init_db():
-        conn = _connect()
-        cursor = conn.cursor()
+    def _create_bed_occupancy(cursor):
+        """
+        Per-department bed summary kept current by triggers on beds, so
+        occupancy reads are O(departments). Also mirrors the counts into
+        departments.total_beds / occupied_beds. Backfills when created on
+        an existing database.
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bed_occupancy'"
+        ).fetchone()
+        if exists:
+            return
+
+        cursor.execute("""
+            CREATE TABLE bed_occupancy (
+                department TEXT PRIMARY KEY,
+                total_beds INTEGER NOT NULL DEFAULT 0,
+                occupied_beds INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO bed_occupancy (department, total_beds, occupied_beds)
+            SELECT department, COUNT(*), SUM(status = 'Occupied')
+            FROM beds
+            GROUP BY department
+        """)
+
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS beds_occupancy_insert AFTER INSERT ON beds
+            BEGIN
+                INSERT OR IGNORE INTO bed_occupancy (department) VALUES (NEW.department);
+                UPDATE bed_occupancy
+                SET total_beds = total_beds + 1,
+                    occupied_beds = occupied_beds + (NEW.status = 'Occupied')
+                WHERE department = NEW.department;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS beds_occupancy_delete AFTER DELETE ON beds
+            BEGIN
+                UPDATE bed_occupancy
+                SET total_beds = total_beds - 1,
+                    occupied_beds = occupied_beds - (OLD.status = 'Occupied')
+                WHERE department = OLD.department;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS beds_occupancy_update AFTER UPDATE OF status, department ON beds
+            BEGIN
+                UPDATE bed_occupancy
+                SET total_beds = total_beds - 1,
+                    occupied_beds = occupied_beds - (OLD.status = 'Occupied')
+                WHERE department = OLD.department;
+                INSERT OR IGNORE INTO bed_occupancy (department) VALUES (NEW.department);
+                UPDATE bed_occupancy
+                SET total_beds = total_beds + 1,
+                    occupied_beds = occupied_beds + (NEW.status = 'Occupied')
+                WHERE department = NEW.department;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS bed_occupancy_sync AFTER UPDATE ON bed_occupancy
+            BEGIN
+                UPDATE departments
+                SET total_beds = NEW.total_beds, occupied_beds = NEW.occupied_beds
+                WHERE name = NEW.department;
+            END
+        """)
 
+    def _create_indexes(cursor):
+        """Covering indexes for the per-department and admission-date queries."""
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_patients_admission_time ON patients (admission_time)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_patients_department ON patients (department)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_beds_department_status ON beds (department, status)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_beds_bed_number ON beds (bed_number)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_staff_department ON staff (department)"
+        )
+
+    def _create_supply_tables(cursor):
+        """
+        Supply catalogue, raw stock movements and per-item daily usage buckets.
+        A trigger applies each movement to current_stock and the day's usage
+        bucket, so rolling rates never re-scan raw movements. Seeds the demo
+        catalogue with USAGE_WINDOW_DAYS x 2 days of usage history.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS supply_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                supplier TEXT,
+                unit TEXT,
+                current_stock INTEGER NOT NULL DEFAULT 0,
+                min_required INTEGER NOT NULL DEFAULT 0,
+                lead_time_days INTEGER NOT NULL DEFAULT 3,
+                unit_cost REAL NOT NULL DEFAULT 0,
+                auto_order INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_movements (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                moved_at TIMESTAMP NOT NULL
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS supply_usage_daily (
+                item_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (item_id, day)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_stock_movements_item_time "
+            "ON stock_movements (item_id, moved_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_supply_usage_daily_day ON supply_usage_daily (day)"
+        )
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS stock_movements_apply AFTER INSERT ON stock_movements
+            BEGIN
+                UPDATE supply_items SET current_stock = current_stock + NEW.quantity
+                WHERE id = NEW.item_id;
+                INSERT INTO supply_usage_daily (item_id, day, quantity)
+                SELECT NEW.item_id, substr(NEW.moved_at, 1, 10), -NEW.quantity
+                WHERE NEW.kind = 'usage'
+                ON CONFLICT (item_id, day) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END
+        """)
+
+        if cursor.execute("SELECT COUNT(*) FROM supply_items").fetchone()[0]:
+            return
+        today = datetime.now().date()
+        for name, supplier, unit, stock, minimum, usage, lead, cost, auto in SUPPLY_ITEMS_FIXED:
+            cursor.execute(
+                "INSERT INTO supply_items (name, supplier, unit, current_stock, min_required, "
+                "lead_time_days, unit_cost, auto_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, supplier, unit, stock, minimum, lead, cost, auto),
+            )
+            item_id = cursor.lastrowid
+            cursor.executemany(
+                "INSERT INTO supply_usage_daily (item_id, day, quantity) VALUES (?, ?, ?)",
+                [
+                    (
+                        item_id,
+                        (today - timedelta(days=d)).isoformat(),
+                        round(usage * SUPPLY_USAGE_PATTERN[d % len(SUPPLY_USAGE_PATTERN)]),
+                    )
+                    for d in range(1, USAGE_WINDOW_DAYS * 2 + 1)
+                ],
+            )
+
+    def _create_usage_hourly(cursor):
+        """
+        Hourly usage buckets ('YYYY-MM-DD HH'), maintained by a trigger like
+        the daily ones and backfilled by splitting existing daily totals.
+        """
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS supply_usage_hourly (
+                item_id INTEGER NOT NULL,
+                hour TEXT NOT NULL,
+                quantity INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (item_id, hour)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_supply_usage_hourly_hour ON supply_usage_hourly (hour)"
+        )
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS stock_movements_hourly AFTER INSERT ON stock_movements
+            WHEN NEW.kind = 'usage'
+            BEGIN
+                INSERT INTO supply_usage_hourly (item_id, hour, quantity)
+                VALUES (NEW.item_id, substr(NEW.moved_at, 1, 13), -NEW.quantity)
+                ON CONFLICT (item_id, hour) DO UPDATE SET quantity = quantity + excluded.quantity;
+            END
+        """)
+        daily = cursor.execute("SELECT item_id, day, quantity FROM supply_usage_daily").fetchall()
+        cursor.executemany(
+            "INSERT OR IGNORE INTO supply_usage_hourly (item_id, hour, quantity) VALUES (?, ?, ?)",
+            (
+                (item_id, f"{day} {hour:02d}", q)
+                for item_id, day, quantity in daily
+                for hour, q in enumerate(split_daily_usage(quantity))
+            ),
+        )
+
+    # Schema migrations, applied in order; PRAGMA user_version records how
+    # many have run. Append new steps, never reorder or edit shipped ones.
+    MIGRATIONS = [
+        _create_bed_occupancy,
+        _create_indexes,
+        _create_supply_tables,
+        _create_usage_hourly,
+    ]
+    SCHEMA_VERSION = len(MIGRATIONS)
+
+    def migrate(cursor):
+        """Apply pending migrations; returns the resulting schema version."""
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        for step in MIGRATIONS[version:]:
+            step(cursor)
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return SCHEMA_VERSION
+
+    INSERT_DEPARTMENT_SQL = "INSERT INTO departments (name, total_beds, occupied_beds) VALUES (?, ?, ?)"
+    INSERT_PATIENT_SQL = "INSERT INTO patients (name, department, admission_time, status) VALUES (?, ?, ?, ?)"
+    INSERT_BED_SQL = "INSERT INTO beds (department, bed_number, status, patient_id) VALUES (?, ?, ?, ?)"
+    INSERT_STAFF_SQL = "INSERT INTO staff (name, department, role, shift) VALUES (?, ?, ?, ?)"
+
+    PATIENT_STATUSES = ["Admitted", "Under Treatment", "Recovery"]
+    STAFF_ROLES = ["Doctor", "Nurse", "Technician"]
+    STAFF_SHIFTS = ["Morning", "Evening", "Night"]
+
+    def create_schema(cursor):
+        """Drop and recreate the base tables (schema version 0)."""
         cursor.execute("DROP TABLE IF EXISTS patients")
         cursor.execute("DROP TABLE IF EXISTS departments")
         cursor.execute("DROP TABLE IF EXISTS beds")
         cursor.execute("DROP TABLE IF EXISTS staff")
+        cursor.execute("DROP TABLE IF EXISTS bed_occupancy")
+        cursor.execute("DROP TABLE IF EXISTS supply_items")
+        cursor.execute("DROP TABLE IF EXISTS stock_movements")
+        cursor.execute("DROP TABLE IF EXISTS supply_usage_daily")
+        cursor.execute("DROP TABLE IF EXISTS supply_usage_hourly")
+        cursor.execute("PRAGMA user_version = 0")
 
         cursor.execute("""
             CREATE TABLE departments (
@@ -152,107 +739,348 @@ else:
             )
         """)
 
-        cursor.executemany(
-            "INSERT INTO departments (name, total_beds, occupied_beds) VALUES (?, ?, ?)",
-            DEPARTMENTS_FIXED,
-        )
+    def bed_rows(departments, prefix=None):
+        """
+        Bed rows for (name, total, occupied) departments; lowest numbers occupied.
+        prefix(name) gives the bed-number prefix (default: first 3 letters).
+        """
+        for dept_name, total, occupied in departments:
+            tag = prefix(dept_name) if prefix else dept_name[:3].upper()
+            for i in range(1, total + 1):
+                bed_status = "Occupied" if i <= occupied else "Available"
+                patient_id = i if bed_status == "Occupied" else None
+                yield (dept_name, f"{tag}-{i:02d}", bed_status, patient_id)
 
-        dept_names = [d[0] for d in DEPARTMENTS_FIXED]
-        now = datetime.now()
+    def staff_rows(dept_names, per_department):
+        for dept_name in dept_names:
+            for i in range(per_department):
+                yield (
+                    f"Staff-{dept_name[:3]}-{i}",
+                    dept_name,
+                    STAFF_ROLES[_deterministic_index(5, i, 3)],
+                    STAFF_SHIFTS[_deterministic_index(13, i, 3)],
+                )
 
+    def _demo_patient_rows(dept_names, now):
         for i in range(50):
-            dept = dept_names[_deterministic_index(42, i, len(dept_names))]
-            name = PATIENT_NAMES[_deterministic_index(7, i, len(PATIENT_NAMES))]
-            admission = now - timedelta(hours=(6 + (i * 17) % 42))
-            status = ["Admitted", "Under Treatment", "Recovery"][_deterministic_index(3, i, 3)]
-
-            cursor.execute(
-                "INSERT INTO patients (name, department, admission_time, status) VALUES (?, ?, ?, ?)",
-                (name, dept, admission, status),
+            yield (
+                PATIENT_NAMES[_deterministic_index(7, i, len(PATIENT_NAMES))],
+                dept_names[_deterministic_index(42, i, len(dept_names))],
+                (now - timedelta(hours=(6 + (i * 17) % 42))).isoformat(sep=" "),
+                PATIENT_STATUSES[_deterministic_index(3, i, 3)],
             )
 
-        for dept_name, total, occupied in DEPARTMENTS_FIXED:
-            for i in range(1, total + 1):
-                bed_status = "Occupied" if i <= occupied else "Available"
-                patient_id = i if bed_status == "Occupied" else None
+    def _load_demo(conn, now=None):
+        cursor = conn.cursor()
+        create_schema(cursor)
 
-                cursor.execute(
-                    "INSERT INTO beds (department, bed_number, status, patient_id) VALUES (?, ?, ?, ?)",
-                    (dept_name, f"{dept_name[:3].upper()}-{i:02d}", bed_status, patient_id),
-                )
+        dept_names = [d[0] for d in DEPARTMENTS_FIXED]
+        cursor.executemany(INSERT_DEPARTMENT_SQL, DEPARTMENTS_FIXED)
+        cursor.executemany(INSERT_PATIENT_SQL, _demo_patient_rows(dept_names, now or datetime.now()))
+        cursor.executemany(INSERT_BED_SQL, bed_rows(DEPARTMENTS_FIXED))
+        cursor.executemany(INSERT_STAFF_SQL, staff_rows(dept_names, 6))
 
-        staff_roles = ["Doctor", "Nurse", "Technician"]
-        staff_shifts = ["Morning", "Evening", "Night"]
+        # Summary table and indexes are built once over the loaded rows
+        migrate(cursor)
+        conn.commit()
 
-        for dept_name, _, _ in DEPARTMENTS_FIXED:
-            for i in range(6):
-                cursor.execute(
-                    "INSERT INTO staff (name, department, role, shift) VALUES (?, ?, ?, ?)",
-                    (
-                        f"Staff-{dept_name[:3]}-{i}",
-                        dept_name,
-                        staff_roles[_deterministic_index(5, i, 3)],
-                        staff_shifts[_deterministic_index(13, i, 3)],
-                    ),
+    def _rebase_snapshot(conn, now):
+        """
+        Shift a snapshot's data from its build time to `now`: timestamps move
+        by the elapsed time, day and hour usage buckets by whole days.
+        """
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'snapshot_info'"
+        ).fetchone():
+            # Built before build times were recorded: copied as is
+            return
+        built_at = datetime.fromisoformat(conn.execute("SELECT built_at FROM snapshot_info").fetchone()[0])
+        elapsed = now - built_at
+        days = (now.date() - built_at.date()).days
+
+        def shift(stamp):
+            return (datetime.fromisoformat(stamp) + elapsed).isoformat(sep=" ")
+
+        def shift_day(day):
+            return (datetime.fromisoformat(day[:10]) + timedelta(days=days)).date().isoformat() + day[10:]
+
+        with conn:
+            conn.executemany(
+                "UPDATE patients SET admission_time = ? WHERE id = ?",
+                [(shift(t), pid) for pid, t in conn.execute(
+                    "SELECT id, admission_time FROM patients WHERE admission_time IS NOT NULL")],
+            )
+            conn.executemany(
+                "UPDATE stock_movements SET moved_at = ? WHERE id = ?",
+                [(shift(t), mid) for mid, t in conn.execute("SELECT id, moved_at FROM stock_movements")],
+            )
+            # Bucket keys are primary keys: rewrite each table rather than
+            # update in place, where shifted keys could collide mid-statement
+            for table, column in (("supply_usage_daily", "day"), ("supply_usage_hourly", "hour")):
+                rows = conn.execute(f"SELECT item_id, {column}, quantity FROM {table}").fetchall()
+                conn.execute(f"DELETE FROM {table}")
+                conn.executemany(
+                    f"INSERT INTO {table} (item_id, {column}, quantity) VALUES (?, ?, ?)",
+                    [(item_id, shift_day(key), q) for item_id, key, q in rows],
                 )
+            conn.execute("UPDATE snapshot_info SET built_at = ?", (now.isoformat(sep=" "),))
 
+    def init_db():
+        """(Re)create the current facility's database with the demo hospital."""
+        shard = _shard()
+        with shard.lock:
+            conn = shard.connect()
+            _load_demo(conn)
+            conn.close()
+            shard.ready = True
+
+    def build_snapshot(path=None):
+        """
+        Write the demo database to a standalone, compacted file (no WAL) for
+        ensure_db() to copy on cold start. The build time is recorded so the
+        copy can move admission and usage dates up to the current date.
+        """
+        path = path or SNAPSHOT_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        now = datetime.now()
+        _load_demo(conn, now)
+        conn.execute("CREATE TABLE snapshot_info (built_at TEXT NOT NULL)")
+        conn.execute("INSERT INTO snapshot_info (built_at) VALUES (?)", (now.isoformat(sep=" "),))
         conn.commit()
+        conn.execute("VACUUM")
         conn.close()
+        os.replace(tmp_path, path)
+        return path
 
     # -----------------------------------------------------------------------------
     # Query Functions (ALL serverless-safe)
     # -----------------------------------------------------------------------------
 
+    PATIENTS_BY_DEPARTMENT_SQL = "SELECT department, COUNT(*) FROM patients GROUP BY department"
+    # Half-open timestamp range so idx_patients_admission_time can be used
+    PATIENTS_SINCE_SQL = "SELECT COUNT(*) FROM patients WHERE admission_time >= ? AND admission_time < ?"
+    STAFF_BY_DEPARTMENT_SQL = "SELECT department, COUNT(*) FROM staff GROUP BY department"
+
+    def _day_bounds(day):
+        start = datetime.combine(day, time.min)
+        return start.isoformat(sep=" "), (start + timedelta(days=1)).isoformat(sep=" ")
+
     def get_patient_data():
-        ensure_db()
-        conn = _connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT department, COUNT(*) FROM patients GROUP BY department")
-        data = cursor.fetchall()
-        conn.close()
-        return data
+        with get_connection() as conn:
+            return conn.execute(PATIENTS_BY_DEPARTMENT_SQL).fetchall()
 
     def get_department_data():
-        ensure_db()
-        conn = _connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT name, total_beds, occupied_beds FROM departments")
-        data = cursor.fetchall()
-        conn.close()
-        return data
+        with get_connection() as conn:
+            return conn.execute(
+                "SELECT name, total_beds, occupied_beds FROM departments"
+            ).fetchall()
 
     def get_bed_allocation():
-        ensure_db()
-        conn = _connect()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT department,
-                   COUNT(*) AS total_beds,
-                   SUM(CASE WHEN status = 'Occupied' THEN 1 ELSE 0 END)
-            FROM beds
-            GROUP BY department
-        """)
-        data = cursor.fetchall()
-        conn.close()
-        return data
+        with get_connection() as conn:
+            return conn.execute("""
+                SELECT department, total_beds, occupied_beds
+                FROM bed_occupancy
+                WHERE total_beds > 0
+                ORDER BY department
+            """).fetchall()
 
     def get_total_patients_today():
-        ensure_db()
-        conn = _connect()
-        cursor = conn.cursor()
-        today = datetime.now().date()
-        cursor.execute(
-            "SELECT COUNT(*) FROM patients WHERE DATE(admission_time) = ?", (today,)
-        )
-        count = cursor.fetchone()[0]
-        conn.close()
-        return count
+        with get_connection() as conn:
+            return conn.execute(
+                PATIENTS_SINCE_SQL, _day_bounds(datetime.now().date())
+            ).fetchone()[0]
 
     def get_staff_count():
-        ensure_db()
-        conn = _connect()
-        cursor = conn.cursor()
-        cursor.execute("SELECT department, COUNT(*) FROM staff GROUP BY department")
-        data = cursor.fetchall()
-        conn.close()
-        return data
+        with get_connection() as conn:
+            return conn.execute(STAFF_BY_DEPARTMENT_SQL).fetchall()
+
+    def explain_query_plans():
+        """
+        EXPLAIN QUERY PLAN for the hot read queries, with a flag telling
+        whether each one is answered from an index rather than a table scan.
+        """
+        queries = {
+            "patients_by_department": (PATIENTS_BY_DEPARTMENT_SQL, ()),
+            "patients_today": (PATIENTS_SINCE_SQL, _day_bounds(datetime.now().date())),
+            "staff_by_department": (STAFF_BY_DEPARTMENT_SQL, ()),
+        }
+        plans = {}
+        with get_connection() as conn:
+            for name, (sql, params) in queries.items():
+                details = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+                plans[name] = {
+                    "plan": details,
+                    "uses_index": all("INDEX" in d for d in details if d.startswith(("SCAN", "SEARCH"))),
+                }
+        return plans
+
+    # -----------------------------------------------------------------------------
+    # Bed updates (occupancy summary follows via triggers)
+    # -----------------------------------------------------------------------------
+
+    def _occupy_free_bed(conn, department, patient_id):
+        bed = conn.execute(
+            "SELECT id, bed_number FROM beds WHERE department = ? AND status = 'Available' "
+            "ORDER BY id LIMIT 1",
+            (department,),
+        ).fetchone()
+        if bed is None:
+            if not conn.execute("SELECT 1 FROM beds WHERE department = ? LIMIT 1", (department,)).fetchone():
+                raise ValueError(f"Unknown department {department}")
+            raise Conflict(f"No available bed in {department}")
+        conn.execute(
+            "UPDATE beds SET status = 'Occupied', patient_id = ? WHERE id = ?",
+            (patient_id, bed[0]),
+        )
+        return {"department": department, "bed_number": bed[1], "patient_id": patient_id}
+
+    def _occupied_bed(conn, department, bed_number):
+        """(id, patient_id) of an occupied bed; bed numbers are unique only per department."""
+        if not department or not bed_number:
+            raise ValueError("department and bed_number are required")
+        bed = conn.execute(
+            "SELECT id, patient_id, status FROM beds WHERE department = ? AND bed_number = ?",
+            (department, bed_number),
+        ).fetchone()
+        if bed is None:
+            raise NotFound(f"Unknown bed {bed_number} in {department}")
+        if bed[2] != "Occupied":
+            raise Conflict(f"Bed {bed_number} in {department} is not occupied")
+        return bed[:2]
+
+    def admit_patient(department, patient_id):
+        """Place an admitted patient in the first available bed of a department."""
+        try:
+            patient_id = int(patient_id)
+        except (TypeError, ValueError):
+            raise ValueError("patient_id must be an integer")
+        with get_connection() as conn, _write_transaction(conn):
+            row = conn.execute("SELECT status FROM patients WHERE id = ?", (patient_id,)).fetchone()
+            if row is None:
+                raise NotFound(f"Unknown patient {patient_id}")
+            if row[0] not in PATIENT_STATUSES:
+                raise Conflict(f"Patient {patient_id} is not admitted")
+            return _occupy_free_bed(conn, department, patient_id)
+
+    def discharge_patient(department, bed_number):
+        """Free an occupied bed."""
+        with get_connection() as conn, _write_transaction(conn):
+            bed_id, _ = _occupied_bed(conn, department, bed_number)
+            conn.execute(
+                "UPDATE beds SET status = 'Available', patient_id = NULL WHERE id = ?", (bed_id,)
+            )
+            return {"department": department, "bed_number": bed_number, "status": "Available"}
+
+    def transfer_patient(department, bed_number, to_department):
+        """Move the patient in a bed to a different free bed in to_department."""
+        with get_connection() as conn, _write_transaction(conn):
+            bed_id, patient_id = _occupied_bed(conn, department, bed_number)
+            # The current bed is still occupied here, so it is never picked
+            moved = _occupy_free_bed(conn, to_department, patient_id)
+            conn.execute(
+                "UPDATE beds SET status = 'Available', patient_id = NULL WHERE id = ?", (bed_id,)
+            )
+            moved["from_department"] = department
+            moved["from_bed"] = bed_number
+            return moved
+
+    # -----------------------------------------------------------------------------
+    # Supply chain
+    # -----------------------------------------------------------------------------
+
+    def get_supply_items():
+        with get_connection() as conn:
+            return conn.execute(
+                "SELECT id, name, supplier, unit, current_stock, min_required, "
+                "lead_time_days, unit_cost, auto_order FROM supply_items ORDER BY id"
+            ).fetchall()
+
+    def get_supply_usage(days=USAGE_WINDOW_DAYS):
+        """Per-item usage over the last `days` complete days (from daily buckets)."""
+        today = datetime.now().date()
+        with get_connection() as conn:
+            return conn.execute(
+                "SELECT item_id, SUM(quantity) FROM supply_usage_daily "
+                "WHERE day >= ? AND day < ? GROUP BY item_id",
+                ((today - timedelta(days=days)).isoformat(), today.isoformat()),
+            ).fetchall()
+
+    def get_supply_version():
+        """Id of the latest stock movement; changes whenever stock does."""
+        with get_connection() as conn:
+            return conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+
+    def get_usage_buckets(hourly, since):
+        """
+        (item_id, bucket, quantity) usage buckets from `since` onwards.
+        Buckets are 'YYYY-MM-DD HH' when hourly, else 'YYYY-MM-DD'.
+        """
+        table, column = ("supply_usage_hourly", "hour") if hourly else ("supply_usage_daily", "day")
+        with get_connection() as conn:
+            return conn.execute(
+                f"SELECT item_id, {column}, quantity FROM {table} WHERE {column} >= ?",
+                (since,),
+            ).fetchall()
+
+    def record_usage_batch(rows):
+        """
+        Persist pre-aggregated usage as one movement per (item_id, quantity,
+        moved_at) row. Returns (version before, version after) so callers can
+        tell whether anyone else wrote in between.
+        """
+        with get_connection() as conn, _write_transaction(conn):
+            before = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO stock_movements (item_id, quantity, kind, moved_at) "
+                "VALUES (?, ?, 'usage', ?)",
+                ((item_id, -quantity, moved_at) for item_id, quantity, moved_at in rows),
+            )
+            after = conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+        return before, after
+
+    def record_stock_movement(item_id, quantity, kind="usage", at=None):
+        """
+        Record a stock movement and return the item's new stock level.
+        Usage is stored as a negative movement, receipts as positive and
+        adjustments keep their sign.
+        """
+        if kind not in STOCK_MOVEMENT_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(STOCK_MOVEMENT_KINDS)}")
+        signed = {"usage": -abs(quantity), "receipt": abs(quantity)}.get(kind, quantity)
+        moved_at = (at or datetime.now()).isoformat(sep=" ")
+        with get_connection() as conn, _write_transaction(conn):
+            row = conn.execute(
+                "SELECT current_stock FROM supply_items WHERE id = ?", (item_id,)
+            ).fetchone()
+            if row is None:
+                raise NotFound(f"Unknown supply item {item_id}")
+            conn.execute(
+                "INSERT INTO stock_movements (item_id, quantity, kind, moved_at) VALUES (?, ?, ?, ?)",
+                (item_id, signed, kind, moved_at),
+            )
+            return {"item_id": item_id, "kind": kind, "quantity": signed,
+                    "current_stock": row[0] + signed}
+
+
+if __name__ == "__main__" and not FORCE_DEMO:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="HealFlow database utilities")
+    parser.add_argument("--build-snapshot", nargs="?", const=SNAPSHOT_PATH, metavar="PATH",
+                        help="write the prebuilt demo database (default: %(const)s)")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="print hot query plans; exit 1 if one does not use an index")
+    args = parser.parse_args()
+    if args.build_snapshot:
+        print(build_snapshot(args.build_snapshot))
+    elif args.check_plans:
+        plans = explain_query_plans()
+        for name, plan in plans.items():
+            print(f"{name}: {'index' if plan['uses_index'] else 'SCAN'} | {' / '.join(plan['plan'])}")
+        raise SystemExit(0 if all(p["uses_index"] for p in plans.values()) else 1)
+    else:
+        parser.print_help()
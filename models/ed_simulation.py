@@ -0,0 +1,226 @@
+"""
+Discrete-event simulation of a department queue (complements the closed-form
+M/M/c model in queue_model.py).
+Arrivals are non-stationary Poisson: each hour's rate is the department base
+rate × day-of-week multiplier × hour-of-day share. Patients carry a triage
+priority (1 = most urgent, served first, non-preemptive) and are blocked
+(diverted) when the department is at capacity.
+Replications use common random numbers: replication r always draws from the
+same seeded streams, so scenarios that differ only in servers or capacity
+see identical patients. Replications run in one process pool shared by
+every caller, created on first use.
+"""
+import heapq
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+from models.inflow_model import (
+    DEPARTMENT_BASE_RATES,
+    DAY_OF_WEEK_MULTIPLIER,
+    HOURLY_ARRIVAL_PROFILE,
+)
+from models.metrics import timed
+
+# Share of arrivals per triage level (ESI-style, 1 = resuscitation)
+TRIAGE_MIX = {1: 0.05, 2: 0.15, 3: 0.45, 4: 0.35}
+
+# Replications below this run inline; process start-up would dominate
+MIN_PARALLEL_REPLICATIONS = 50
+
+# Normal quantile for 95% confidence intervals
+Z_95 = 1.96
+
+# Processes in the shared replication pool
+SIM_WORKERS = int(os.environ.get("HEALFLOW_SIM_WORKERS", "0")) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Independent random streams per replication
+_ARRIVAL_STREAM, _PRIORITY_STREAM, _SERVICE_STREAM = 0, 1, 2
+
+
+def hourly_arrival_rates(department, days=7, start_weekday=None):
+    """Arrival rate (patients/hour) for each hour of the horizon."""
+    if start_weekday is None:
+        start_weekday = datetime.now().weekday()
+    base = DEPARTMENT_BASE_RATES.get(department, 35)
+    rates = np.empty(days * 24)
+    for day in range(days):
+        mult = DAY_OF_WEEK_MULTIPLIER.get((start_weekday + day) % 7, 1.0)
+        rates[day * 24:(day + 1) * 24] = np.asarray(HOURLY_ARRIVAL_PROFILE) * base * mult
+    return rates
+
+
+def _rng(seed, replication, stream):
+    return np.random.default_rng([seed, replication, stream])
+
+
+def run_replication(rates, servers, service_rate, capacity=None,
+                    priority_mix=TRIAGE_MIX, seed=2024, replication=0):
+    """
+    Simulate one replication over len(rates) hours.
+    capacity caps patients in the department (waiting + in service);
+    None means unlimited. Returns a dict of per-replication statistics.
+    """
+    arrival_rng = _rng(seed, replication, _ARRIVAL_STREAM)
+    counts = arrival_rng.poisson(rates)
+    hours = np.repeat(np.arange(len(rates)), counts)
+    arrival_times = np.sort(hours + arrival_rng.random(hours.size))
+    n = arrival_times.size
+
+    levels = sorted(priority_mix)
+    probs = np.asarray([priority_mix[p] for p in levels], dtype=float)
+    priorities = _rng(seed, replication, _PRIORITY_STREAM).choice(
+        levels, size=n, p=probs / probs.sum()
+    )
+    service_times = _rng(seed, replication, _SERVICE_STREAM).exponential(
+        1.0 / service_rate, size=n
+    )
+
+    # Event heap holds (time, seq, patient); patient -1 marks a departure
+    events = [(t, i, i) for i, t in enumerate(arrival_times.tolist())]
+    heapq.heapify(events)
+    seq = n
+    waiting = []
+    busy = 0
+    blocked = 0
+    busy_time = 0.0
+    max_queue = 0
+    waits = {p: [] for p in levels}
+
+    while events:
+        now, _, patient = heapq.heappop(events)
+        if patient < 0:
+            busy -= 1
+            if not waiting:
+                continue
+            _, arrived, patient = heapq.heappop(waiting)
+            waits[priorities[patient]].append(now - arrived)
+        elif capacity is not None and busy + len(waiting) >= capacity:
+            blocked += 1
+            continue
+        elif busy >= servers:
+            heapq.heappush(waiting, (priorities[patient], now, patient))
+            max_queue = max(max_queue, len(waiting))
+            continue
+        else:
+            waits[priorities[patient]].append(0.0)
+        busy += 1
+        busy_time += service_times[patient]
+        heapq.heappush(events, (now + service_times[patient], seq, -1))
+        seq += 1
+
+    served = sum(len(w) for w in waits.values())
+    all_waits = [w for ws in waits.values() for w in ws]
+    stats = {
+        'arrivals': n,
+        'served': served,
+        'blocked': blocked,
+        'blocking_probability': blocked / n if n else 0.0,
+        'avg_wait_time': float(np.mean(all_waits)) if all_waits else 0.0,
+        'max_queue_length': max_queue,
+        'utilization': busy_time / (servers * len(rates)) if rates.size else 0.0,
+    }
+    for p in levels:
+        stats[f'avg_wait_priority_{p}'] = float(np.mean(waits[p])) if waits[p] else 0.0
+    return stats
+
+
+def process_pool():
+    """The shared replication pool (started on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: forking a threaded server could copy held locks
+            _pool = ProcessPoolExecutor(
+                max_workers=SIM_WORKERS, mp_context=multiprocessing.get_context("forkserver"),
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False)
+
+
+def _run_batch(args):
+    rates, servers, service_rate, capacity, priority_mix, seed, reps = args
+    return [
+        run_replication(rates, servers, service_rate, capacity, priority_mix, seed, r)
+        for r in reps
+    ]
+
+
+def _summarize(runs):
+    summary = {}
+    for key in runs[0]:
+        values = np.asarray([r[key] for r in runs], dtype=float)
+        mean = float(values.mean())
+        half = Z_95 * float(values.std(ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+        summary[key] = {
+            'mean': round(mean, 4),
+            # Every statistic is a count, share or wait: none can be negative
+            'ci_low': round(max(mean - half, 0.0), 4),
+            'ci_high': round(mean + half, 4),
+        }
+    return summary
+
+
+@timed('simulate_department')
+def simulate_department(department='Emergency', servers=3, service_rate=5,
+                        days=7, replications=1000, capacity=None,
+                        priority_mix=TRIAGE_MIX, seed=2024, start_weekday=None,
+                        workers=None, executor=None):
+    """
+    Run `replications` independent replications for a department and return
+    mean and 95% confidence interval for each statistic.
+    workers=1 forces inline execution; None splits the replications over
+    SIM_WORKERS batches. They run on `executor` when given, otherwise on
+    the shared process_pool().
+    """
+    if servers < 1:
+        raise ValueError("servers must be at least 1")
+    if not (math.isfinite(service_rate) and service_rate > 0):
+        raise ValueError("service_rate must be a positive number")
+    if days < 1:
+        raise ValueError("days must be at least 1")
+    if replications < 1:
+        raise ValueError("replications must be at least 1")
+    if capacity is not None and capacity < 0:
+        raise ValueError("capacity must be non-negative")
+    rates = hourly_arrival_rates(department, days, start_weekday)
+    reps = list(range(replications))
+    if workers is None:
+        workers = SIM_WORKERS
+    workers = max(1, min(workers, replications))
+
+    if workers == 1 or replications < MIN_PARALLEL_REPLICATIONS:
+        runs = _run_batch((rates, servers, service_rate, capacity, priority_mix, seed, reps))
+    else:
+        batches = [
+            (rates, servers, service_rate, capacity, priority_mix, seed, reps[i::workers])
+            for i in range(workers)
+        ]
+        results = list((executor or process_pool()).map(_run_batch, batches))
+        runs = [run for batch in results for run in batch]
+
+    return {
+        'department': department,
+        'servers': servers,
+        'service_rate': service_rate,
+        'capacity': capacity,
+        'days': days,
+        'replications': replications,
+        'seed': seed,
+        'metrics': _summarize(runs),
+    }
@@ -0,0 +1,13 @@
+"""
+Errors raised by model operations. Both are ValueErrors, so callers that
+only tell valid from invalid input keep working; the API maps a plain
+ValueError to 400, NotFound to 404 and Conflict to 409.
+"""
+
+
+class NotFound(ValueError):
+    """The addressed row (patient, bed, item, event, ...) does not exist."""
+
+
+class Conflict(ValueError):
+    """The input is valid but the current state does not allow the change."""
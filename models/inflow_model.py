@@ -3,7 +3,13 @@ Patient inflow prediction using deterministic, realistic patterns.
 Uses day-of-week and department-specific base rates (no random values).
 Replace with ML model trained on real OPD/hospital data when available.
 """
-from datetime import datetime, timedelta
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+
+import numpy as np
+
+from models.metrics import timed
 
 # Base daily patient counts per department (typical mid-size hospital)
 # Source: realistic ranges from public health / OPD benchmarks
@@ -26,37 +32,277 @@ DAY_OF_WEEK_MULTIPLIER = {
     6: 0.72,   # Sunday
 }
 
+# Share of a day's arrivals by hour of day (0-23): quiet overnight,
+# late-morning peak, second smaller peak in the early evening.
+_HOURLY_WEIGHTS = [
+    2.0, 1.6, 1.4, 1.2, 1.2, 1.5, 2.4, 3.6, 5.0, 6.2, 6.8, 6.6,
+    6.2, 5.8, 5.6, 5.4, 5.4, 5.6, 5.8, 5.2, 4.4, 3.6, 2.9, 2.4,
+]
+HOURLY_ARRIVAL_PROFILE = [w / sum(_HOURLY_WEIGHTS) for w in _HOURLY_WEIGHTS]
+
+
+# Forecast horizon limits (days)
+DEFAULT_HORIZON_DAYS = 7
+MAX_HORIZON_DAYS = 90
+
+# Minimum predicted daily patients per department
+MIN_DAILY_PATIENTS = 5
+
+# Weeks of base-rate history used when a seasonal engine has no real data
+PRIOR_HISTORY_WEEKS = 8
+
+
+def _base_rates(departments):
+    return np.asarray([DEPARTMENT_BASE_RATES.get(d, 35) for d in departments], dtype=float)
+
+
+def _weekday_multipliers(start, horizon_days):
+    return np.asarray([
+        DAY_OF_WEEK_MULTIPLIER.get((start + timedelta(days=i)).weekday(), 1.0)
+        for i in range(horizon_days)
+    ])
+
+
+class ForecastEngine(ABC):
+    """
+    Batch forecasting backend. forecast() returns an integer matrix of
+    daily patient counts shaped (len(departments), horizon_days).
+    """
+    name = 'base'
+
+    @abstractmethod
+    def forecast(self, departments, start, horizon_days):
+        """Daily counts for `departments` over `horizon_days` from `start`."""
+
+
+class BaselineEngine(ForecastEngine):
+    """Department base rate × day-of-week multiplier (the original model)."""
+    name = 'baseline'
+
+    def forecast(self, departments, start, horizon_days):
+        daily = np.outer(_base_rates(departments), _weekday_multipliers(start, horizon_days))
+        return np.maximum(MIN_DAILY_PATIENTS, np.floor(daily)).astype(int)
+
+
+class SeasonalTrendEngine(ForecastEngine):
+    """
+    Linear trend plus day-of-week seasonality, fitted for every department
+    in a single least-squares solve over a (days × departments) history.
+    Without fitted history it fits on PRIOR_HISTORY_WEEKS of base-rate data;
+    a department missing from the fit gets its own prior-fitted column, and
+    the other departments keep their coefficients.
+    """
+    name = 'seasonal'
+
+    def __init__(self):
+        self._coef = None
+        self._index = {}
+        self._origin = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _design(origin, first_day, n_days):
+        t = np.arange(first_day, first_day + n_days)
+        weekday = (origin.weekday() + t) % 7
+        seasonal = (weekday[:, None] == np.arange(1, 7)[None, :]).astype(float)
+        return np.column_stack([np.ones(n_days), t, seasonal])
+
+    @classmethod
+    def _solve(cls, history, origin):
+        y = np.asarray(history, dtype=float)
+        coef, *_ = np.linalg.lstsq(cls._design(origin, 0, y.shape[1]), y.T, rcond=None)
+        return coef
+
+    @classmethod
+    def _prior(cls, departments, origin):
+        days = PRIOR_HISTORY_WEEKS * 7
+        return cls._solve(np.outer(_base_rates(departments), _weekday_multipliers(origin, days)), origin)
+
+    def fit(self, history, history_start, departments):
+        """history: (len(departments), n_days) daily counts from history_start."""
+        coef = self._solve(history, history_start)
+        with self._lock:
+            self._coef = coef
+            self._index = {d: i for i, d in enumerate(departments)}
+            self._origin = history_start
+        return self
+
+    def _coefficients(self, departments, start):
+        """(coef, index, origin) covering `departments`, prior-fitting any that are missing."""
+        with self._lock:
+            missing = list(dict.fromkeys(d for d in departments if d not in self._index))
+            if self._coef is None:
+                self._origin = start - timedelta(days=PRIOR_HISTORY_WEEKS * 7)
+                self._coef = self._prior(missing, self._origin)
+                self._index = {d: i for i, d in enumerate(missing)}
+            elif missing:
+                # Same origin as the fitted columns, so one design matrix serves all
+                prior = self._prior(missing, self._origin)
+                self._coef = np.column_stack([self._coef, prior])
+                self._index = {**self._index, **{d: len(self._index) + i for i, d in enumerate(missing)}}
+            return self._coef, self._index, self._origin
+
+    def forecast(self, departments, start, horizon_days):
+        coef, index, origin = self._coefficients(departments, start)
+        x = self._design(origin, (start - origin).days, horizon_days)
+        daily = (x @ coef[:, [index[d] for d in departments]]).T
+        return np.maximum(MIN_DAILY_PATIENTS, np.rint(daily)).astype(int)
+
+
+FORECAST_ENGINES = {
+    BaselineEngine.name: BaselineEngine,
+    SeasonalTrendEngine.name: SeasonalTrendEngine,
+}
+
+_engine = BaselineEngine()
+
+
+def get_forecast_engine():
+    return _engine
+
+
+def _compute_inflow(department, start):
+    return _engine.forecast([department], start, DEFAULT_HORIZON_DAYS)[0].tolist()
+
+
+# Forecast cache keyed by (department, horizon start date). All known
+# departments are filled together the first time a day is seen; a new
+# calendar day (local midnight) drops every entry. Misses count forecasts
+# computed (each department filled by a roll is one), hits count lookups
+# served without computing.
+_forecast_cache = {}
+_cache_day = None
+_cache_dates = []
+_cache_stats = {'hits': 0, 'misses': 0}
+_cache_lock = threading.Lock()
+# Bumped whenever cached forecasts are replaced, so dependents can refresh
+_forecast_version = 0
+
+
+def _roll_cache(today):
+    global _cache_day, _cache_dates, _forecast_version
+    _forecast_version += 1
+    _forecast_cache.clear()
+    departments = list(DEPARTMENT_BASE_RATES)
+    matrix = _engine.forecast(departments, today, DEFAULT_HORIZON_DAYS)
+    for dept, row in zip(departments, matrix.tolist()):
+        _forecast_cache[(dept, today)] = row
+    _cache_stats['misses'] += len(departments)
+    _cache_dates = [
+        (today + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)
+    ]
+    _cache_day = today
+
+
+def _cached_inflow(department):
+    today = date.today()
+    if department not in DEPARTMENT_BASE_RATES:
+        # Names come from requests: caching each one would grow without bound
+        return _compute_inflow(department, today)
+    key = (department, today)
+    with _cache_lock:
+        rolled = _cache_day != today
+        if rolled:
+            _roll_cache(today)
+        predictions = _forecast_cache.get(key)
+        if predictions is None:
+            _cache_stats['misses'] += 1
+            predictions = _forecast_cache[key] = _compute_inflow(department, today)
+        elif not rolled:
+            # A lookup that triggered the roll was counted among its misses
+            _cache_stats['hits'] += 1
+    return predictions
+
+
+def get_forecast_cache_stats():
+    """Hit/miss counters and current size of the forecast cache."""
+    with _cache_lock:
+        return {
+            'hits': _cache_stats['hits'],
+            'misses': _cache_stats['misses'],
+            'entries': len(_forecast_cache),
+            'day': _cache_day.isoformat() if _cache_day else None,
+        }
+
+
+def clear_forecast_cache():
+    """Drop cached forecasts and reset counters."""
+    global _cache_day, _forecast_version
+    with _cache_lock:
+        _forecast_cache.clear()
+        _cache_day = None
+        _cache_stats['hits'] = _cache_stats['misses'] = 0
+        _forecast_version += 1
 
+
+def set_forecast_engine(engine):
+    """Swap the forecasting backend (an engine instance or registered name)."""
+    global _engine, _cache_day, _forecast_version
+    if isinstance(engine, str):
+        engine = FORECAST_ENGINES[engine]()
+    with _cache_lock:
+        _engine = engine
+        _forecast_cache.clear()
+        _cache_day = None
+        _forecast_version += 1
+
+
+def get_forecast_version():
+    """Changes whenever the forecast cache is rebuilt or the engine swapped."""
+    with _cache_lock:
+        return _forecast_version
+
+
+@timed('forecast_inflow')
+def forecast_inflow(departments=None, horizon_days=DEFAULT_HORIZON_DAYS,
+                    hourly=False, start=None):
+    """
+    Batch forecast for many departments in one engine call.
+    Returns {department: [daily counts]} or, with hourly=True,
+    {department: [[24 hourly rates] per day]}.
+    """
+    if not 1 <= horizon_days <= MAX_HORIZON_DAYS:
+        raise ValueError(f"horizon_days must be between 1 and {MAX_HORIZON_DAYS}")
+    departments = list(departments or DEPARTMENT_BASE_RATES)
+    start = start or date.today()
+    daily = _engine.forecast(departments, start, horizon_days)
+    if hourly:
+        values = np.round(daily[:, :, None] * np.asarray(HOURLY_ARRIVAL_PROFILE), 3)
+    else:
+        values = daily
+    return dict(zip(departments, values.tolist()))
+
+
+@timed('predict_patient_inflow')
 def predict_patient_inflow(department):
     """
     Predict patient inflow for next 7 days using day-of-week and department base rates.
-    Deterministic and reproducible (no random).
-    """
-    base = DEPARTMENT_BASE_RATES.get(department, 35)
-    predictions = []
-    today = datetime.now()
-    for i in range(7):
-        d = today + timedelta(days=i)
-        mult = DAY_OF_WEEK_MULTIPLIER.get(d.weekday(), 1.0)
-        value = max(5, int(base * mult))
-        predictions.append(value)
-    return predictions
+    Deterministic and reproducible (no random). Served from the daily cache.
+    """
+    return list(_cached_inflow(department))
 
 
+@timed('get_all_departments_prediction')
 def get_all_departments_prediction():
     """Get predictions for all departments (deterministic)."""
-    departments = list(DEPARTMENT_BASE_RATES.keys())
-    predictions = {}
-    for dept in departments:
-        predictions[dept] = predict_patient_inflow(dept)
-    return predictions
+    return {dept: predict_patient_inflow(dept) for dept in DEPARTMENT_BASE_RATES}
 
 
 def get_prediction_dates():
     """Generate dates for next 7 days."""
-    dates = []
-    today = datetime.now()
-    for i in range(7):
-        date = today + timedelta(days=i)
-        dates.append(date.strftime('%Y-%m-%d'))
-    return dates
+    today = date.today()
+    with _cache_lock:
+        if _cache_day != today:
+            _roll_cache(today)
+        return list(_cache_dates)
+
+
+def predict_hourly_inflow(department):
+    """
+    Expected arrivals per hour for the next 7 days (7 lists of 24 rates),
+    spreading each daily prediction over HOURLY_ARRIVAL_PROFILE.
+    """
+    return [
+        [round(daily * share, 3) for share in HOURLY_ARRIVAL_PROFILE]
+        for daily in predict_patient_inflow(department)
+    ]
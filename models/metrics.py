@@ -0,0 +1,214 @@
+"""
+Opt-in instrumentation: route latency, SQL statement and model-function
+timings as Prometheus histograms, plus a per-request Server-Timing header.
+Enable with HEALFLOW_METRICS=1 before start-up. When disabled, timed()
+returns the function unchanged, connections are plain sqlite3 ones and no
+Flask hooks are installed, so there is no per-call overhead.
+"""
+import contextvars
+import functools
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from flask import g, request
+from flask.json.provider import DefaultJSONProvider
+
+ENABLED = os.environ.get("HEALFLOW_METRICS", "").lower() in ("1", "true", "yes")
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Longest SQL text kept as a label value
+MAX_STATEMENT_LABEL = 120
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, ([*s[0]], s[1], s[2])) for labels, s in self._series.items()]
+        for labels, (buckets, total, count) in sorted(items):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels)]
+            base = ",".join(pairs)
+            sep = "," if pairs else ""
+            for bound, n in zip(BUCKETS, buckets):
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+REQUEST_LATENCY = Histogram(
+    "healflow_request_duration_seconds", "Request latency by route", ("method", "route", "status")
+)
+SQL_LATENCY = Histogram(
+    "healflow_sql_duration_seconds", "SQLite statement execution time", ("statement",)
+)
+MODEL_LATENCY = Histogram(
+    "healflow_model_duration_seconds", "Model function time", ("function",)
+)
+JSON_LATENCY = Histogram(
+    "healflow_json_duration_seconds", "JSON response serialization time", ("route",)
+)
+HISTOGRAMS = (REQUEST_LATENCY, SQL_LATENCY, MODEL_LATENCY, JSON_LATENCY)
+
+# Per-request totals for Server-Timing: {kind: [seconds, count]}
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+_model_depth = threading.local()
+
+
+def _record(kind, seconds):
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(kind, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def timed(name):
+    """Decorator timing a model function (identity when metrics are off)."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            depth = getattr(_model_depth, "value", 0)
+            _model_depth.value = depth + 1
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                _model_depth.value = depth
+                MODEL_LATENCY.observe((name,), elapsed)
+                # Nested model calls are already inside the outer timing
+                if depth == 0:
+                    _record("model", elapsed)
+        return wrapper
+    return decorate
+
+
+def _statement_label(sql):
+    return re.sub(r"\s+", " ", sql).strip()[:MAX_STATEMENT_LABEL]
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection that times every execute/executemany."""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, parameters)
+        finally:
+            self._observe(sql, time.perf_counter() - start)
+
+    @staticmethod
+    def _observe(sql, elapsed):
+        SQL_LATENCY.observe((_statement_label(sql),), elapsed)
+        _record("db", elapsed)
+
+
+# Connection class for models.database.Shard.connect()
+CONNECTION_FACTORY = InstrumentedConnection if ENABLED else sqlite3.Connection
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that times response serialization of another one."""
+
+    def __init__(self, app, inner=None):
+        super().__init__(app)
+        self.inner = inner or DefaultJSONProvider(app)
+
+    def dumps(self, obj, **kwargs):
+        return self.inner.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return self.inner.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.inner.response(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            rule = request.url_rule.rule if request and request.url_rule else "unmatched"
+            JSON_LATENCY.observe((rule,), elapsed)
+            _record("json", elapsed)
+
+
+def render_prometheus():
+    return "\n".join(h.render() for h in HISTOGRAMS) + "\n"
+
+
+def _server_timing(total, timings):
+    parts = [f"app;dur={total * 1000:.2f}"]
+    for kind, (seconds, count) in sorted(timings.items()):
+        parts.append(f'{kind};dur={seconds * 1000:.2f};desc="{count} calls"')
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """Install request hooks and the /metrics endpoint when enabled."""
+    if not ENABLED:
+        return
+
+    app.json = TimedJSONProvider(app, app.json)
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+        g.metrics_token = _request_timings.set({})
+
+    @app.after_request
+    def _stop_timer(response):
+        start = g.pop("metrics_start", None)
+        token = g.pop("metrics_token", None)
+        if start is None:
+            return response
+        total = time.perf_counter() - start
+        timings = _request_timings.get() or {}
+        _request_timings.reset(token)
+        rule = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_LATENCY.observe((request.method, rule, str(response.status_code)), total)
+        response.headers["Server-Timing"] = _server_timing(total, timings)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return app.response_class(render_prometheus(), mimetype="text/plain; version=0.0.4")
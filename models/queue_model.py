@@ -1,66 +1,128 @@
+"""
+M/M/c queue model built on a shared Erlang C core.
+Erlang C is derived from the Erlang B recursion
+    B(0) = 1,  B(k) = a·B(k-1) / (k + a·B(k-1))
+which needs no factorials or large powers, so it stays stable for any
+number of servers. queue_metrics() evaluates NumPy arrays of (λ, μ, c)
+in one vectorized call.
+"""
 import math
 
+import numpy as np
+
+from models.metrics import timed
+
+# Upper bound for staffing searches (servers per department)
+MAX_SERVERS = 500
+
+METRIC_KEYS = (
+    'utilization',
+    'avg_wait_time',
+    'avg_queue_length',
+    'avg_patients_in_system',
+    'avg_time_in_system',
+    'erlang_c',
+    'prob_no_wait',
+)
+
+
+@timed('queue_metrics')
+def queue_metrics(arrival_rate, service_rate, servers):
+    """
+    Vectorized M/M/c metrics. Inputs broadcast against each other.
+    Returns a dict of float arrays keyed by METRIC_KEYS; unstable
+    scenarios get inf waits, invalid ones (c <= 0 or μ <= 0) get zeros.
+    """
+    lam, mu, c = np.broadcast_arrays(
+        np.asarray(arrival_rate, dtype=float),
+        np.asarray(service_rate, dtype=float),
+        np.asarray(servers, dtype=np.int64),
+    )
+    valid = (c > 0) & (mu > 0)
+    safe_mu = np.where(valid, mu, 1.0)
+    safe_c = np.where(valid, c, 1)
+    a = lam / safe_mu
+    utilization = np.where(valid, a / safe_c, 0.0)
+    stable = valid & (utilization < 1)
+
+    # Erlang B recursion over k, frozen once k passes each scenario's c
+    b = np.ones(a.shape)
+    max_c = int(c.max()) if c.size else 0
+    for k in range(1, max_c + 1):
+        step = a * b / (k + a * b)
+        b = np.where(k <= c, step, b)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ec = np.where(stable, safe_c * b / (safe_c - a * (1 - b)), 0.0)
+        ec = np.where(valid & ~stable, 1.0, ec)
+        spare = safe_c * safe_mu - lam
+        avg_wait = np.where(stable, ec / spare, np.inf)
+        avg_queue = np.where(stable, lam * avg_wait, np.inf)
+        avg_time = np.where(stable, avg_wait + 1 / safe_mu, np.inf)
+        avg_in_system = np.where(stable, avg_queue + a, np.inf)
+
+    zero = ~valid
+    return {
+        'utilization': utilization,
+        'avg_wait_time': np.where(zero, 0.0, avg_wait),
+        'avg_queue_length': np.where(zero, 0.0, avg_queue),
+        'avg_patients_in_system': np.where(zero, 0.0, avg_in_system),
+        'avg_time_in_system': np.where(zero, 0.0, avg_time),
+        'erlang_c': ec,
+        'prob_no_wait': np.where(stable, 1 - ec, 0.0),
+    }
+
+
+def erlang_c(arrival_rate, service_rate, servers):
+    """
+    Probability that an arriving patient has to wait (scalar).
+    Returns 1 for an unstable queue and 0 when there is no service.
+    """
+    return float(queue_metrics(arrival_rate, service_rate, servers)['erlang_c'])
+
+
+@timed('mmc_queue_simulation')
 def mmc_queue_simulation(arrival_rate, service_rate, servers):
     """
     M/M/c queue model simulation using Erlang C formula
     arrival_rate (λ): Average number of patients arriving per hour
     service_rate (μ): Average number of patients one server can handle per hour
     servers (c): Number of servers/doctors available
-    
+
     Returns:
-        Dictionary with queue performance metrics
+        Dictionary with queue performance metrics (including prob_no_wait)
     """
-    
     if servers <= 0 or service_rate <= 0:
         return {
             'utilization': 0,
             'avg_wait_time': 0,
             'avg_queue_length': 0,
             'avg_patients_in_system': 0,
-            'avg_time_in_system': 0
+            'avg_time_in_system': 0,
+            'prob_no_wait': 0,
         }
-    
-    utilization = arrival_rate / (servers * service_rate)
-    
-    if utilization >= 1:
+
+    # One scenario through the shared vectorized core
+    m = {k: float(v) for k, v in queue_metrics(arrival_rate, service_rate, servers).items()}
+
+    if m['utilization'] >= 1:
         return {
-            'utilization': round(utilization, 3),
+            'utilization': round(m['utilization'], 3),
             'avg_wait_time': float('inf'),
             'avg_queue_length': float('inf'),
             'avg_patients_in_system': float('inf'),
-            'avg_time_in_system': float('inf')
+            'avg_time_in_system': float('inf'),
+            'prob_no_wait': 0,
         }
-    
-    traffic_intensity = arrival_rate / service_rate
-    
-    sum_terms = sum(
-        (traffic_intensity ** k) / math.factorial(k)
-        for k in range(servers)
-    )
-    
-    last_term = (traffic_intensity ** servers) / (
-        math.factorial(servers) * (1 - utilization)
-    )
-    
-    p0 = 1 / (sum_terms + last_term)
-    
-    erlang_c = (
-        (traffic_intensity ** servers) / math.factorial(servers)
-    ) * (servers * service_rate / (servers * service_rate - arrival_rate)) * p0
-    
-    avg_wait = erlang_c / (servers * service_rate - arrival_rate)
-    avg_queue = arrival_rate * avg_wait
-    
-    avg_time_in_system = avg_wait + (1 / service_rate)
-    avg_patients_in_system = avg_queue + traffic_intensity
-    
+
     return {
-        'utilization': round(utilization, 3),
-        'avg_wait_time': round(avg_wait, 2),
-        'avg_queue_length': round(avg_queue, 2),
-        'avg_patients_in_system': round(avg_patients_in_system, 2),
-        'avg_time_in_system': round(avg_time_in_system, 2),
-        'erlang_c': round(erlang_c, 3)
+        'utilization': round(m['utilization'], 3),
+        'avg_wait_time': round(m['avg_wait_time'], 2),
+        'avg_queue_length': round(m['avg_queue_length'], 2),
+        'avg_patients_in_system': round(m['avg_patients_in_system'], 2),
+        'avg_time_in_system': round(m['avg_time_in_system'], 2),
+        'erlang_c': round(m['erlang_c'], 3),
+        'prob_no_wait': round(m['prob_no_wait'], 3),
     }
 
 def calculate_probability_no_wait(arrival_rate, service_rate, servers):
@@ -69,27 +131,86 @@ def calculate_probability_no_wait(arrival_rate, service_rate, servers):
     """
     if servers <= 0 or service_rate <= 0:
         return 0
-        
-    utilization = arrival_rate / (servers * service_rate)
-    
-    if utilization >= 1:
-        return 0
-    
-    traffic_intensity = arrival_rate / service_rate
-    
-    sum_terms = sum(
-        (traffic_intensity ** k) / math.factorial(k)
-        for k in range(servers)
-    )
-    
-    last_term = (traffic_intensity ** servers) / (
-        math.factorial(servers) * (1 - utilization)
+
+    return round(float(queue_metrics(arrival_rate, service_rate, servers)['prob_no_wait']), 3)
+
+
+def min_servers_for_target(arrival_rate, service_rate, target_wait=None,
+                           target_prob_no_wait=None, max_servers=MAX_SERVERS):
+    """
+    Smallest number of servers whose M/M/c queue meets the targets.
+    target_wait is an avg_wait_time ceiling (hours), target_prob_no_wait a
+    floor on prob_no_wait; with neither, the first stable c is returned.
+    Erlang B is carried forward from c-1 to c, so the search is O(c).
+    Returns None when no c <= max_servers qualifies.
+    """
+    if service_rate <= 0:
+        return None
+    a = arrival_rate / service_rate
+    b = 1.0
+    for c in range(1, max_servers + 1):
+        b = a * b / (c + a * b)
+        if a >= c:
+            continue
+        ec = c * b / (c - a * (1 - b))
+        wait = ec / (c * service_rate - arrival_rate)
+        if target_wait is not None and wait > target_wait:
+            continue
+        if target_prob_no_wait is not None and 1 - ec < target_prob_no_wait:
+            continue
+        return c
+    return None
+
+
+def check_staffing_inputs(service_rate, target_wait=None, target_prob_no_wait=None):
+    """Raise ValueError for a rate or target no staffing level can satisfy."""
+    if not (math.isfinite(service_rate) and service_rate > 0):
+        raise ValueError("service_rate must be a positive number")
+    if target_wait is not None and not (math.isfinite(target_wait) and target_wait >= 0):
+        raise ValueError("target_wait must be a non-negative number")
+    if target_prob_no_wait is not None and not 0 < target_prob_no_wait <= 1:
+        raise ValueError("target_prob_no_wait must be in (0, 1]")
+
+
+def check_queue_inputs(arrival_rate, service_rate, servers):
+    """Raise ValueError for a scenario mmc_queue_simulation cannot evaluate."""
+    check_staffing_inputs(service_rate)
+    if not (math.isfinite(arrival_rate) and arrival_rate >= 0):
+        raise ValueError("arrival_rate must be a non-negative number")
+    if not 1 <= servers <= MAX_SERVERS:
+        raise ValueError(f"servers must be between 1 and {MAX_SERVERS}")
+
+
+@timed('optimize_staffing')
+def optimize_staffing(arrival_rate, service_rate, target_wait=None,
+                      target_prob_no_wait=None, max_servers=MAX_SERVERS):
+    """Minimum servers for the targets plus the resulting queue metrics."""
+    check_staffing_inputs(service_rate, target_wait, target_prob_no_wait)
+    if not (math.isfinite(arrival_rate) and arrival_rate >= 0):
+        raise ValueError("arrival_rate must be a non-negative number")
+    servers = min_servers_for_target(
+        arrival_rate, service_rate, target_wait, target_prob_no_wait, max_servers
     )
-    
-    p0 = 1 / (sum_terms + last_term)
-    
-    erlang_c = (
-        (traffic_intensity ** servers) / math.factorial(servers)
-    ) * (servers * service_rate / (servers * service_rate - arrival_rate)) * p0
-    
-    return round(1 - erlang_c, 3)
\ No newline at end of file
+    result = {'servers': servers, 'target_met': servers is not None}
+    if servers is not None:
+        result.update(mmc_queue_simulation(arrival_rate, service_rate, servers))
+    return result
+
+
+@timed('staffing_plan')
+def staffing_plan(hourly_rates, service_rate, target_wait=None,
+                  target_prob_no_wait=None, max_servers=MAX_SERVERS):
+    """
+    Minimum servers for each cell of a day × hour grid of arrival rates
+    (e.g. the 7 × 24 output of predict_hourly_inflow).
+    """
+    check_staffing_inputs(service_rate, target_wait, target_prob_no_wait)
+    return [
+        [
+            min_servers_for_target(
+                rate, service_rate, target_wait, target_prob_no_wait, max_servers
+            )
+            for rate in day
+        ]
+        for day in hourly_rates
+    ]
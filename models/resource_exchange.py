@@ -1,25 +1,505 @@
 """
 Resource exchange: deterministic, realistic data (no random).
+Hospitals carry coordinates; offers are indexed per resource type in a
+uniform grid over locally projected kilometres, so "nearest k hospitals
+with at least q units" expands outward ring by ring instead of scanning
+the whole network. Offer updates adjust the index in place.
+Pending requests are allocated in batches by a min-cost flow solver
+(urgency-weighted distance), re-solving only the parts of the network
+whose offers or requests changed.
 """
+import heapq
+import math
+import threading
+import time
+
+from models.metrics import timed
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Grid cell edge (km); a few hospitals per cell in a dense region
+CELL_KM = 5.0
+
+# Cost (km-equivalent) of leaving one unit of a request unfilled; any
+# transfer within MAX_TRANSFER_KM beats leaving even a Low request open
+URGENCY_PENALTY_KM = {'Critical': 1000, 'High': 500, 'Medium': 200, 'Low': 100}
+MAX_TRANSFER_KM = 50
+
+# Nearest offers considered per request when building the transport network
+CANDIDATE_OFFERS = 8
+
+# Solver latency budget (ms); past it the best partial allocation is returned
+DEFAULT_BUDGET_MS = 50
+
+
+CURRENT_HOSPITAL_ID = 1
+
+HOSPITALS = [
+    {'id': 1, 'name': 'HealFlow Central Hospital', 'location': 'Downtown', 'lat': 40.7128, 'lon': -74.0060, 'status': 'Active', 'contact': '+1-555-0101'},
+    {'id': 2, 'name': 'City General Hospital', 'location': 'North District', 'lat': 40.7443, 'lon': -74.0060, 'status': 'Active', 'contact': '+1-555-0102'},
+    {'id': 3, 'name': 'MetroCare Medical Center', 'location': 'East Side', 'lat': 40.7128, 'lon': -73.9443, 'status': 'Active', 'contact': '+1-555-0103'},
+    {'id': 4, 'name': 'LifeLine Hospital', 'location': 'West End', 'lat': 40.7128, 'lon': -74.0985, 'status': 'Active', 'contact': '+1-555-0104'},
+]
+
+# Offers from other hospitals in the network
+OFFERS = [
+    {'id': 1, 'hospital_id': 2, 'resource_type': 'ICU Beds', 'quantity': 2, 'availability': 'Immediate'},
+    {'id': 2, 'hospital_id': 3, 'resource_type': 'Ventilators', 'quantity': 3, 'availability': 'Within 2 hours'},
+    {'id': 3, 'hospital_id': 4, 'resource_type': 'Blood Units (O+)', 'quantity': 5, 'availability': 'Immediate'},
+    {'id': 4, 'hospital_id': 2, 'resource_type': 'Surgical Team', 'quantity': 1, 'availability': 'Within 1 hour'},
+]
+
+REQUESTS = [
+    {'id': 1, 'hospital_id': 3, 'resource': 'ICU Bed', 'quantity': 1, 'urgency': 'High', 'reason': 'Critical patient transfer', 'minutes_ago': 15},
+    {'id': 2, 'hospital_id': 4, 'resource': 'Blood Units (B+)', 'quantity': 3, 'urgency': 'Medium', 'reason': 'Emergency surgery', 'minutes_ago': 60},
+]
+
+
+def resource_key(name):
+    """Canonical resource type: case-insensitive, singular/plural agnostic."""
+    words = name.lower().split()
+    return ' '.join(w[:-1] if len(w) > 3 and w.endswith('s') else w for w in words)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    h = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def format_distance(km):
+    return f'{round(km, 1):g} km'
+
+
+def _format_age(minutes):
+    if minutes < 60:
+        return f'{minutes} mins ago'
+    hours = minutes // 60
+    return f'{hours} hour ago' if hours == 1 else f'{hours} hours ago'
+
+
+class SpatialGrid:
+    """Points bucketed into square cells; nearest-k by expanding rings."""
+
+    def __init__(self, cell_km=CELL_KM):
+        self.cell_km = cell_km
+        self.cells = {}
+        self.where = {}
+        self.bounds = None
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_km), math.floor(y / self.cell_km)
+
+    def insert(self, key, x, y):
+        self.remove(key)
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, {})[key] = (x, y)
+        self.where[key] = cell
+        if self.bounds is None:
+            self.bounds = [cell[0], cell[1], cell[0], cell[1]]
+        else:
+            b = self.bounds
+            b[0], b[1] = min(b[0], cell[0]), min(b[1], cell[1])
+            b[2], b[3] = max(b[2], cell[0]), max(b[3], cell[1])
+
+    def remove(self, key):
+        cell = self.where.pop(key, None)
+        if cell is not None:
+            bucket = self.cells[cell]
+            del bucket[key]
+            if not bucket:
+                del self.cells[cell]
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for dx in range(-r, r + 1):
+            yield cx + dx, cy - r
+            yield cx + dx, cy + r
+        for dy in range(-r + 1, r):
+            yield cx - r, cy + dy
+            yield cx + r, cy + dy
+
+    def nearest(self, x, y, k, accept=None):
+        """Up to k (distance_km, key) pairs, closest first, passing accept(key)."""
+        if not self.where or k <= 0:
+            return []
+        cx, cy = self._cell(x, y)
+        b = self.bounds
+        max_ring = max(abs(cx - b[0]), abs(cx - b[2]), abs(cy - b[1]), abs(cy - b[3]))
+        # Far from the occupied cells the rings are mostly empty: a scan of
+        # every point is cheaper than walking them
+        if (2 * max_ring + 1) ** 2 > 4 * len(self.where):
+            found = [
+                (math.hypot(px - x, py - y), key)
+                for bucket in self.cells.values()
+                for key, (px, py) in bucket.items()
+                if accept is None or accept(key)
+            ]
+            found.sort()
+            return found[:k]
+        found = []
+        for r in range(max_ring + 1):
+            for cell in self._ring(cx, cy, r):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for key, (px, py) in bucket.items():
+                    if accept is None or accept(key):
+                        found.append((math.hypot(px - x, py - y), key))
+            # Anything outside ring r is at least r cells away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= r * self.cell_km:
+                    break
+        found.sort()
+        return found[:k]
+
+
+class ResourceExchange:
+    """
+    Hospital locations plus a per-resource-type availability index:
+    {type: SpatialGrid of offers} and {offer_id: offer}.
+    """
+
+    def __init__(self, hospitals, offers, requests=(), cell_km=CELL_KM):
+        self._lock = threading.RLock()
+        self.hospitals = {h['id']: h for h in hospitals}
+        self.cell_km = cell_km
+        self.lat0 = sum(h['lat'] for h in hospitals) / len(hospitals)
+        self.lon0 = sum(h['lon'] for h in hospitals) / len(hospitals)
+        self._cos0 = math.cos(math.radians(self.lat0))
+        self.offers = {}
+        self.by_type = {}
+        # Bumped whenever an offer of that resource type changes
+        self.type_versions = {}
+        self.requests = {r['id']: dict(r) for r in requests}
+        for offer in offers:
+            self.upsert_offer(dict(offer))
+
+    def project(self, lat, lon):
+        """Local equirectangular projection around the network centroid (km)."""
+        return ((lon - self.lon0) * self._cos0 * KM_PER_DEGREE,
+                (lat - self.lat0) * KM_PER_DEGREE)
+
+    def upsert_offer(self, offer):
+        """Add or replace an offer; zero quantity removes it from the index."""
+        with self._lock:
+            self.remove_offer(offer['id'])
+            self.offers[offer['id']] = offer
+            key = resource_key(offer['resource_type'])
+            self.type_versions[key] = self.type_versions.get(key, 0) + 1
+            if offer['quantity'] <= 0:
+                return
+            hospital = self.hospitals[offer['hospital_id']]
+            grid = self.by_type.get(key)
+            if grid is None:
+                grid = self.by_type[key] = SpatialGrid(self.cell_km)
+            grid.insert(offer['id'], *self.project(hospital['lat'], hospital['lon']))
+
+    def remove_offer(self, offer_id):
+        with self._lock:
+            offer = self.offers.pop(offer_id, None)
+            if offer is not None:
+                key = resource_key(offer['resource_type'])
+                self.type_versions[key] = self.type_versions.get(key, 0) + 1
+                grid = self.by_type.get(key)
+                if grid is not None:
+                    grid.remove(offer_id)
+
+    def upsert_request(self, req):
+        with self._lock:
+            self.requests[req['id']] = req
+
+    def remove_request(self, request_id):
+        with self._lock:
+            self.requests.pop(request_id, None)
+
+    def nearest(self, resource, lat, lon, min_quantity=1, k=5, exclude_hospital=None):
+        """Nearest k offers of `resource` with at least min_quantity units."""
+        with self._lock:
+            grid = self.by_type.get(resource_key(resource))
+            if grid is None:
+                return []
+            offers = self.offers
+
+            def accept(offer_id):
+                offer = offers[offer_id]
+                return (offer['quantity'] >= min_quantity
+                        and offer['hospital_id'] != exclude_hospital)
+
+            x, y = self.project(lat, lon)
+            return [(offers[offer_id], km) for km, offer_id in grid.nearest(x, y, k, accept)]
+
+    def distance_km(self, hospital_a, hospital_b):
+        a, b = self.hospitals[hospital_a], self.hospitals[hospital_b]
+        return haversine_km(a['lat'], a['lon'], b['lat'], b['lon'])
+
+
+class TransportProblem:
+    """
+    Min-cost flow on source -> offer -> request -> sink, solved by
+    successive shortest paths (Dijkstra with potentials). supply
+    {offer_id: units}, demand {request_id: units}, edges [(offer_id,
+    request_id, cost per unit)] with negative costs. Paths are augmented
+    cheapest (most urgent, nearest) first while they still lower the total
+    cost, so the flow after every step is the cheapest one of its size.
+    That makes run() resumable: a deadline stops it between augmentations
+    and the next call carries on from the same residual graph.
+    """
+
+    def __init__(self, supply, demand, edges):
+        offer_ids = list(supply)
+        request_ids = list(demand)
+        node = {('o', o): i + 2 for i, o in enumerate(offer_ids)}
+        node.update({('r', r): i + 2 + len(offer_ids) for i, r in enumerate(request_ids)})
+        self.n = 2 + len(offer_ids) + len(request_ids)
+        self.source, self.sink = 0, 1
+        self.graph = [[] for _ in range(self.n)]
+        for o in offer_ids:
+            self._add(self.source, node[('o', o)], supply[o], 0)
+        self.pair_edges = []
+        for o, r, cost in edges:
+            u = node[('o', o)]
+            self.pair_edges.append((o, r, u, len(self.graph[u])))
+            self._add(u, node[('r', r)], supply[o], cost)
+        for r in request_ids:
+            self._add(node[('r', r)], self.sink, demand[r], 0)
+
+        # Initial potentials make every reduced cost non-negative (the graph is a DAG)
+        self.potential = [0.0] * self.n
+        for o, r, cost in edges:
+            v = node[('r', r)]
+            self.potential[v] = min(self.potential[v], cost)
+        self.potential[self.sink] = min(
+            (self.potential[node[('r', r)]] for r in request_ids), default=0.0
+        )
+        self.finished = False
+
+    def _add(self, u, v, cap, cost):
+        self.graph[u].append([v, cap, cost, len(self.graph[v])])
+        self.graph[v].append([u, 0, -cost, len(self.graph[u]) - 1])
+
+    def run(self, deadline):
+        """Augment until optimal or past deadline; returns self.finished."""
+        graph, potential = self.graph, self.potential
+        source, sink, n = self.source, self.sink, self.n
+        while not self.finished:
+            if time.perf_counter() > deadline:
+                break
+            dist = [math.inf] * n
+            prev = [None] * n
+            dist[source] = 0.0
+            heap = [(0.0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if u == sink:
+                    break
+                for i, (v, cap, cost, _) in enumerate(graph[u]):
+                    if cap <= 0:
+                        continue
+                    nd = d + cost + potential[u] - potential[v]
+                    if nd < dist[v] - 1e-12:
+                        dist[v] = nd
+                        prev[v] = (u, i)
+                        heapq.heappush(heap, (nd, v))
+            if dist[sink] == math.inf or dist[sink] + potential[sink] - potential[source] >= 0:
+                self.finished = True
+                break
+            # Distances past the sink are capped, which keeps reduced costs non-negative
+            reach = dist[sink]
+            for v in range(n):
+                potential[v] += min(dist[v], reach)
+            path = []
+            v = sink
+            while v != source:
+                u, i = prev[v]
+                path.append(graph[u][i])
+                v = u
+            units = min(edge[1] for edge in path)
+            for edge in path:
+                edge[1] -= units
+                graph[edge[0]][edge[3]][1] += units
+        return self.finished
+
+    def flows(self):
+        """{(offer_id, request_id): units} of the current flow."""
+        flows = {}
+        for o, r, u, i in self.pair_edges:
+            v, _, _, rev = self.graph[u][i]
+            units = self.graph[v][rev][1]
+            if units:
+                flows[(o, r)] = flows.get((o, r), 0) + units
+        return flows
+
+
+class BatchAllocator:
+    """
+    Allocates all pending requests against all offers at once. Candidate
+    offers per request come from the spatial index and are cached per
+    resource-type version; the transport network is split into connected
+    components and each component's solution is reused until its offers,
+    requests or edges change. A component cut short by the latency budget
+    keeps its partial flow and resumes on the next solve.
+    """
+
+    def __init__(self, exchange, candidates=CANDIDATE_OFFERS, max_km=MAX_TRANSFER_KM):
+        self.exchange = exchange
+        self.candidates = candidates
+        self.max_km = max_km
+        self._edges = {}
+        self._solutions = {}
+        self._lock = threading.Lock()
+
+    def _request_edges(self, req, live):
+        """Candidate edges for a request, recorded in `live` (the next cache)."""
+        ex = self.exchange
+        key = resource_key(req['resource'])
+        cache_key = (req['id'], req['hospital_id'], key, req['urgency'])
+        version = ex.type_versions.get(key, 0)
+        cached = self._edges.get(cache_key)
+        if cached is not None and cached[0] == version:
+            live[cache_key] = cached
+            return cached[1]
+        origin = ex.hospitals[req['hospital_id']]
+        penalty = URGENCY_PENALTY_KM.get(req['urgency'], URGENCY_PENALTY_KM['Low'])
+        edges = []
+        for offer, _ in ex.nearest(req['resource'], origin['lat'], origin['lon'],
+                                   1, self.candidates, req['hospital_id']):
+            km = ex.distance_km(req['hospital_id'], offer['hospital_id'])
+            if km <= self.max_km:
+                edges.append((offer['id'], req['id'], round(km - penalty, 6)))
+        live[cache_key] = (version, edges)
+        return edges
+
+    def _components(self, edges):
+        parent = {}
+
+        def find(x):
+            while parent.setdefault(x, x) != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for o, r, _ in edges:
+            parent[find(('o', o))] = find(('r', r))
+        groups = {}
+        for o, r, cost in edges:
+            groups.setdefault(find(('r', r)), []).append((o, r, cost))
+        return list(groups.values())
+
+    def solve(self, budget_ms=DEFAULT_BUDGET_MS):
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000
+        ex = self.exchange
+        with self._lock, ex._lock:
+            requests = {r['id']: r for r in ex.requests.values() if r['quantity'] > 0}
+            live = {}
+            edges = [e for r in requests.values() for e in self._request_edges(r, live)]
+            # Keep edges only for requests still pending, at current versions
+            self._edges = live
+            components = self._components(edges)
+            flows = {}
+            finished = True
+            reused = 0
+            solutions = {}
+            for comp in components:
+                supply = {o: ex.offers[o]['quantity'] for o, _, _ in comp}
+                demand = {r: requests[r]['quantity'] for _, r, _ in comp}
+                key = (tuple(sorted(supply.items())), tuple(sorted(demand.items())),
+                       tuple(sorted(comp)))
+                problem = self._solutions.get(key)
+                if problem is None:
+                    problem = TransportProblem(supply, demand, comp)
+                elif problem.finished:
+                    reused += 1
+                finished = problem.run(deadline) and finished
+                solutions[key] = problem
+                flows.update(problem.flows())
+            # Keep only solutions for components that still exist
+            self._solutions = solutions
+            assignments = self._report(flows, requests)
+        filled = {}
+        for a in assignments:
+            filled[a['request_id']] = filled.get(a['request_id'], 0) + a['quantity']
+        return {
+            'assignments': assignments,
+            'unfilled': [
+                {'request_id': r['id'], 'resource': r['resource'], 'urgency': r['urgency'],
+                 'quantity': r['quantity'] - filled.get(r['id'], 0)}
+                for r in sorted(requests.values(), key=lambda r: r['id'])
+                if filled.get(r['id'], 0) < r['quantity']
+            ],
+            'total_distance_km': round(sum(a['distance_km'] * a['quantity'] for a in assignments), 2),
+            'optimal': finished,
+            'components': len(components),
+            'reused_components': reused,
+            'solve_ms': round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    def _report(self, flows, requests):
+        ex = self.exchange
+        rows = []
+        for (o, r), units in sorted(flows.items(), key=lambda item: (item[0][1], item[0][0])):
+            offer, req = ex.offers[o], requests[r]
+            km = ex.distance_km(offer['hospital_id'], req['hospital_id'])
+            rows.append({
+                'request_id': r,
+                'offer_id': o,
+                'resource': req['resource'],
+                'urgency': req['urgency'],
+                'quantity': units,
+                'from_hospital': ex.hospitals[offer['hospital_id']]['name'],
+                'to_hospital': ex.hospitals[req['hospital_id']]['name'],
+                'distance_km': round(km, 2),
+            })
+        return rows
+
+
+exchange = ResourceExchange(HOSPITALS, OFFERS, REQUESTS)
+allocator = BatchAllocator(exchange)
+
+
+def _offer_row(offer, origin_id=CURRENT_HOSPITAL_ID):
+    hospital = exchange.hospitals[offer['hospital_id']]
+    return {
+        'id': offer['id'],
+        'hospital_name': hospital['name'],
+        'resource_type': offer['resource_type'],
+        'quantity': offer['quantity'],
+        'availability': offer['availability'],
+        'distance': format_distance(exchange.distance_km(origin_id, hospital['id'])),
+        'contact': hospital['contact'],
+    }
+
 
 def get_hospital_network():
     """Get list of hospitals in the network."""
     return [
-        {'id': 1, 'name': 'HealFlow Central Hospital', 'location': 'Downtown', 'distance': '0 km', 'status': 'Active', 'is_current': True},
-        {'id': 2, 'name': 'City General Hospital', 'location': 'North District', 'distance': '3.5 km', 'status': 'Active', 'is_current': False},
-        {'id': 3, 'name': 'MetroCare Medical Center', 'location': 'East Side', 'distance': '5.2 km', 'status': 'Active', 'is_current': False},
-        {'id': 4, 'name': 'LifeLine Hospital', 'location': 'West End', 'distance': '7.8 km', 'status': 'Active', 'is_current': False},
+        {
+            'id': h['id'],
+            'name': h['name'],
+            'location': h['location'],
+            'distance': format_distance(exchange.distance_km(CURRENT_HOSPITAL_ID, h['id'])),
+            'status': h['status'],
+            'is_current': h['id'] == CURRENT_HOSPITAL_ID,
+            'lat': h['lat'],
+            'lon': h['lon'],
+        }
+        for h in exchange.hospitals.values()
     ]
 
 
 def get_available_resources():
-    """Get resources available for sharing (fixed realistic data)."""
-    return [
-        {'id': 1, 'hospital_name': 'City General Hospital', 'resource_type': 'ICU Beds', 'quantity': 2, 'availability': 'Immediate', 'distance': '3.5 km', 'contact': '+1-555-0102'},
-        {'id': 2, 'hospital_name': 'MetroCare Medical Center', 'resource_type': 'Ventilators', 'quantity': 3, 'availability': 'Within 2 hours', 'distance': '5.2 km', 'contact': '+1-555-0103'},
-        {'id': 3, 'hospital_name': 'LifeLine Hospital', 'resource_type': 'Blood Units (O+)', 'quantity': 5, 'availability': 'Immediate', 'distance': '7.8 km', 'contact': '+1-555-0104'},
-        {'id': 4, 'hospital_name': 'City General Hospital', 'resource_type': 'Surgical Team', 'quantity': 1, 'availability': 'Within 1 hour', 'distance': '3.5 km', 'contact': '+1-555-0102'},
-    ]
+    """Get resources available for sharing."""
+    offers = sorted(exchange.offers.values(), key=lambda o: o['id'])
+    return [_offer_row(o) for o in offers if o['quantity'] > 0]
 
 
 def get_my_shareable_resources():
@@ -33,8 +513,88 @@ def get_my_shareable_resources():
 
 
 def get_resource_requests():
-    """Get pending resource requests (fixed)."""
+    """Get pending resource requests."""
+    return [
+        {
+            'id': r['id'],
+            'from_hospital': exchange.hospitals[r['hospital_id']]['name'],
+            'resource': r['resource'],
+            'quantity': r['quantity'],
+            'urgency': r['urgency'],
+            'reason': r['reason'],
+            'time': _format_age(r['minutes_ago']),
+        }
+        for r in sorted(exchange.requests.values(), key=lambda r: r['id'])
+    ]
+
+
+@timed('find_nearest_resources')
+def find_nearest_resources(resource, min_quantity=1, k=5, hospital_id=CURRENT_HOSPITAL_ID,
+                           lat=None, lon=None):
+    """
+    Nearest k hospitals offering at least min_quantity of `resource`, seen
+    from hospital_id (or an explicit lat/lon). The origin's own offers are
+    excluded.
+    """
+    if lat is not None and lon is not None:
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError('lat must be within [-90, 90] and lon within [-180, 180]')
+    else:
+        origin = exchange.hospitals.get(hospital_id)
+        if origin is None:
+            raise ValueError(f'Unknown hospital {hospital_id}')
+        lat, lon = origin['lat'], origin['lon']
+    results = []
+    for offer, _ in exchange.nearest(resource, lat, lon, min_quantity, k, hospital_id):
+        hospital = exchange.hospitals[offer['hospital_id']]
+        km = haversine_km(lat, lon, hospital['lat'], hospital['lon'])
+        results.append({
+            'offer_id': offer['id'],
+            'hospital_id': hospital['id'],
+            'hospital_name': hospital['name'],
+            'resource_type': offer['resource_type'],
+            'quantity': offer['quantity'],
+            'availability': offer['availability'],
+            'distance_km': round(km, 2),
+            'distance': format_distance(km),
+            'contact': hospital['contact'],
+        })
+    return results
+
+
+@timed('match_resource_requests')
+def match_resource_requests(k=3):
+    """Nearest k candidate offers able to fill each pending request."""
     return [
-        {'id': 1, 'from_hospital': 'MetroCare Medical Center', 'resource': 'ICU Bed', 'quantity': 1, 'urgency': 'High', 'reason': 'Critical patient transfer', 'time': '15 mins ago'},
-        {'id': 2, 'from_hospital': 'LifeLine Hospital', 'resource': 'Blood Units (B+)', 'quantity': 3, 'urgency': 'Medium', 'reason': 'Emergency surgery', 'time': '1 hour ago'},
+        {
+            'request_id': r['id'],
+            'from_hospital': exchange.hospitals[r['hospital_id']]['name'],
+            'resource': r['resource'],
+            'quantity': r['quantity'],
+            'urgency': r['urgency'],
+            'candidates': find_nearest_resources(
+                r['resource'], r['quantity'], k, hospital_id=r['hospital_id']
+            ),
+        }
+        for r in sorted(exchange.requests.values(), key=lambda r: r['id'])
     ]
+
+
+@timed('solve_allocations')
+def solve_allocations(budget_ms=DEFAULT_BUDGET_MS):
+    """Urgency- and distance-weighted allocation of all pending requests."""
+    return allocator.solve(budget_ms)
+
+
+def update_offer(offer_id, **fields):
+    """Create or change an offer (quantity 0 withdraws it); returns the offer."""
+    with exchange._lock:
+        offer = dict(exchange.offers.get(offer_id, {'id': offer_id, 'availability': 'Immediate'}))
+        offer.update(fields)
+        if offer.get('hospital_id') not in exchange.hospitals:
+            raise ValueError(f"Unknown hospital {offer.get('hospital_id')}")
+        if not offer.get('resource_type'):
+            raise ValueError('resource_type is required')
+        offer['quantity'] = int(offer.get('quantity', 0))
+        exchange.upsert_offer(offer)
+        return dict(offer)
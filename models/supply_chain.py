@@ -1,138 +1,184 @@
 """
-Supply chain: deterministic, realistic inventory and trends (Vercel-safe).
-No filesystem, no DB, no randomness.
+Supply chain: inventory, shortage predictions and statistics derived from
+the supply tables in models/database.py.
+One vectorized pass over every item computes rolling usage, days remaining,
+reorder points and shortage dates; the result is cached until the day
+changes or a stock movement is recorded, and all three getters read it.
+Usage trends come from the ring-buffer aggregates in usage_stream.py.
 """
 
-from datetime import datetime, timedelta
+import threading
+from datetime import date, datetime, timedelta
 
+import numpy as np
 
-def get_supply_inventory():
-    return [
-        {
-            "id": 1,
-            "name": "PPE Kits (N95 Masks)",
-            "current_stock": 380,
-            "min_required": 1000,
-            "daily_usage": 95,
-            "days_remaining": 4,
-            "status": "Critical",
-            "auto_order": True,
-            "supplier": "MedSupply Co.",
-        },
-        {
-            "id": 2,
-            "name": "Surgical Gloves",
-            "current_stock": 2500,
-            "min_required": 2000,
-            "daily_usage": 250,
-            "days_remaining": 10,
-            "status": "Good",
-            "auto_order": False,
-            "supplier": "HealthCare Supplies Inc.",
-        },
-        {
-            "id": 3,
-            "name": "IV Fluids (Saline)",
-            "current_stock": 220,
-            "min_required": 500,
-            "daily_usage": 48,
-            "days_remaining": 5,
-            "status": "Low",
-            "auto_order": True,
-            "supplier": "Pharma Direct",
-        },
-        {
-            "id": 4,
-            "name": "Antibiotics (Amoxicillin)",
-            "current_stock": 620,
-            "min_required": 400,
-            "daily_usage": 38,
-            "days_remaining": 12,
-            "status": "Good",
-            "auto_order": False,
-            "supplier": "MediPharm Ltd.",
-        },
-        {
-            "id": 5,
-            "name": "Oxygen Cylinders",
-            "current_stock": 22,
-            "min_required": 50,
-            "daily_usage": 10,
-            "days_remaining": 2,
-            "status": "Critical",
-            "auto_order": True,
-            "supplier": "OxygenTech",
-        },
-        {
-            "id": 6,
-            "name": "Syringes (Disposable)",
-            "current_stock": 6200,
-            "min_required": 3000,
-            "daily_usage": 480,
-            "days_remaining": 12,
-            "status": "Good",
-            "auto_order": False,
-            "supplier": "MedSupply Co.",
-        },
-    ]
+from models.database import (
+    USAGE_WINDOW_DAYS,
+    current_facility,
+    get_supply_items,
+    get_supply_usage,
+    get_supply_version,
+)
+from models.metrics import timed
 
+# Buffer stock (days of usage) on top of lead-time demand
+SAFETY_DAYS = 2
 
+# Orders top stock up to this many days of usage beyond the lead time
+ORDER_COVER_DAYS = 14
 
-def get_supply_predictions():
-    """Supply shortage predictions."""
-    today = datetime.now()
-    return [
-        {
-            "item": "PPE Kits (N95 Masks)",
-            "shortageDate": (today + timedelta(days=4)).strftime("%Y-%m-%d"),
-            "severity": "High",
-            "recommendedOrder": "2000 units",
-            "estimatedCost": 3500,
-        },
-        {
-            "item": "Oxygen Cylinders",
-            "shortageDate": (today + timedelta(days=3)).strftime("%Y-%m-%d"),
-            "severity": "Critical",
-            "recommendedOrder": "50 cylinders",
-            "estimatedCost": 15000,
-        },
-        {
-            "item": "IV Fluids (Saline)",
-            "shortageDate": (today + timedelta(days=5)).strftime("%Y-%m-%d"),
-            "severity": "Medium",
-            "recommendedOrder": "500 units",
-            "estimatedCost": 2000,
-        },
-    ]
+# Order quantities are rounded up to this pack size
+ORDER_PACK = 10
 
+# Cap for items with no recent usage
+MAX_DAYS_REMAINING = 365
 
-def get_supply_statistics():
+# Reported as-is until waste is tracked per movement
+WASTAGE_REDUCTION = "15%"
+
+# Usage trend chart series -> supply item name
+TREND_SERIES = {
+    "ppe": "PPE Kits (N95 Masks)",
+    "ivFluids": "IV Fluids (Saline)",
+    "oxygen": "Oxygen Cylinders",
+}
+
+# {facility_id: (key, snapshot)}: each facility has its own stock
+_snapshots = {}
+_snapshot_lock = threading.Lock()
+
+
+def _compute_snapshot(today):
+    rows = get_supply_items()
+    usage_by_item = dict(get_supply_usage(USAGE_WINDOW_DAYS))
+
+    ids = np.asarray([r[0] for r in rows], dtype=np.int64)
+    stock = np.asarray([r[4] for r in rows], dtype=float)
+    minimum = np.asarray([r[5] for r in rows], dtype=float)
+    lead = np.asarray([r[6] for r in rows], dtype=float)
+    cost = np.asarray([r[7] for r in rows], dtype=float)
+    auto = np.asarray([bool(r[8]) for r in rows])
+    usage = np.asarray(
+        [usage_by_item.get(i, 0) for i in ids.tolist()], dtype=float
+    ) / USAGE_WINDOW_DAYS
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = np.where(usage > 0, np.floor(np.maximum(stock, 0) / usage), MAX_DAYS_REMAINING)
+    days = np.minimum(days, MAX_DAYS_REMAINING).astype(int)
+    reorder_point = usage * (lead + SAFETY_DAYS)
+
+    critical = days <= lead
+    low = ~critical & ((stock < minimum) | (stock <= reorder_point))
+    status = np.where(critical, 'Critical', np.where(low, 'Low', 'Good'))
+    severity = np.where(
+        days <= SAFETY_DAYS, 'Critical', np.where(days <= lead, 'High', 'Medium')
+    )
+
+    order_up_to = np.maximum(minimum, usage * (lead + ORDER_COVER_DAYS))
+    order_qty = np.ceil(np.maximum(order_up_to - stock, 0) / ORDER_PACK) * ORDER_PACK
+    order_cost = order_qty * cost
+    monthly_spend = float((usage * 30 * cost).sum())
+
+    inventory = []
+    predictions = []
+    for i, row in enumerate(rows):
+        item_id, name, supplier, unit = row[:4]
+        inventory.append({
+            "id": item_id,
+            "name": name,
+            "current_stock": int(stock[i]),
+            "min_required": int(minimum[i]),
+            "daily_usage": int(round(usage[i])),
+            "days_remaining": int(days[i]),
+            "status": str(status[i]),
+            "auto_order": bool(auto[i]),
+            "supplier": supplier,
+            "reorder_point": int(np.ceil(reorder_point[i])),
+            "lead_time_days": int(lead[i]),
+        })
+        if status[i] != 'Good':
+            predictions.append((int(days[i]), {
+                "item": name,
+                "shortageDate": (today + timedelta(days=int(days[i]))).strftime("%Y-%m-%d"),
+                "severity": str(severity[i]),
+                "recommendedOrder": f"{int(order_qty[i])} {unit}",
+                "estimatedCost": int(round(order_cost[i])),
+            }))
+    predictions.sort(key=lambda p: p[0])
+
+    statistics = {
+        "total_items": len(rows),
+        "critical_items": int(critical.sum()),
+        "auto_orders_pending": int((auto & (stock <= reorder_point)).sum()),
+        "monthly_spend": f"${monthly_spend:,.0f}",
+        "wastage_reduction": WASTAGE_REDUCTION,
+    }
     return {
-        "total_items": 6,
-        "critical_items": 2,
-        "auto_orders_pending": 4,
-        "monthly_spend": "$52,400",
-        "wastage_reduction": "15%",
+        "inventory": inventory,
+        "predictions": [p for _, p in predictions],
+        "statistics": statistics,
     }
 
 
+def supply_snapshot_key():
+    """Changes whenever the snapshot (and so every supply payload) would."""
+    return (current_facility(), date.today(), get_supply_version())
 
-def get_usage_trend():
-    """7-day usage trend (frontend-chart friendly)."""
-    today = datetime.now()
 
-    base_ppe = [92, 98, 105, 102, 96, 88, 90]
-    base_iv = [44, 48, 52, 50, 46, 42, 44]
-    base_oxygen = [9, 10, 11, 10, 9, 8, 9]
+@timed('supply_snapshot')
+def supply_snapshot():
+    """Inventory, predictions and statistics from one cached pass."""
+    key = supply_snapshot_key()
+    with _snapshot_lock:
+        cached_key, snapshot = _snapshots.get(key[0], (None, None))
+        if cached_key != key:
+            snapshot = _compute_snapshot(key[1])
+            _snapshots[key[0]] = (key, snapshot)
+        return snapshot
 
-    trend = []
-    for i in range(7):
-        day = today - timedelta(days=6 - i)
-        trend.append({
-            "date": day.strftime("%a"),
-            "ppe": base_ppe[i],
-            "ivFluids": base_iv[i],
-            "oxygen": base_oxygen[i],
-        })
 
-    return trend
+def clear_supply_cache():
+    """Force the next call to recompute every facility's snapshot."""
+    with _snapshot_lock:
+        _snapshots.clear()
+
+
+def get_supply_inventory():
+    return [dict(item) for item in supply_snapshot()["inventory"]]
+
+
+def get_supply_predictions():
+    """Supply shortage predictions, soonest first."""
+    return [dict(p) for p in supply_snapshot()["predictions"]]
+
+
+def get_supply_statistics():
+    return dict(supply_snapshot()["statistics"])
+
+
+def get_usage_trend(days=7, hourly=False):
+    """
+    Usage per trend series for the last `days` complete days, or for the
+    last days x 24 hours up to the current one when hourly (chart friendly).
+    """
+    from models.usage_stream import get_aggregator
+
+    aggregator = get_aggregator()
+    names = list(TREND_SERIES)
+    ids = [aggregator.item_id(TREND_SERIES[n]) for n in names]
+    now = datetime.now()
+    if hourly:
+        count = days * 24
+        matrix = aggregator.window(ids, count, hourly=True, end=now)
+        stamps = [now - timedelta(hours=count - 1 - i) for i in range(count)]
+        labels = [s.strftime("%a %H:00") for s in stamps]
+    else:
+        matrix = aggregator.window(ids, days, end=now - timedelta(days=1))
+        stamps = [now - timedelta(days=days - i) for i in range(days)]
+        labels = [s.strftime("%a" if days <= 7 else "%Y-%m-%d") for s in stamps]
+
+    values = matrix.T.tolist()
+    return [
+        {"date": label, **dict(zip(names, row))}
+        for label, row in zip(labels, values)
+    ]
@@ -1,43 +1,466 @@
 """
-Emergency surge predictor: deterministic, realistic data (no random).
-In production, integrate with weather APIs and event calendars.
+Emergency surge predictor: event-calendar and weather feeds scored by a
+compiled rule model (no random).
+Feeds are read from local files (HEALFLOW_EVENT_FEED, JSON lines, and
+HEALFLOW_WEATHER_FEED, JSON) and reloaded when they change; without them a
+deterministic stub calendar is used. Each rule becomes a row of a rate x
+department-share matrix, so every (event, department) pair is scored in
+one NumPy pass. Per-event contributions are kept, so adding, changing or
+removing one event adjusts the statistics without rescoring the rest.
 """
-from datetime import datetime
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime, timedelta
 
+import numpy as np
 
-def predict_surge_events():
-    """Surge events with fixed, realistic predicted cases."""
+from models.errors import NotFound
+from models.inflow_model import DEPARTMENT_BASE_RATES
+from models.metrics import timed
+
+log = logging.getLogger(__name__)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+EVENT_FEED_PATH = os.environ.get('HEALFLOW_EVENT_FEED') or os.path.join(BASE_DIR, 'data', 'feeds', 'events.jsonl')
+WEATHER_FEED_PATH = os.environ.get('HEALFLOW_WEATHER_FEED') or os.path.join(BASE_DIR, 'data', 'feeds', 'weather.json')
+
+DEPARTMENTS = list(DEPARTMENT_BASE_RATES)
+
+# Event categories: expected cases per 1000 exposed people, split across
+# departments. Outdoor events also scale with the weather multiplier.
+SURGE_RULES = {
+    'marathon': {
+        'label': 'Marathon Event', 'cases_per_1000': 1.0, 'outdoor': True,
+        'departments': {'Emergency': 0.7, 'Orthopedics': 0.3},
+        'case_types': 'Dehydration, Heat Stroke, Minor Injuries',
+        'recommendation': 'Deploy 2 additional doctors, stock IV fluids',
+    },
+    'heavy_rain': {
+        'label': 'Heavy Rain Alert', 'cases_per_1000': 0.1, 'outdoor': False,
+        'departments': {'Emergency': 0.6, 'Orthopedics': 0.4},
+        'case_types': 'Accident Trauma, Fractures',
+        'recommendation': 'Prepare trauma bay, alert surgical team',
+    },
+    'flu_season': {
+        'label': 'Flu Season Peak', 'cases_per_1000': 0.1, 'outdoor': False,
+        'departments': {'General Medicine': 0.6, 'Pediatrics': 0.4},
+        'case_types': 'Respiratory Issues, Fever',
+        'recommendation': 'Increase bed capacity, stock antivirals',
+    },
+    'food_festival': {
+        'label': 'Food Festival', 'cases_per_1000': 1.0, 'outdoor': True,
+        'departments': {'Emergency': 1.0},
+        'case_types': 'Food Poisoning, Allergic Reactions',
+        'recommendation': 'Stock anti-allergy meds, prepare GI treatment',
+    },
+    'concert': {
+        'label': 'Concert', 'cases_per_1000': 0.6, 'outdoor': True,
+        'departments': {'Emergency': 0.8, 'General Medicine': 0.2},
+        'case_types': 'Intoxication, Crowd Injuries',
+        'recommendation': 'Staff triage desk, prepare observation beds',
+    },
+    'heatwave': {
+        'label': 'Heatwave', 'cases_per_1000': 0.05, 'outdoor': False,
+        'departments': {'Emergency': 0.5, 'Cardiology': 0.2, 'General Medicine': 0.3},
+        'case_types': 'Heat Exhaustion, Cardiac Stress',
+        'recommendation': 'Open cooling area, review cardiac bed capacity',
+    },
+}
+
+WEATHER_IMPACT = {
+    'Clear': {'multiplier': 1.0, 'types': 'Regular cases'},
+    'Rainy': {'multiplier': 1.15, 'types': 'Accidents, Fractures'},
+    'Hot & Humid': {'multiplier': 1.25, 'types': 'Heat stroke, Dehydration'},
+    'Stormy': {'multiplier': 1.3, 'types': 'Trauma, Electric injuries'},
+}
+
+# Stub weather service: condition rotates by weekday so it's stable per day
+WEEKDAY_CONDITIONS = ['Clear', 'Rainy', 'Hot & Humid', 'Clear', 'Stormy', 'Clear', 'Rainy']
+
+# Predicted cases at or above these are High / Medium severity
+HIGH_SEVERITY_CASES = 30
+MEDIUM_SEVERITY_CASES = 12
+
+# Departments expecting at least this many surge cases are put on alert
+DEPARTMENT_ALERT_CASES = 10
+
+# Stub calendar: (id, category, location, exposed people, hours from now, duration hours)
+STUB_EVENTS = [
+    (1, 'marathon', 'City Center', 20000, 2, 6),
+    (2, 'heavy_rain', 'Highway Area', 110000, 4, 8),
+    (3, 'flu_season', 'Citywide', 420000, 0, 24 * 7),
+    (4, 'food_festival', 'Downtown', 14000, 6, 10),
+]
+
+
+def compile_rules(rules, departments):
+    """Rules -> (category index, rate vector, outdoor mask, share matrix)."""
+    categories = {name: i for i, name in enumerate(rules)}
+    rates = np.asarray([r['cases_per_1000'] for r in rules.values()], dtype=float)
+    outdoor = np.asarray([r['outdoor'] for r in rules.values()], dtype=bool)
+    shares = np.zeros((len(rules), len(departments)))
+    dept_index = {d: j for j, d in enumerate(departments)}
+    for i, rule in enumerate(rules.values()):
+        for dept, share in rule['departments'].items():
+            shares[i, dept_index[dept]] = share
+    return categories, rates, outdoor, shares
+
+
+def _stub_events(now):
+    start_of_hour = now.replace(minute=0, second=0, microsecond=0)
     return [
-        {'id': 1, 'type': 'Marathon Event', 'location': 'City Center', 'predicted_cases': 20, 'case_types': 'Dehydration, Heat Stroke, Minor Injuries', 'time_to_event': '2 hours', 'severity': 'Medium', 'departments_affected': ['Emergency', 'Orthopedics'], 'recommendation': 'Deploy 2 additional doctors, stock IV fluids'},
-        {'id': 2, 'type': 'Heavy Rain Alert', 'location': 'Highway Area', 'predicted_cases': 11, 'case_types': 'Accident Trauma, Fractures', 'time_to_event': '4 hours', 'severity': 'Low', 'departments_affected': ['Emergency', 'Orthopedics'], 'recommendation': 'Prepare trauma bay, alert surgical team'},
-        {'id': 3, 'type': 'Flu Season Peak', 'location': 'Citywide', 'predicted_cases': 42, 'case_types': 'Respiratory Issues, Fever', 'time_to_event': 'Today', 'severity': 'High', 'departments_affected': ['General Medicine', 'Pediatrics'], 'recommendation': 'Increase bed capacity, stock antivirals'},
-        {'id': 4, 'type': 'Food Festival', 'location': 'Downtown', 'predicted_cases': 14, 'case_types': 'Food Poisoning, Allergic Reactions', 'time_to_event': '6 hours', 'severity': 'Medium', 'departments_affected': ['Emergency'], 'recommendation': 'Stock anti-allergy meds, prepare GI treatment'},
+        {
+            'id': event_id, 'category': category, 'location': location, 'exposure': exposure,
+            'start': (start_of_hour + timedelta(hours=offset)).isoformat(),
+            'duration_hours': duration,
+        }
+        for event_id, category, location, exposure, offset, duration in STUB_EVENTS
     ]
 
 
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def load_event_feed(path=None, now=None):
+    """
+    Events from a JSON-lines file, or the stub calendar when it is absent.
+    Lines that are not JSON objects are skipped and logged.
+    """
+    path = path or EVENT_FEED_PATH
+    if _mtime(path) is None:
+        return _stub_events(now or datetime.now())
+    events = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            if not isinstance(event, dict):
+                log.warning('Skipping malformed line %d of event feed %s', number, path)
+                continue
+            events.append(event)
+    return events
+
+
+def load_weather_feed(path=None, today=None):
+    """Today's condition from a JSON file ({"condition": ...} or {date: condition})."""
+    path = path or WEATHER_FEED_PATH
+    today = today or datetime.now().date()
+    if _mtime(path) is not None:
+        try:
+            with open(path) as f:
+                feed = json.load(f)
+            condition = feed.get('condition') or feed.get(today.isoformat())
+        except (OSError, ValueError, AttributeError):
+            log.warning('Ignoring malformed weather feed %s', path)
+            condition = None
+        if isinstance(condition, str) and condition in WEATHER_IMPACT:
+            return condition
+    return WEEKDAY_CONDITIONS[today.weekday()]
+
+
+def _severity(cases):
+    if cases >= HIGH_SEVERITY_CASES:
+        return 'High'
+    if cases >= MEDIUM_SEVERITY_CASES:
+        return 'Medium'
+    return 'Low'
+
+
+def _time_to_event(start, now):
+    hours = (start - now).total_seconds() / 3600
+    if hours <= 0.5:
+        return 'Today' if hours > -24 else 'Ongoing'
+    return f'{round(hours)} hour' if round(hours) == 1 else f'{round(hours)} hours'
+
+
+class SurgeEngine:
+    """Scored events plus incrementally maintained aggregates."""
+
+    def __init__(self, rules=SURGE_RULES, departments=DEPARTMENTS):
+        self.rules = rules
+        self.departments = list(departments)
+        self.categories, self.rates, self.outdoor, self.shares = compile_rules(rules, self.departments)
+        self._lock = threading.RLock()
+        self.events = {}
+        self.scores = {}
+        self.dept_totals = np.zeros(len(self.departments))
+        self.total_cases = 0
+        self.high_risk = 0
+        self.condition = None
+        self.version = 0
+        self._feed_key = None
+        # Events added, changed or removed (None) through the API, applied
+        # on top of the feed so they survive a reload
+        self.overrides = {}
+
+    # -- scoring --------------------------------------------------------
+
+    def _weather_factor(self):
+        return WEATHER_IMPACT[self.condition]['multiplier']
+
+    def score(self, events, condition=None):
+        """(events x departments) expected cases for a list of event dicts."""
+        if not events:
+            return np.zeros((0, len(self.departments)))
+        cat = np.asarray([self.categories[e['category']] for e in events])
+        exposure = np.asarray([float(e.get('exposure', 0)) for e in events])
+        intensity = np.asarray([float(e.get('intensity', 1.0)) for e in events])
+        factor = WEATHER_IMPACT[condition]['multiplier'] if condition else self._weather_factor()
+        weather = np.where(self.outdoor[cat], factor, 1.0)
+        per_event = exposure / 1000 * self.rates[cat] * weather * intensity
+        return per_event[:, None] * self.shares[cat]
+
+    def _add(self, event, row):
+        cases = int(round(float(row.sum())))
+        rule = self.rules[event['category']]
+        order = np.argsort(-row, kind='stable')
+        # Everything but time_to_event is fixed until the event is rescored
+        view = {
+            'id': event['id'],
+            'type': event.get('name') or rule['label'],
+            'location': event.get('location', ''),
+            'predicted_cases': cases,
+            'case_types': rule['case_types'],
+            'severity': _severity(cases),
+            'departments_affected': [self.departments[j] for j in order if row[j] > 0],
+            'recommendation': rule['recommendation'],
+        }
+        self.events[event['id']] = event
+        self.scores[event['id']] = (row, cases, view)
+        self.dept_totals += row
+        self.total_cases += cases
+        self.high_risk += _severity(cases) == 'High'
+
+    def _drop(self, event_id):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return
+        row, cases, _ = self.scores.pop(event_id)
+        self.dept_totals -= row
+        self.total_cases -= cases
+        self.high_risk -= _severity(cases) == 'High'
+
+    def _rebuild(self, events, condition):
+        # Everything that can fail happens before the current state is reset
+        merged = {}
+        for event in events:
+            category = event.get('category')
+            if not isinstance(category, str) or category not in self.categories:
+                continue
+            try:
+                event = _normalize_event(event)
+            except (TypeError, ValueError) as exc:
+                log.warning('Skipping surge feed event %r: %s', event.get('id'), exc)
+                continue
+            merged[event['id']] = event
+        merged.update(self.overrides)
+        valid = [e for e in merged.values() if e is not None]
+        rows = self.score(valid, condition)
+
+        self.events, self.scores = {}, {}
+        self.dept_totals = np.zeros(len(self.departments))
+        self.total_cases = self.high_risk = 0
+        self.condition = condition
+        for event, row in zip(valid, rows):
+            self._add(event, row)
+        self.version += 1
+
+    # -- feeds ----------------------------------------------------------
+
+    def refresh(self):
+        """Reload feeds when a file or the day changed (the stub is day-keyed)."""
+        today = datetime.now().date()
+        key = (_mtime(EVENT_FEED_PATH), _mtime(WEATHER_FEED_PATH), today)
+        with self._lock:
+            if key != self._feed_key:
+                self._rebuild(load_event_feed(), load_weather_feed(today=today))
+                self._feed_key = key
+
+    def upsert_event(self, event):
+        """Add or replace one event, rescoring only that event."""
+        category = event.get('category')
+        if not isinstance(category, str) or category not in self.categories:
+            raise ValueError(f'Unknown surge category {category!r}')
+        event = _normalize_event(event)
+        with self._lock:
+            self.refresh()
+            # Score before touching any state, so a bad event changes nothing
+            row = self.score([event])[0]
+            self.overrides[event['id']] = event
+            self._drop(event['id'])
+            self._add(event, row)
+            self.version += 1
+        return event
+
+    def remove_event(self, event_id):
+        with self._lock:
+            self.refresh()
+            if event_id not in self.events:
+                raise NotFound(f'Unknown surge event {event_id}')
+            self.overrides[event_id] = None
+            self._drop(event_id)
+            self.version += 1
+
+    def hourly_cases(self, start, hours):
+        """
+        (departments x hours) surge cases from `start` (an hour-aligned
+        datetime), each event's cases spread evenly over its duration.
+        """
+        out = np.zeros((len(self.departments), hours))
+        with self._lock:
+            self.refresh()
+            for event_id, event in self.events.items():
+                row = self.scores[event_id][0]
+                duration = max(event['duration_hours'], 1.0)
+                offset = (event['start'] - start).total_seconds() / 3600
+                first, last = max(int(np.floor(offset)), 0), min(int(np.ceil(offset + duration)), hours)
+                if first >= last:
+                    continue
+                # Fraction of each hour the event covers
+                edges = np.arange(first, last + 1, dtype=float)
+                cover = np.clip(np.minimum(edges[1:], offset + duration) - np.maximum(edges[:-1], offset), 0, 1)
+                out[:, first:last] += row[:, None] * (cover / duration)
+        return out
+
+    # -- views ----------------------------------------------------------
+
+    def state(self):
+        """Consistent copy of version, weather condition, events and overrides."""
+        with self._lock:
+            self.refresh()
+            return {
+                'version': self.version,
+                'condition': self.condition,
+                'events': dict(self.events),
+                'overrides': dict(self.overrides),
+            }
+
+    def daily_conditions(self, start, days):
+        """Weather condition for each of `days` days from the date `start`."""
+        with self._lock:
+            self.refresh()
+            today = self.condition
+        # Later days come from the feed's per-date entries or the stub calendar
+        return [today] + [load_weather_feed(today=start + timedelta(days=i)) for i in range(1, days)]
+
+    def event_rows(self):
+        now = datetime.now()
+        with self._lock:
+            self.refresh()
+            rows = []
+            for event_id in sorted(self.events):
+                view = self.scores[event_id][2]
+                rows.append({
+                    **view,
+                    'time_to_event': _time_to_event(self.events[event_id]['start'], now),
+                })
+            return rows
+
+    def statistics(self):
+        with self._lock:
+            self.refresh()
+            on_alert = [
+                d for d, cases in zip(self.departments, self.dept_totals)
+                if cases >= DEPARTMENT_ALERT_CASES
+            ]
+            return {
+                'total_predicted_cases': self.total_cases,
+                'high_risk_events': int(self.high_risk),
+                'departments_on_alert': on_alert,
+                'preparation_score': max(50, 100 - 8 * int(self.high_risk) - self.total_cases // 10),
+                'events': len(self.events),
+            }
+
+
+def _non_negative(event, key, default):
+    try:
+        value = float(event.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} must be a number')
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f'{key} must be a finite, non-negative number')
+    return value
+
+
+def _timestamp(event, key, default=None):
+    value = event.get(key)
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f'{key} must be an ISO 8601 timestamp')
+    elif not isinstance(value, datetime):
+        raise TypeError(f'{key} must be an ISO 8601 string')
+    if value.tzinfo is not None:
+        # Everything else here is naive local time
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def _normalize_event(event):
+    """Typed copy of an event; TypeError / ValueError for malformed fields."""
+    event = dict(event)
+    event_id = event.get('id')
+    if isinstance(event_id, bool) or not isinstance(event_id, int):
+        raise TypeError('id must be an integer')
+    event['start'] = start = _timestamp(event, 'start', datetime.now())
+    end = _timestamp(event, 'end')
+    if end is not None:
+        if end < start:
+            raise ValueError('end must not be before start')
+        # An explicit end sets the duration unless one is given
+        event.setdefault('duration_hours', (end - start).total_seconds() / 3600)
+        event['end'] = end.isoformat()
+    event['duration_hours'] = _non_negative(event, 'duration_hours', 4)
+    event['exposure'] = _non_negative(event, 'exposure', 0)
+    event['intensity'] = _non_negative(event, 'intensity', 1.0)
+    return event
+
+
+engine = SurgeEngine()
+
+
+@timed('predict_surge_events')
+def predict_surge_events():
+    """Surge events with predicted cases, severity and affected departments."""
+    return engine.event_rows()
+
+
 def get_surge_statistics():
-    """Surge statistics (deterministic)."""
-    return {
-        'total_predicted_cases': 87,
-        'high_risk_events': 2,
-        'departments_on_alert': ['Emergency', 'Orthopedics', 'General Medicine'],
-        'preparation_score': 84,
-    }
+    """Totals derived from the same scores as predict_surge_events."""
+    return engine.statistics()
 
 
 def get_weather_impact():
-    """Weather impact: deterministic by day of week (for demo)."""
-    weekday = datetime.now().weekday()
-    # Rotate condition by weekday so it's stable per day
-    conditions = ['Clear', 'Rainy', 'Hot & Humid', 'Clear', 'Stormy', 'Clear', 'Rainy']
-    condition = conditions[weekday]
-    impact_map = {
-        'Rainy': {'cases': '+15%', 'types': 'Accidents, Fractures'},
-        'Hot & Humid': {'cases': '+25%', 'types': 'Heat stroke, Dehydration'},
-        'Clear': {'cases': 'Normal', 'types': 'Regular cases'},
-        'Stormy': {'cases': '+30%', 'types': 'Trauma, Electric injuries'},
-    }
+    """Weather condition and its impact on patient volume."""
+    condition = engine.state()['condition']
+    impact = WEATHER_IMPACT[condition]
+    pct = round((impact['multiplier'] - 1) * 100)
     return {
         'condition': condition,
-        'impact': impact_map[condition],
+        'impact': {'cases': f'+{pct}%' if pct else 'Normal', 'types': impact['types']},
+        'multiplier': impact['multiplier'],
     }
+
+
+def upsert_surge_event(event):
+    event = engine.upsert_event(event)
+    return {**event, 'start': event['start'].isoformat()}
+
+
+def remove_surge_event(event_id):
+    engine.remove_event(event_id)
+    return {'id': event_id, 'removed': True}
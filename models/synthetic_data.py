@@ -0,0 +1,240 @@
+"""
+Deterministic synthetic hospital generator for load testing.
+Builds N departments with beds, staff and months of admissions. Rows are
+streamed from generators into executemany inside one transaction, and the
+occupancy summary and indexes are built once after the load. Expect
+roughly 180k rows/s (about a minute per 10M rows); the sqlite3 insert
+path is the limit.
+
+The target file is overwritten, so there is no default: pass --db or
+--facilities.
+
+Usage:
+    python -m models.synthetic_data --departments 40 --months 12 --db /tmp/load.db
+    python -m models.synthetic_data --facilities 24    # one file per facility
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from models.database import (
+    FACILITY_DIR,
+    INSERT_BED_SQL,
+    INSERT_DEPARTMENT_SQL,
+    INSERT_PATIENT_SQL,
+    INSERT_STAFF_SQL,
+    PATIENT_NAMES,
+    PATIENT_STATUSES,
+    bed_rows,
+    create_schema,
+    migrate,
+    staff_rows,
+)
+from models.inflow_model import DEPARTMENT_BASE_RATES, DAY_OF_WEEK_MULTIPLIER
+from models.resource_exchange import HOSPITALS, KM_PER_DEGREE, URGENCY_PENALTY_KM
+
+# Shareable resource types for synthetic exchange networks
+RESOURCE_TYPES = [
+    'ICU Beds', 'General Beds', 'Ventilators', 'Surgical Team',
+    'Blood Units (O+)', 'Blood Units (A+)', 'Blood Units (B+)', 'Dialysis Machines',
+]
+
+
+def department_names(count):
+    """Standard departments first, then numbered units."""
+    names = list(DEPARTMENT_BASE_RATES)[:count]
+    names += [f"Unit {i:03d}" for i in range(len(names) + 1, count + 1)]
+    return names
+
+
+def _bed_prefix(name):
+    # Numbered units share their first letters, so use the full compact name
+    if name in DEPARTMENT_BASE_RATES:
+        return name[:3].upper()
+    return name.replace(" ", "").upper()
+
+
+def _department_layout(names, beds_per_department, rng):
+    occupancy = rng.uniform(0.6, 0.9, size=len(names))
+    return [
+        (name, beds_per_department, int(beds_per_department * occ))
+        for name, occ in zip(names, occupancy)
+    ]
+
+
+def admission_rows(names, days, end, rng, admissions_scale=1.0):
+    """
+    Admissions for `days` days ending on `end` (inclusive). Each department
+    draws Poisson(base rate × weekday multiplier) patients per day, one day
+    at a time so memory stays flat.
+    """
+    base = np.asarray([DEPARTMENT_BASE_RATES.get(n, 35) for n in names], dtype=float)
+    base *= admissions_scale
+    dept_names = np.asarray(names, dtype=object)
+    patient_names = np.asarray(PATIENT_NAMES, dtype=object)
+    statuses = np.asarray(PATIENT_STATUSES, dtype=object)
+    for offset in range(days - 1, -1, -1):
+        day = end - timedelta(days=offset)
+        counts = rng.poisson(base * DAY_OF_WEEK_MULTIPLIER.get(day.weekday(), 1.0))
+        total = int(counts.sum())
+        seconds = np.sort(rng.integers(0, 86400, size=total)).astype("timedelta64[s]")
+        stamps = np.char.replace(
+            np.datetime_as_string(np.datetime64(day) + seconds, unit="s"), "T", " "
+        )
+        yield from zip(
+            patient_names[rng.integers(0, len(PATIENT_NAMES), size=total)].tolist(),
+            np.repeat(dept_names, counts).tolist(),
+            stamps.tolist(),
+            statuses[rng.integers(0, len(PATIENT_STATUSES), size=total)].tolist(),
+        )
+
+
+def generate_hospital(path, departments=5, beds_per_department=30,
+                      months=1, staff_per_department=6, admissions_scale=1.0,
+                      seed=42, end=None):
+    """
+    Create (or overwrite) a synthetic hospital database at `path`.
+    The same arguments always produce the same rows. Returns row counts.
+    """
+    rng = np.random.default_rng(seed)
+    names = department_names(departments)
+    layout = _department_layout(names, beds_per_department, rng)
+    end = end or date.today()
+
+    conn = sqlite3.connect(path)
+    # Bulk-load settings: no rollback journal, no fsync until the end
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    create_schema(cursor)
+    cursor.executemany(INSERT_DEPARTMENT_SQL, layout)
+    cursor.executemany(INSERT_BED_SQL, bed_rows(layout, _bed_prefix))
+    cursor.executemany(INSERT_STAFF_SQL, staff_rows(names, staff_per_department))
+    cursor.executemany(
+        INSERT_PATIENT_SQL,
+        admission_rows(names, months * 30, end, rng, admissions_scale),
+    )
+    migrate(cursor)
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+
+    counts = {
+        table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        for table in ("departments", "beds", "staff", "patients")
+    }
+    conn.close()
+    return counts
+
+
+def generate_network(directory=FACILITY_DIR, facilities=10, seed=42, **kwargs):
+    """
+    One synthetic hospital per facility, written as <directory>/<id>.db
+    with ids facility_001, facility_002, ... and a different seed each.
+    Extra keyword arguments go to generate_hospital. Returns {id: counts}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for i in range(facilities):
+        facility_id = f"facility_{i + 1:03d}"
+        path = os.path.join(directory, f"{facility_id}.db")
+        counts[facility_id] = generate_hospital(path=path, seed=seed + i, **kwargs)
+    return counts
+
+
+def resource_network(hospitals=300, radius_km=60, offers_per_hospital=3,
+                     requests=100, seed=42):
+    """
+    (hospitals, offers, requests) for a regional exchange network around
+    the demo hospital, shaped like resource_exchange.HOSPITALS / OFFERS /
+    REQUESTS.
+    """
+    rng = np.random.default_rng(seed)
+    center = HOSPITALS[0]
+    # Uniform over the disc: sqrt for radius, cos(lat) for longitude
+    r = radius_km * np.sqrt(rng.random(hospitals))
+    theta = rng.uniform(0, 2 * np.pi, hospitals)
+    lat = center['lat'] + r * np.sin(theta) / KM_PER_DEGREE
+    lon = center['lon'] + r * np.cos(theta) / (KM_PER_DEGREE * np.cos(np.radians(center['lat'])))
+    network = [dict(center)] + [
+        {
+            'id': i + 2,
+            'name': f'Regional Hospital {i + 2:04d}',
+            'location': f'Zone {int(t / (np.pi / 4)) + 1}',
+            'lat': round(float(la), 6),
+            'lon': round(float(lo), 6),
+            'status': 'Active',
+            'contact': f'+1-555-{(i + 2) % 10000:04d}',
+        }
+        for i, (la, lo, t) in enumerate(zip(lat, lon, theta))
+    ]
+    offers = []
+    for hospital in network[1:]:
+        types = rng.choice(len(RESOURCE_TYPES), size=offers_per_hospital, replace=False)
+        for t in types.tolist():
+            offers.append({
+                'id': len(offers) + 1,
+                'hospital_id': hospital['id'],
+                'resource_type': RESOURCE_TYPES[t],
+                'quantity': int(rng.integers(1, 8)),
+                'availability': 'Immediate' if rng.random() < 0.6 else 'Within 2 hours',
+            })
+    urgencies = list(URGENCY_PENALTY_KM)
+    pending = [
+        {
+            'id': i + 1,
+            'hospital_id': int(rng.integers(1, len(network) + 1)),
+            'resource': RESOURCE_TYPES[int(rng.integers(len(RESOURCE_TYPES)))],
+            'quantity': int(rng.integers(1, 5)),
+            'urgency': urgencies[int(rng.integers(len(urgencies)))],
+            'reason': 'Synthetic transfer request',
+            'minutes_ago': int(rng.integers(1, 240)),
+        }
+        for i in range(requests)
+    ]
+    return network, offers, pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a synthetic HealFlow database")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--db", help="SQLite file to (re)create")
+    target.add_argument("--facilities", type=int,
+                        help="write this many facility databases instead of --db")
+    parser.add_argument("--departments", type=int, default=5)
+    parser.add_argument("--beds", type=int, default=30, help="beds per department")
+    parser.add_argument("--months", type=int, default=1, help="months of admissions")
+    parser.add_argument("--staff", type=int, default=6, help="staff per department")
+    parser.add_argument("--scale", type=float, default=1.0, help="admission rate multiplier")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--facility-dir", default=FACILITY_DIR,
+                        help="directory for --facilities (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    options = dict(
+        departments=args.departments,
+        beds_per_department=args.beds,
+        months=args.months,
+        staff_per_department=args.staff,
+        admissions_scale=args.scale,
+        seed=args.seed,
+    )
+    start = time.perf_counter()
+    if args.facilities:
+        network = generate_network(os.path.abspath(args.facility_dir), args.facilities, **options)
+        rows = sum(sum(counts.values()) for counts in network.values())
+        target = f"{args.facility_dir}: {len(network)} facilities"
+    else:
+        counts = generate_hospital(path=os.path.abspath(args.db), **options)
+        rows = sum(counts.values())
+        target = f"{args.db}: {counts}"
+    elapsed = time.perf_counter() - start
+    print(f"{target} ({rows} rows in {elapsed:.2f}s, {rows / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
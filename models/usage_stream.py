@@ -0,0 +1,373 @@
+"""
+Streaming ingestion of stock-usage (dispensing) events.
+Events are folded into fixed-size ring buffers of hourly and daily buckets
+per item, so any trend window is read in O(buckets) without touching raw
+events. Pending per-(item, hour) totals are persisted periodically as one
+stock movement each; the database triggers then update stock levels and
+the stored hourly/daily buckets the rings are reloaded from on start-up.
+
+Bulk import:
+    python -m models.usage_stream events.jsonl
+    python -m models.usage_stream dispensing.csv
+"""
+import argparse
+import atexit
+import csv
+import functools
+import io
+import json
+import math
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from models import database
+from models.metrics import timed
+
+# Ring sizes: two weeks of hours, a year of days
+HOURLY_BUCKETS = 24 * 14
+DAILY_BUCKETS = 366
+
+# Pending totals are written after this many seconds or (item, hour) cells
+FLUSH_INTERVAL = 30.0
+FLUSH_MAX_PENDING = 50000
+
+# Largest quantity one event may carry (keeps int64 bucket sums safe)
+MAX_EVENT_QUANTITY = 1_000_000
+
+# Events stamped later than now plus this are rejected
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+
+# Events parsed per vectorized update during bulk imports
+IMPORT_CHUNK = 10000
+
+
+def hour_index(moment):
+    """Hours since 0001-01-01 (local time)."""
+    return moment.toordinal() * 24 + moment.hour
+
+
+def hour_label(index):
+    day, hour = divmod(index, 24)
+    return f"{date.fromordinal(day).isoformat()} {hour:02d}"
+
+
+def _parse_hour(label):
+    return date.fromisoformat(label[:10]).toordinal() * 24 + int(label[11:13])
+
+
+class RingBuffer:
+    """
+    Consecutive time buckets for many items; one row per item and a shared
+    head (newest bucket). Advancing the head zeroes the slots it reuses.
+    """
+
+    def __init__(self, size, rows=64):
+        self.size = size
+        self.values = np.zeros((rows, size), dtype=np.int64)
+        self.head = None
+
+    def advance(self, bucket):
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        if bucket - self.head >= self.size:
+            self.values[:] = 0
+        else:
+            self.values[:, np.arange(self.head + 1, bucket + 1) % self.size] = 0
+        self.head = bucket
+
+    def add(self, rows, buckets, quantities):
+        """Add quantities; returns how many fell before the oldest bucket."""
+        if not len(buckets):
+            return 0
+        self.advance(int(buckets.max()))
+        valid = buckets > self.head - self.size
+        np.add.at(self.values, (rows[valid], buckets[valid] % self.size), quantities[valid])
+        return int((~valid).sum())
+
+    def window(self, rows, end, count):
+        """count buckets ending at `end` (inclusive) for each row, oldest first."""
+        buckets = np.arange(end - count + 1, end + 1)
+        out = np.zeros((len(rows), count), dtype=np.int64)
+        if self.head is not None:
+            valid = (buckets > self.head - self.size) & (buckets <= self.head)
+            out[:, valid] = self.values[np.ix_(rows, buckets[valid] % self.size)]
+        return out
+
+
+def _scoped(method):
+    """Run an aggregator method against its own facility's database."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with database.facility(self.facility_id):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class UsageAggregator:
+    """In-memory hourly/daily rings plus totals not yet persisted, for one facility."""
+
+    def __init__(self, facility_id=database.DEFAULT_FACILITY):
+        self.facility_id = facility_id
+        self._lock = threading.RLock()
+        self._rows = {}
+        self._names = {}
+        self._hourly = RingBuffer(HOURLY_BUCKETS)
+        self._daily = RingBuffer(DAILY_BUCKETS)
+        self._pending = {}
+        self._version = None
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self.stats = {'events': 0, 'rejected': 0, 'late': 0, 'flushes': 0}
+
+    def _load(self):
+        """Rebuild rings from stored buckets, then re-apply pending totals."""
+        self._version = database.get_supply_version()
+        self._rows = {}
+        self._names = {}
+        for row in database.get_supply_items():
+            self._rows[row[0]] = len(self._rows)
+            self._names[row[1]] = row[0]
+        self._hourly = RingBuffer(HOURLY_BUCKETS, max(len(self._rows), 1))
+        self._daily = RingBuffer(DAILY_BUCKETS, max(len(self._rows), 1))
+        now = hour_index(datetime.now())
+        self._hourly.advance(now)
+        self._daily.advance(now // 24)
+
+        since = now - HOURLY_BUCKETS + 1
+        hourly = database.get_usage_buckets(True, hour_label(since))
+        self._apply(hourly, _parse_hour, self._hourly)
+        since_day = date.fromordinal(now // 24 - DAILY_BUCKETS + 1).isoformat()
+        daily = database.get_usage_buckets(False, since_day)
+        self._apply(daily, lambda d: date.fromisoformat(d).toordinal(), self._daily)
+
+        if self._pending:
+            cells = list(self._pending.items())
+            rows = np.asarray([self._rows[item] for (item, _), _ in cells])
+            hours = np.asarray([hour for (_, hour), _ in cells])
+            quantities = np.asarray([q for _, q in cells])
+            self._hourly.add(rows, hours, quantities)
+            self._daily.add(rows, hours // 24, quantities)
+
+    def _apply(self, buckets, parse, ring):
+        known = [(self._rows[i], parse(b), q) for i, b, q in buckets if i in self._rows]
+        if known:
+            rows, indexes, quantities = (np.asarray(col) for col in zip(*known))
+            ring.add(rows, indexes, quantities)
+
+    def _sync(self):
+        # Reload when another process or endpoint changed stock since our view
+        if self._version is None or database.get_supply_version() != self._version:
+            self._load()
+
+    def _resolve(self, event):
+        item = event.get('item_id')
+        if item in (None, ''):
+            item = self._names.get(event.get('item'))
+        else:
+            item = int(item)
+        if item not in self._rows:
+            raise ValueError(f"Unknown supply item {event.get('item_id') or event.get('item')}")
+        quantity = float(event.get('quantity', 1))
+        # Stock is counted in whole units; rounding would misstate usage
+        if not (math.isfinite(quantity) and quantity.is_integer() and 0 < quantity <= MAX_EVENT_QUANTITY):
+            raise ValueError(f"Invalid quantity {event.get('quantity')}")
+        stamp = event.get('timestamp')
+        now = datetime.now()
+        moment = datetime.fromisoformat(stamp) if stamp else now
+        if moment.tzinfo is not None:
+            moment = moment.astimezone().replace(tzinfo=None)
+        # A far-future bucket would advance the rings past every real one
+        if moment > now + MAX_CLOCK_SKEW:
+            raise ValueError(f"Timestamp {stamp} is in the future")
+        return item, hour_index(moment), int(quantity)
+
+    @_scoped
+    def ingest(self, events):
+        """Fold an iterable of event dicts into the rings; returns counts."""
+        if database.FORCE_DEMO:
+            raise RuntimeError("Usage ingestion is unavailable in demo mode")
+        accepted = rejected = late = 0
+        with self._lock:
+            self._sync()
+            items, hours, quantities = [], [], []
+            for event in events:
+                try:
+                    item, hour, quantity = self._resolve(event)
+                except (AttributeError, TypeError, ValueError, OverflowError):
+                    rejected += 1
+                    continue
+                items.append(item)
+                hours.append(hour)
+                quantities.append(quantity)
+            if items:
+                rows = np.asarray([self._rows[i] for i in items])
+                hours = np.asarray(hours)
+                quantities = np.asarray(quantities)
+                late = self._hourly.add(rows, hours, quantities)
+                self._daily.add(rows, hours // 24, quantities)
+                for item, hour, quantity in zip(items, hours.tolist(), quantities.tolist()):
+                    key = (item, hour)
+                    self._pending[key] = self._pending.get(key, 0) + quantity
+                accepted = len(items)
+            self.stats['events'] += accepted
+            self.stats['rejected'] += rejected
+            self.stats['late'] += late
+            due = (len(self._pending) >= FLUSH_MAX_PENDING
+                   or time.monotonic() - self._last_flush >= FLUSH_INTERVAL)
+        if due:
+            self.flush()
+        else:
+            self._schedule_flush()
+        return {'accepted': accepted, 'rejected': rejected, 'late': late}
+
+    def _schedule_flush(self):
+        with self._lock:
+            if self._timer is None and self._pending:
+                self._timer = threading.Timer(FLUSH_INTERVAL, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    @_scoped
+    def flush(self):
+        """Persist pending totals; returns the number of movements written."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._last_flush = time.monotonic()
+            if not self._pending:
+                return 0
+            rows = [
+                (item, quantity, hour_label(hour) + ":00:00")
+                for (item, hour), quantity in sorted(self._pending.items())
+                if quantity
+            ]
+            before, after = database.record_usage_batch(rows)
+            self._pending.clear()
+            # Our own write keeps the rings current; anything else forces a reload
+            self._version = after if before == self._version else None
+            self.stats['flushes'] += 1
+            return len(rows)
+
+    @_scoped
+    def window(self, item_ids, count, hourly=False, end=None):
+        """
+        Usage matrix (len(item_ids) x count), oldest bucket first, ending at
+        `end` (a datetime; default now). Unknown items read as zero.
+        """
+        limit = HOURLY_BUCKETS if hourly else DAILY_BUCKETS
+        if not 1 <= count <= limit:
+            raise ValueError(f"window must be between 1 and {limit} buckets")
+        end_hour = hour_index(end or datetime.now())
+        with self._lock:
+            self._sync()
+            known = [i for i, item in enumerate(item_ids) if item in self._rows]
+            rows = np.asarray([self._rows[item_ids[i]] for i in known], dtype=np.int64)
+            if hourly:
+                values = self._hourly.window(rows, end_hour, count)
+            else:
+                values = self._daily.window(rows, end_hour // 24, count)
+        out = np.zeros((len(item_ids), count), dtype=np.int64)
+        out[known] = values
+        return out
+
+    @_scoped
+    def item_id(self, name):
+        with self._lock:
+            self._sync()
+            return self._names.get(name)
+
+
+_aggregators = {}
+_aggregators_lock = threading.Lock()
+
+
+def get_aggregator(facility_id=None):
+    """The aggregator for a facility (default: the one queries route to)."""
+    facility_id = facility_id or database.current_facility()
+    with _aggregators_lock:
+        aggregator = _aggregators.get(facility_id)
+        if aggregator is None:
+            aggregator = _aggregators[facility_id] = UsageAggregator(facility_id)
+        return aggregator
+
+
+@atexit.register
+def _flush_all():
+    for aggregator in list(_aggregators.values()):
+        if aggregator._pending:
+            aggregator.flush()
+
+
+@timed('ingest_usage_events')
+def ingest_usage_events(events):
+    return get_aggregator().ingest(events)
+
+
+def read_events(stream, fmt):
+    """Yield event dicts from a text stream of JSON lines or CSV rows."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {}
+
+
+def _chunks(events, size):
+    chunk = []
+    for event in events:
+        chunk.append(event)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def import_events(stream, fmt='jsonl'):
+    """Ingest a JSONL or CSV stream in chunks and flush; returns counts."""
+    aggregator = get_aggregator()
+    totals = {'accepted': 0, 'rejected': 0, 'late': 0}
+    for chunk in _chunks(read_events(stream, fmt), IMPORT_CHUNK):
+        for key, value in aggregator.ingest(chunk).items():
+            totals[key] += value
+    totals['persisted'] = aggregator.flush()
+    return totals
+
+
+def import_file(path, fmt=None):
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='') as f:
+        return import_events(f, fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import stock-usage events")
+    parser.add_argument("path", help="JSONL or CSV file, or - for stdin")
+    parser.add_argument("--format", choices=("jsonl", "csv"))
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.path == "-":
+        totals = import_events(io.TextIOWrapper(sys.stdin.buffer, newline=''), args.format or 'jsonl')
+    else:
+        totals = import_file(os.path.abspath(args.path), args.format)
+    elapsed = time.perf_counter() - start
+    print(f"{totals} in {elapsed:.2f}s ({totals['accepted'] / elapsed:,.0f} events/s)")
+
+
+if __name__ == "__main__":
+    main()
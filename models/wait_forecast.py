@@ -0,0 +1,132 @@
+"""
+Expected-wait forecast: the baseline hourly inflow forecast, scaled by
+each day's weather multiplier and topped up with surge-event arrivals, pushed
+through the vectorized Erlang C model at current staffing. The result is
+one departments x hours "expected wait if nothing changes" matrix, cached
+until the surge engine, the inflow forecast or staffing changes.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models.database import get_staff_count
+from models.inflow_model import (
+    DEPARTMENT_BASE_RATES,
+    get_forecast_version,
+    get_prediction_dates,
+    predict_hourly_inflow,
+)
+from models.metrics import timed
+from models.queue_model import queue_metrics
+from models.surge_predictor import WEATHER_IMPACT, engine as surge_engine
+
+HORIZON_HOURS = 7 * 24
+
+# Rostered shifts per day (morning, evening, night)
+SHIFTS_PER_DAY = 3
+
+# Patients one on-duty staff member sees per hour
+SERVICE_RATE = 2.0
+
+_cache = None
+_cache_key = None
+_cache_lock = threading.Lock()
+
+
+def on_duty_servers(staff_count):
+    """Staff on duty at once: the department roster split across shifts."""
+    return max(1, staff_count // SHIFTS_PER_DAY)
+
+
+def _finite(values, digits):
+    """Nested lists with non-finite entries (unstable queues) as None."""
+    rounded = np.round(values, digits)
+    return [
+        [float(v) if np.isfinite(v) else None for v in row]
+        for row in rounded
+    ]
+
+
+def _build(start, departments, servers):
+    baseline = np.asarray([
+        np.ravel(predict_hourly_inflow(d))[:HORIZON_HOURS] for d in departments
+    ])
+    conditions = surge_engine.daily_conditions(start.date(), HORIZON_HOURS // 24)
+    weather = np.repeat([WEATHER_IMPACT[c]['multiplier'] for c in conditions], 24)
+    surge = surge_engine.hourly_cases(start, HORIZON_HOURS)
+    arrivals = baseline * weather + surge
+
+    c = np.asarray([servers[d] for d in departments])[:, None]
+    metrics = queue_metrics(arrivals, SERVICE_RATE, c)
+    wait_minutes = metrics['avg_wait_time'] * 60
+
+    peaks = {}
+    for i, dept in enumerate(departments):
+        j = int(np.argmax(wait_minutes[i]))
+        peaks[dept] = {
+            'hour': (start + timedelta(hours=j)).isoformat(timespec='minutes'),
+            'wait_minutes': float(round(wait_minutes[i, j], 1)) if np.isfinite(wait_minutes[i, j]) else None,
+        }
+    return {
+        'start': start.isoformat(timespec='minutes'),
+        'hours': HORIZON_HOURS,
+        'departments': departments,
+        'servers': servers,
+        'service_rate': SERVICE_RATE,
+        'weather': conditions[0],
+        'weather_by_day': conditions,
+        'arrival_rate': _finite(arrivals, 3),
+        'surge_arrivals': _finite(surge, 3),
+        'utilization': _finite(metrics['utilization'], 3),
+        'expected_wait_minutes': _finite(wait_minutes, 1),
+        'unstable_hours': {d: int((~np.isfinite(wait_minutes[i])).sum()) for i, d in enumerate(departments)},
+        'peak_wait': peaks,
+    }
+
+
+@timed('expected_wait_matrix')
+def expected_wait_matrix():
+    """Cached departments x hours expected-wait forecast from today 00:00."""
+    global _cache, _cache_key
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    departments = list(DEPARTMENT_BASE_RATES)
+    staff = dict(get_staff_count())
+    servers = {d: on_duty_servers(staff.get(d, 0)) for d in departments}
+    # The surge version also changes when the weather feed does
+    surge_version = surge_engine.state()['version']
+    # Roll the inflow cache to today first so its version is settled
+    get_prediction_dates()
+    key = (start, surge_version, get_forecast_version(), tuple(sorted(servers.items())))
+    with _cache_lock:
+        if key != _cache_key:
+            _cache = _build(start, departments, servers)
+            _cache_key = key
+        return _cache
+
+
+def invalidate_wait_forecast():
+    """Drop the cached matrix (it is also rebuilt automatically on changes)."""
+    global _cache, _cache_key
+    with _cache_lock:
+        _cache = _cache_key = None
+
+
+def get_expected_waits(department=None):
+    matrix = expected_wait_matrix()
+    if department is None:
+        return matrix
+    if department not in matrix['departments']:
+        raise ValueError(f'Unknown department {department}')
+    i = matrix['departments'].index(department)
+    return {
+        **{k: matrix[k] for k in ('start', 'hours', 'service_rate', 'weather', 'weather_by_day')},
+        'department': department,
+        'servers': matrix['servers'][department],
+        'arrival_rate': matrix['arrival_rate'][i],
+        'surge_arrivals': matrix['surge_arrivals'][i],
+        'utilization': matrix['utilization'][i],
+        'expected_wait_minutes': matrix['expected_wait_minutes'][i],
+        'unstable_hours': matrix['unstable_hours'][department],
+        'peak_wait': matrix['peak_wait'][department],
+    }